@@ -40,6 +40,9 @@ setup(
         "ntplib==0.3.4",
         "pyyaml==6.0",
     ],
+    extras_require={
+        "async": ["aiohttp>=3.8"],
+    },
     entry_points={
         'console_scripts': ['tm1cm=tm1cm.__main__:main'],
     },
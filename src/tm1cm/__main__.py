@@ -3,22 +3,28 @@ import logging
 import os
 import tempfile
 
-from TM1py.Services import TM1Service
-
-from tm1cm.application import LocalApplication, RemoteApplication
+from tm1cm import profiler, tracing
+from tm1cm.application import create_remote_application, LocalApplication
 from tm1cm.common import get_config
+from tm1cm.generator import generate
 from tm1cm.interactive import Interactive
 from tm1cm.migration import Migration
 from tm1cm.scaffold import create_scaffold
+from tm1cm.transport import create_session
 
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--mode', help='', required=False, choices=['get', 'put', 'scaffold', 'interactive'], default='interactive')
+    parser.add_argument('--mode', help='', required=False, choices=['get', 'put', 'scaffold', 'generate', 'interactive'], default='interactive')
     parser.add_argument('--path', help='', required=False, default=os.path.abspath(os.getcwd()))
     parser.add_argument('--log', help='', required=False, default=None)
     parser.add_argument('--environment', help='', required=False, default=None)
     parser.add_argument('--debug', help='', required=False, action='store_true')
+    parser.add_argument('--size', help='Size of the model made by generate', required=False, type=float, default=1)
+    parser.add_argument('--seed', help='Seed of the model made by generate', required=False, type=int, default=0)
+    parser.add_argument('--profile', help='Report where get and put spend their time', required=False, action='store_true')
+    parser.add_argument('--trace', help='Write a trace of get and put, down to every request, to this file', required=False, default=None)
+    parser.add_argument('--trace-format', help='', required=False, choices=tracing.TRACE_FORMATS, default='chrome')
 
     args = parser.parse_args()
 
@@ -28,6 +34,10 @@ def main():
         setup_logger(args.log, args.path, args.debug)
         create_scaffold(args.path)
 
+    if args.mode in ['generate']:
+        setup_logger(args.log, args.path, args.debug)
+        generate(args.path, args.size, args.seed)
+
     if args.mode in ['get', 'put']:
         setup_logger(args.log, args.path, args.debug)
         function = globals().get(args.mode)
@@ -37,12 +47,24 @@ def main():
 
         remote_config = {**connect, **credentials}
 
-        remote_session = TM1Service(**remote_config)
+        remote_session = create_session(remote_config)
 
         local_config = get_config(args.path, 'tm1cm', args.environment)
         local_path = args.path
 
-        function(local_config, local_path, remote_session)
+        if args.profile:
+            profiler.enable()
+        if args.trace:
+            tracing.enable()
+
+        with profiler.timer(args.mode, {'tm1cm.path': local_path}):
+            function(local_config, local_path, remote_session)
+
+        if args.profile:
+            print(profiler.get_profiler().format_table())
+            profiler.get_profiler().save(local_path)
+        if args.trace:
+            tracing.get_tracer().save(args.trace, args.trace_format)
 
     if args.mode in ['interactive']:
         setup_logger(args.log, args.path, args.debug, True)
@@ -50,13 +72,13 @@ def main():
 
 
 def get(tm1cm_config, data_path, remote_session):
-    app = RemoteApplication(tm1cm_config, remote_session).refresh(False)
-    app.to_local(data_path, clear=True)
+    app = create_remote_application(tm1cm_config, remote_session, path=data_path).refresh(False)
+    app.to_local(data_path, clear=True, incremental=tm1cm_config.get('incremental_get', False))
 
 
 def put(config, path, session):
     app_from = LocalApplication(config, path).refresh(True)
-    app_to = RemoteApplication(config, session).refresh(None)
+    app_to = create_remote_application(config, session, path=path).refresh(None)
 
     migration = Migration(app_from, app_to)
     migration.do_all_operations()
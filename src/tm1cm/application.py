@@ -1,19 +1,28 @@
 import base64
 import copy
+import hashlib
 import json
 import logging
 import os
 import shutil
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from fnmatch import fnmatch
 from glob import iglob
 
-import yaml
 from TM1py.Objects.NativeView import NativeView
 from TM1py.Objects.Subset import AnonymousSubset
-from TM1py.Services import TM1Service
-
-from tm1cm.common import filter_list, Dumper
+from TM1py.Utils.Utils import build_content_from_cellset_dict
+
+from tm1cm.common import dump_json, dump_yaml, filter_list, FlowList, get_filter, iter_json_list, iter_yaml_list, load_json, load_yaml, LazyObjects
+from tm1cm.format_cache import FormatCache
+from tm1cm.inventory import Inventory
+from tm1cm import profiler, tracing
+from tm1cm.manifest import Manifest
+from tm1cm.snapshot_cache import SnapshotCache
 from tm1cm.ti_format import format_procedure
+from tm1cm.transport import create_session, set_pool_size
 
 
 class Application:
@@ -30,19 +39,21 @@ class Application:
         self._view_list = []
         self._subset_list = []
 
+        self._format_cache = None
+
         self.refreshed = False
 
     @property
     def cubes(self):
-        return {x['Name']: x for x in self._cube_object}
+        return _by_name(self._cube_object)
 
     @property
     def rules(self):
-        return {x['Name']: x for x in self._rule_object}
+        return _by_name(self._rule_object)
 
     @property
     def dimensions(self):
-        return {x['Name']: x for x in self._dimension_object}
+        return _by_name(self._dimension_object)
 
     @property
     def hierarchies(self):
@@ -50,7 +61,7 @@ class Application:
 
     @property
     def processes(self):
-        return {x['Name']: x for x in self._process_object}
+        return _by_name(self._process_object)
 
     @property
     def files(self):
@@ -66,164 +77,379 @@ class Application:
 
     def refresh(self, overlay=True):
         self._populate(overlay)
-        self._filter()
+
+        with self._timer('filter'):
+            self._filter()
 
         self.refreshed = True
 
         return self
 
-    def to_local(self, path, clear=False):
-        logger = logging.getLogger(__name__)
+    def to_local(self, path, clear=False, incremental=False):
+        manifest = Manifest(path) if incremental else None
 
         if not self.refreshed:
             self.refresh()
 
         for folder in ['data', 'scripts', 'files']:
             file_path = os.path.join(path, folder)
-            if clear and os.path.exists(file_path):
+            if clear and not manifest and os.path.exists(file_path):
                 shutil.rmtree(file_path)
 
-        # Cube
-        file_path = os.path.join(path, 'data', 'cube')
-        if self._cube_object:
-            os.makedirs(file_path, exist_ok=True)
+        skip = manifest.unchanged if manifest else None
+
+        # Each file is timed from the end of the previous one, so fetching, serializing and writing it all count
+        start = time.perf_counter()
+        for name, data, timestamp in self.iter_files(skip):
+            os.makedirs(os.path.dirname(os.path.join(path, name)), exist_ok=True)
+            self._write_file(path, name, data, manifest, timestamp)
+
+            end = time.perf_counter()
+            profiler.record('{}.to_local.{}'.format(type(self).__name__, _object_class(name)), start, end, {'tm1cm.file': name})
+            start = end
+
+        if manifest:
+            if clear:
+                manifest.prune(['data', 'scripts', 'files'])
+            manifest.save()
+
+    def iter_files(self, skip=None, known=None):
+        """Serializes the application, yielding a (name, data, timestamp) tuple for every file that makes up its local
+        representation. name is relative to the project path, data is the file content as bytes (or, for streamed
+        view data, an iterator of bytes) and timestamp is the server timestamp of the object (or None). Files the
+        snapshot cache has a current copy of are not fetched
+
+        Args:
+            skip (callable): Optional, called as skip(name, timestamp) before fetching objects that have a server
+                timestamp. If it returns True the object is not fetched or yielded
+            known (dict): Optional, {name: SHA-256 digest} of files the caller already has, with '/' as separator.
+                With lazy_load, files of a local project that match are yielded as they are, without loading the
+                objects
+        """
+        cache = self.snapshot_cache
+        if cache is None:
+            yield from self._iter_files(skip, known)
+            return
 
-        for cube in self._cube_object:
-            cube_name = cube['Name']
+        try:
+            yield from self._iter_files(skip, known)
+        finally:
+            cache.save()
+
+    def _iter_files(self, skip, known):
+        logger = logging.getLogger(__name__)
+
+        if not self.refreshed:
+            self.refresh()
+
+        # Cube
+        cubes = self.cubes
+        for cube_name in cubes:
             logger.debug('Processing cube {}'.format(cube_name))
 
-            file_name = '{}.cube'.format(cube_name)
-            with open(os.path.join(file_path, file_name), 'wb') as outfile:
-                text = self.dump(cube)
-                outfile.write(text)
+            name = os.path.join('data', 'cube', '{}.cube'.format(cube_name))
+            data = self._read_known(name, known)
+            yield name, data if data is not None else self.dump(cubes[cube_name]), None
 
         # View
-        file_path = os.path.join(path, 'data', 'view')
-        for cube_name, view_name in self._view_list:
-            view_path = os.path.join(file_path, cube_name)
-            os.makedirs(view_path, exist_ok=True)
+        view_list, cached = self._split_cached(self._view_list, _view_file)
+        yield from cached
 
-            view = self.get_view(cube_name, view_name)
+        for (cube_name, view_name), view in self._fetch_all(self.get_view, view_list):
             logger.debug('Processing cube view {}, {}'.format(cube_name, view_name))
 
-            file_name = '{}.view'.format(view_name)
-            with open(os.path.join(view_path, file_name), 'wb') as outfile:
-                text = self.dump(view)
-                outfile.write(text)
+            name = _view_file(cube_name, view_name)
+            yield name, self._snapshot(name, self.dump(view)), None
 
         # View Data
-        file_path = os.path.join(path, 'data', 'view_data')
+        view_data_list = []
         for cube_name, view_name in self._view_data_list:
-            view_path = os.path.join(file_path, cube_name)
-            os.makedirs(view_path, exist_ok=True)
+            name = _view_data_file(cube_name, view_name)
+            if skip and skip(name, self.get_timestamp('view_data', cube_name, view_name)):
+                logger.debug('Skipping unchanged cube view data {}, {}'.format(cube_name, view_name))
+                continue
+            view_data_list.append((cube_name, view_name))
+
+        view_data_list, cached = self._split_cached(view_data_list, _view_data_file, lambda *x: self.get_timestamp('view_data', *x))
+        yield from cached
+
+        if self.config.get('view_data_page_size', 0):
+            # Stream rows to the file, one page at a time, instead of holding complete views in memory
+            view_data_files = ((x, self.dump_rows(self.iter_view_data(*x))) for x in view_data_list)
+        else:
+            view_data_files = ((x, self.dump(view_data)) for x, view_data in self._fetch_all(self.get_view_data, view_data_list))
 
-            view_data = self.get_view_data(cube_name, view_name)
+        for (cube_name, view_name), data in view_data_files:
             logger.debug('Processing cube view data {}, {}'.format(cube_name, view_name))
 
-            file_name = '{}.view_data'.format(view_name)
-            with open(os.path.join(view_path, file_name), 'wb') as outfile:
-                text = self.dump(view_data)
-                outfile.write(text)
+            name = _view_data_file(cube_name, view_name)
+            timestamp = self.get_timestamp('view_data', cube_name, view_name)
+            yield name, self._snapshot(name, data, timestamp), timestamp
 
         # Subsets
-        file_path = os.path.join(path, 'data', 'subset')
-        for dimension_name, hierarchy_name, subset_name in self._subset_list:
-            subset_path = os.path.join(file_path, dimension_name, hierarchy_name)
-            os.makedirs(subset_path, exist_ok=True)
+        subset_list, cached = self._split_cached(self._subset_list, _subset_file)
+        yield from cached
 
-            subset = dict(self.get_subset(dimension_name, hierarchy_name, subset_name))
+        for (dimension_name, hierarchy_name, subset_name), subset in self._fetch_all(self.get_subset, subset_list):
+            subset = dict(subset)
             logger.debug('Processing subset {}/{}/{}'.format(dimension_name, hierarchy_name, subset_name))
 
-            file_name = '{}.subset'.format(subset_name)
-            with open(os.path.join(subset_path, file_name), 'wb') as outfile:
-                text = self.dump(subset)
-                outfile.write(text)
+            name = _subset_file(dimension_name, hierarchy_name, subset_name)
+            yield name, self._snapshot(name, self.dump(subset)), None
 
         # Rule
-        file_path = os.path.join(path, 'data', 'rule')
-        if self._rule_object:
-            os.makedirs(file_path, exist_ok=True)
-
-        for cube in self._rule_object:
-            cube_name = cube['Name']
+        rules = self.rules
+        for cube_name in rules:
             logger.debug('Processing rule {}'.format(cube_name))
 
-            rule = cube.get('Rules', None)
+            name = os.path.join('data', 'rule', '{}.rule'.format(cube_name))
+            data = self._read_known(name, known)
+            if data is not None:
+                yield name, data, None
+                continue
+
+            rule = rules[cube_name].get('Rules', None)
             if rule:
-                file_name = '{}.rule'.format(cube_name)
-                with open(os.path.join(file_path, file_name), 'wb') as outfile:
-                    outfile.write(rule.encode('utf8'))
+                yield name, rule.encode('utf8'), None
 
         # Dimension
-        file_path = os.path.join(path, 'data', 'dimension')
-        if self._dimension_object:
-            os.makedirs(file_path, exist_ok=True)
-
-        for dimension in self._dimension_object:
-            dimension_name = dimension['Name']
+        dimensions = self.dimensions
+        for dimension_name in dimensions:
             logger.debug('Processing dimension {}'.format(dimension_name))
 
-            file_name = '{}.dimension'.format(dimension_name)
-            with open(os.path.join(file_path, file_name), 'wb') as outfile:
-                text = self.dump(dimension)
-                outfile.write(text)
+            name = os.path.join('data', 'dimension', '{}.dimension'.format(dimension_name))
+            data = self._read_known(name, known)
+            yield name, data if data is not None else self.dump(dimensions[dimension_name]), None
 
         # Hierarchy
-        file_path = os.path.join(path, 'data', 'hierarchy')
-        for dimension_name, hierarchy_name in self._hierarchy_list:
-            hierarchy_path = os.path.join(file_path, dimension_name)
-            os.makedirs(hierarchy_path, exist_ok=True)
+        columnar = self.config.get('hierarchy_format', 'standard').lower() == 'columnar'
 
-            hierarchy = self.get_hierarchy(dimension_name, hierarchy_name)
+        hierarchy_list, cached = self._split_cached(self._hierarchy_list, _hierarchy_file)
+        yield from cached
 
-            file_name = '{}.hierarchy'.format(hierarchy_name)
-            with open(os.path.join(hierarchy_path, file_name), 'wb') as outfile:
-                hierarchy['ElementAttributes'] = sorted(hierarchy['ElementAttributes'], key=lambda x: x['Name'])
+        for (dimension_name, hierarchy_name), hierarchy in self.get_hierarchies(hierarchy_list):
+            hierarchy['ElementAttributes'] = sorted(hierarchy['ElementAttributes'], key=lambda x: x['Name'])
 
-                text = self.dump(hierarchy)
-                outfile.write(text)
+            if columnar:
+                hierarchy = _hierarchy_to_columnar(hierarchy)
 
-        # Process
-        file_path = os.path.join(path, 'data', 'process')
-        if self._process_object:
-            os.makedirs(file_path, exist_ok=True)
+            name = _hierarchy_file(dimension_name, hierarchy_name)
+            yield name, self._snapshot(name, self.dump(hierarchy)), None
 
+        # Process
         procedures = ['PrologProcedure', 'MetadataProcedure', 'DataProcedure', 'EpilogProcedure']
 
-        for process in copy.deepcopy(self._process_object):
-            file_name = '{}.process'.format(process['Name'])
+        processes = self.processes
+        process_list = []
+        for process_name in processes:
+            name = os.path.join('data', 'process', '{}.process'.format(process_name))
+            data = self._read_known(name, known)
+            if data is None:
+                process_list.append(process_name)
+            else:
+                yield name, data, None
 
-            with open(os.path.join(file_path, file_name), 'wb') as outfile:
-                output = []
-                for procedure in procedures:
-                    header = globals().get('{}_BEGIN'.format(procedure[:-9].upper()))
+        if isinstance(processes, LazyObjects):
+            # Load the remaining processes together, so they are formatted in one batch
+            processes.load(process_list)
 
-                    text = process[procedure]
-                    text = self._fix_generated_lines(text)
-                    text = text.replace('\r\n', '\n')
+        for process_name in process_list:
+            process = copy.deepcopy(processes[process_name])
+            file_name = '{}.process'.format(process_name)
 
-                    footer = globals().get('{}_END'.format(procedure[:-9].upper()))
-                    output.append((header + text + footer).encode('utf8'))
+            output = []
+            for procedure in procedures:
+                header = globals().get('{}_BEGIN'.format(procedure[:-9].upper()))
 
-                header = globals().get('PROPERTIES_BEGIN').encode('utf8')
-                text = self.dump({key: value for key, value in process.items() if key not in procedures})
-                footer = globals().get('PROPERTIES_END').encode('utf8')
-                output.insert(0, header + text + footer)
+                text = process[procedure]
+                text = self._fix_generated_lines(text)
+                text = text.replace('\r\n', '\n')
 
-                outfile.write(''.encode('utf8').join(output))
+                footer = globals().get('{}_END'.format(procedure[:-9].upper()))
+                output.append((header + text + footer).encode('utf8'))
 
-        # Files & Scripts
-        for obj in self._file_list:
-            file_path, file_name = os.path.split(os.path.join(path, os.sep.join(obj)))
+            header = globals().get('PROPERTIES_BEGIN').encode('utf8')
+            text = self.dump({key: value for key, value in process.items() if key not in procedures})
+            footer = globals().get('PROPERTIES_END').encode('utf8')
+            output.insert(0, header + text + footer)
 
-            os.makedirs(file_path, exist_ok=True)
+            yield os.path.join('data', 'process', file_name), ''.encode('utf8').join(output), None
 
-            with open(os.path.join(file_path, file_name), 'wb') as outfile:
-                outfile.write(self.get_file(os.sep.join(obj)))
+        # Files & Scripts
+        file_list, cached = self._split_cached(self._file_list, os.path.join)
+        yield from cached
+
+        for obj in file_list:
+            name = os.sep.join(obj)
+            yield name, self._snapshot(name, self.get_file(name)), None
+
+    def _read_known(self, name, known):
+        """Returns the content of a file, without loading its object, if it is one of known. See iter_files
+
+        Args:
+            name (str): File name, relative to the project path
+            known (dict): {name: SHA-256 digest} of files, or None
+
+        Returns:
+            bytes: File content, or None if the object must be loaded and serialized
+        """
+        return None
+
+    def _split_cached(self, items, name_func, timestamp_func=None):
+        """Splits items into those that must be fetched, and those the snapshot cache has a current copy of
+
+        Args:
+            items (list): List of name tuples, e.g. (cube, view)
+            name_func (callable): Returns the file name of an item, called as name_func(*item)
+            timestamp_func (callable): Optional, returns the server timestamp of an item
+
+        Returns:
+            tuple: (items to fetch, iterator of (name, data, timestamp) for the cached items)
+        """
+        cache = self.snapshot_cache
+        if cache is None or not self.read_snapshot:
+            return items, []
+
+        missing = []
+        cached = []
+        for item in items:
+            name = name_func(*item)
+            timestamp = timestamp_func(*item) if timestamp_func else None
+
+            if cache.is_fresh(name, self._snapshot_timestamp(name, timestamp)):
+                cached.append((name, timestamp))
+            else:
+                missing.append(item)
+
+        if cached:
+            logging.getLogger(__name__).debug('Serving {} of {} files from the snapshot cache'.format(len(cached), len(items)))
+
+        return missing, ((name, cache.read(name), timestamp) for name, timestamp in cached)
+
+    def _snapshot(self, name, data, timestamp=None):
+        """Stores a fetched file in the snapshot cache, if enabled. Returns data, see SnapshotCache.put"""
+        cache = self.snapshot_cache
+        if cache is None:
+            return data
+
+        return cache.put(name, data, self._snapshot_timestamp(name, timestamp))
+
+    def _snapshot_timestamp(self, name, timestamp):
+        # Views can change without the cube timestamps changing, so view data is only current along with its view
+        if not timestamp or not name.startswith(os.path.join('data', 'view_data', '')):
+            return timestamp
+
+        _, _, cube_name, file_name = name.split(os.sep)
+        view_digest = self.snapshot_cache.digest(_view_file(cube_name, file_name[:-len('.view_data')]))
+
+        return '{}/{}'.format(timestamp, view_digest) if view_digest else None
+
+    def _write_file(self, path, name, data, manifest=None, timestamp=None):
+        """Writes data to the file name (relative to path). When a manifest is given, the file is only written if its
+        content changed since the last run
+
+        Args:
+            path (str): Project path
+            name (str): File name, relative to path
+            data (bytes|iterator): File content, or an iterator of bytes
+            manifest (Manifest): Manifest of the previous run
+            timestamp (str): Server timestamp of the object, recorded in the manifest
+        """
+        file_name = os.path.join(path, name)
+
+        if isinstance(data, bytes):
+            if manifest and not manifest.update(name, data, timestamp):
+                return
+
+            with open(file_name, 'wb') as outfile:
+                outfile.write(data)
+            return
+
+        # Streamed content goes to a temporary file first, the manifest can only be checked once all of it is known
+        temp_file = file_name + '.tmp'
+        digest = hashlib.sha256()
+        with open(temp_file, 'wb') as outfile:
+            for chunk in data:
+                digest.update(chunk)
+                outfile.write(chunk)
+
+        if manifest and not manifest.update_digest(name, digest.hexdigest(), timestamp):
+            os.remove(temp_file)
+            return
+
+        os.replace(temp_file, file_name)
+
+    def get_timestamp(self, object_type, *names):
+        """Returns the last time an object was updated on the server, or None if it is not known
+
+        Args:
+            object_type (str): Object type, e.g. 'view_data'
+            names (str): Object names, e.g. cube and view name
+        """
+        return None
 
     def to_remote(self, session):
         pass
 
+    @property
+    def snapshot_cache(self):
+        """SnapshotCache of the files of the application, or None if it has none"""
+        return None
+
+    def invalidate_snapshot(self, prefixes):
+        """Drops files from the snapshot cache, see SnapshotCache.invalidate. The change is kept once save_snapshot is
+        called
+        """
+        cache = self.snapshot_cache
+        if cache is not None:
+            cache.invalidate(prefixes)
+
+    def save_snapshot(self):
+        cache = self.snapshot_cache
+        if cache is not None:
+            cache.save()
+
+    def clear_snapshot(self):
+        """Empties the snapshot cache, so every file is fetched again"""
+        cache = self.snapshot_cache
+        if cache is not None:
+            cache.clear()
+            cache.save()
+
+    def _timer(self, name):
+        """Times a phase of the application when profiling is enabled, see profiler.timer"""
+        return profiler.timer('{}.{}'.format(type(self).__name__, name))
+
+    def _fetch_all(self, func, items):
+        """Calls func for each item in items, yielding (item, result) pairs. When max_workers is configured, calls are
+        spread across a thread pool and yielded as they complete; otherwise they run serially in list order.
+
+        Args:
+            func (callable): Getter to call, e.g. self.get_view
+            items (list): List of argument tuples for func
+        """
+        max_workers = int(self.config.get('max_workers', 1) or 1)
+        if max_workers <= 1 or len(items) <= 1:
+            for item in items:
+                yield item, func(*item)
+            return
+
+        self._prepare_workers(max_workers)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {executor.submit(tracing.wrap(func), *item): item for item in items}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _prepare_workers(self, max_workers):
+        """ To be overridden """
+        pass
+
     def _populate(self, overlay=True):
         """ To be overridden """
         pass
@@ -231,13 +457,22 @@ class Application:
     def get_hierarchy(self, dimension, hierarchy=None):
         """ To be overridden """
 
+    def get_hierarchies(self, hierarchy_list):
+        """Yields ((dimension, hierarchy), result) for every hierarchy in hierarchy_list. Can be overridden to fetch
+        many hierarchies at once
+
+        Args:
+            hierarchy_list (list): List of (dimension, hierarchy) tuples
+        """
+        return self._fetch_all(self.get_hierarchy, hierarchy_list)
+
     def _filter(self):
         c = self.config
 
         include = c.get('include_cube', '*')
         exclude = c.get('exclude_cube', '')
-        self._cube_object = filter_list(self._cube_object, include, exclude, name_func=lambda x, extra: x['Name'])
-        self._rule_object = filter_list(self._rule_object, include, exclude, name_func=lambda x, extra: x['Name'])
+        self._cube_object = _filter_objects(self._cube_object, include, exclude)
+        self._rule_object = _filter_objects(self._rule_object, include, exclude)
         self._view_list = filter_list(self._view_list, include, exclude, name_func=lambda x, extra: x[0])
 
         include = c.get('include_cube_view', '*/*')
@@ -250,19 +485,25 @@ class Application:
 
         include = c.get('include_rule', '*')
         exclude = c.get('exclude_rule', '')
-        self._rule_object = filter_list(self._rule_object, include, exclude, name_func=lambda x, extra: x['Name'])
+        self._rule_object = _filter_objects(self._rule_object, include, exclude)
 
         include = c.get('include_dimension', '*')
         exclude = c.get('exclude_dimension', '')
-        self._dimension_object = filter_list(self._dimension_object, include, exclude, name_func=lambda x, extra: x['Name'])
+        self._dimension_object = _filter_objects(self._dimension_object, include, exclude)
         self._hierarchy_list = filter_list(self._hierarchy_list, include, exclude, name_func=lambda x, extra: x[0])
         self._subset_list = filter_list(self._subset_list, include, exclude, name_func=lambda x, extra: x[0])
 
-        for dimension in self._dimension_object:
-            include = c.get('include_dimension_attribute', '*/*')
-            exclude = c.get('exclude_dimension_attribute', '')
+        include_attribute = c.get('include_dimension_attribute', '*/*')
+        exclude_attribute = c.get('exclude_dimension_attribute', '')
+
+        def filter_attributes(dimension):
+            dimension['Attributes'] = filter_list(dimension['Attributes'], include_attribute, exclude_attribute, name_func=lambda x, extra: '{}/{}'.format(extra, x[0]), extra=dimension['Name'])
 
-            dimension['Attributes'] = filter_list(dimension['Attributes'], include, exclude, name_func=lambda x, extra: '{}/{}'.format(extra, x[0]), extra=dimension['Name'])
+        if isinstance(self._dimension_object, LazyObjects):
+            self._dimension_object.apply(filter_attributes)
+        else:
+            for dimension in self._dimension_object:
+                filter_attributes(dimension)
 
         include = c.get('include_dimension_hierarchy', '*/*')
         exclude = c.get('exclude_dimension_hierarchy', '')
@@ -275,26 +516,20 @@ class Application:
 
         include = c.get('include_process', '*')
         exclude = c.get('exclude_process', '')
-        self._process_object = filter_list(self._process_object, include, exclude, name_func=lambda x, extra: x['Name'])
+        self._process_object = _filter_objects(self._process_object, include, exclude)
 
         include = c.get('include_file', '')
         exclude = c.get('exclude_file', '')
         self._file_list = filter_list(self._file_list, include, exclude, name_func=lambda x, extra: '/'.join(x))
 
     def _filter_hierarchy(self, dimension, hierarchy):
-        # Filter elements for certain hierarchies
-        include = self.config.get('include_dimension_hierarchy_element', '*/*')
-        exclude = self.config.get('exclude_dimension_hierarchy_element', '')
-
-        if not isinstance(include, list):
-            include = [include]
+        c = self.config
 
-        if not isinstance(exclude, list):
-            exclude = [exclude]
+        # Filter elements for certain hierarchies
+        element_filter = get_filter(c.get('include_dimension_hierarchy_element', '*/*'), c.get('exclude_dimension_hierarchy_element', ''))
 
         name = '{}/{}'.format(dimension, hierarchy['Name'])
-        include_element = any([fnmatch(name, x) for x in include]) and not any([fnmatch(name, x) for x in exclude])
-        if not include_element:
+        if not element_filter.match(name):
             hierarchy['Elements'] = []
             hierarchy['Edges'] = []
             hierarchy['DefaultMember'] = {}
@@ -305,39 +540,70 @@ class Application:
         hierarchy.setdefault('DefaultMember', {})
 
         # Filter dimension hierarchy attributes
-        include = self.config.get('include_dimension_hierarchy_attribute', '*/*/*')
-        exclude = self.config.get('exclude_dimension_hierarchy_attribute', '')
+        attribute_filter = get_filter(c.get('include_dimension_hierarchy_attribute', '*/*/*'), c.get('exclude_dimension_hierarchy_attribute', ''))
+        value_filter = get_filter(c.get('include_dimension_hierarchy_attribute_value', '*/*/*'), c.get('exclude_dimension_hierarchy_attribute_value', ''))
+
+        prefix = '{}/{}/'.format(dimension, hierarchy['Name'])
 
-        def name_func(obj, extra):
-            return '{}/{}/{}'.format(extra['dimension_name'], extra['hierarchy_name'], obj['Name'])
+        hierarchy['ElementAttributes'] = [x for x in hierarchy['ElementAttributes'] if attribute_filter.match(prefix + x['Name'])]
 
-        extra = {
-            "dimension_name": dimension,
-            "hierarchy_name": hierarchy['Name']
-        }
+        # Filter dimension hierarchy attributes and attribute values from Elements. Every element has the same
+        # attributes, so each attribute name is only matched once
+        keep = {}
+        for element in hierarchy['Elements']:
+            attributes = element['Attributes']
+            for attribute in attributes:
+                if attribute not in keep:
+                    keep[attribute] = attribute_filter.match(prefix + attribute) and value_filter.match(prefix + attribute)
 
-        hierarchy['ElementAttributes'] = filter_list(hierarchy['ElementAttributes'], include, exclude, name_func=name_func, extra=extra)
+            element['Attributes'] = {key: value for key, value in attributes.items() if keep[key]}
 
-        # Filter dimension hierarchy attributes from Elements
-        def name_func(obj, extra):
-            return '{}/{}/{}'.format(extra['dimension_name'], extra['hierarchy_name'], obj[0])
+    def _format_processes(self, processes):
+        """Applies standard TI formatting to every procedure of processes, in place. When format_cache is enabled,
+        procedures that were formatted before are served from the cache in the project folder. When format_workers is
+        greater than 1, the remaining procedures are formatted in a pool of worker processes
+
+        Args:
+            processes (list): List of process dicts
+        """
+        logger = logging.getLogger(__name__)
+        c = self.config
+
+        if self._format_cache is None and c.get('format_cache', False) and self.path:
+            self._format_cache = FormatCache(self.path, int(c.get('format_cache_size', 10000)))
+        cache = self._format_cache
+
+        pending = []
+        for process in processes:
+            for procedure in ['PrologProcedure', 'MetadataProcedure', 'DataProcedure', 'EpilogProcedure']:
+                formatted = cache.get(process[procedure]) if cache else None
+                if formatted is None:
+                    pending.append((process, procedure))
+                else:
+                    process[procedure] = formatted
+
+        texts = [process[procedure] for process, procedure in pending]
+
+        workers = int(c.get('format_workers', 1) or 1)
+        if workers > 1 and len(texts) > 1:
+            chunk_size = max(1, len(texts) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_format_procedure, texts, chunksize=chunk_size))
+        else:
+            results = [_format_procedure(text) for text in texts]
 
-        extra = {
-            "dimension_name": dimension,
-            "hierarchy_name": hierarchy['Name']
-        }
+        for (process, procedure), text, formatted in zip(pending, texts, results):
+            if formatted is None:
+                logger.warning('Auto formatting of TI process {} failed for {}. Using original formatting'.format(process['Name'], procedure))
+                continue
 
-        for i, element in enumerate(hierarchy['Elements']):
-            lst = filter_list(element['Attributes'], include, exclude, name_func=name_func, extra=extra)
-            hierarchy['Elements'][i]['Attributes'] = lst
+            if cache:
+                cache.put(text, formatted)
 
-        # Filter dimension hierarchy attributes values
-        include = self.config.get('include_dimension_hierarchy_attribute_value', '*/*/*')
-        exclude = self.config.get('exclude_dimension_hierarchy_attribute_value', '')
+            process[procedure] = formatted
 
-        for i, element in enumerate(hierarchy['Elements']):
-            lst = filter_list(element['Attributes'], include, exclude, name_func=name_func, extra=extra)
-            hierarchy['Elements'][i]['Attributes'] = lst
+        if cache:
+            cache.save()
 
     def _fix_generated_lines(self, text):
         try:
@@ -353,23 +619,80 @@ class Application:
 
     def dump(self, data):
         if self.config.get('text_output_format', 'YAML').upper() == 'YAML':
-            text = yaml.dump(data, Dumper=Dumper, width=255)
+            text = dump_yaml(data)
         else:
-            text = json.dumps(data, indent=4, sort_keys=True, ensure_ascii=False)
+            text = dump_json(data)
 
         return text.encode('utf8')
 
+    def dump_rows(self, rows, batch_size=1000):
+        """Serializes a list of rows exactly like dump, but one batch of rows at a time
+
+        Args:
+            rows (iterable): Rows, e.g. from iter_view_data
+            batch_size (int): Number of rows per yielded chunk
+
+        Yields:
+            bytes: Chunks of the serialized list
+        """
+        yaml_format = self.config.get('text_output_format', 'YAML').upper() == 'YAML'
+
+        count = 0
+        batch = []
+        for row in rows:
+            if yaml_format:
+                batch.append(dump_yaml([row]))
+            else:
+                batch.append(('[\n' if count == 0 else ',\n') + textwrap.indent(dump_json(row), ' ' * 4))
+
+            count += 1
+            if len(batch) >= batch_size:
+                yield ''.join(batch).encode('utf8')
+                batch = []
+
+        if count == 0:
+            yield self.dump([])
+            return
+
+        if not yaml_format:
+            batch.append('\n]')
+
+        yield ''.join(batch).encode('utf8')
+
+    def iter_view_data(self, cube, view):
+        """Yields the rows of the view data of a view, see get_view_data"""
+        return iter(self.get_view_data(cube, view))
+
+    def load_rows(self, fp):
+        """Parses a list of rows one row at a time, the counterpart of dump_rows
+
+        Args:
+            fp (file): File opened in text mode
+        """
+        if self.config.get('text_output_format', 'YAML').upper() == 'YAML':
+            return iter_yaml_list(fp)
+        else:
+            return iter_json_list(fp)
+
     def load(self, fp):
         if self.config.get('text_output_format', 'YAML').upper() == 'YAML':
-            data = yaml.safe_load(fp)
+            data = load_yaml(fp)
         else:
-            data = json.load(fp)
+            data = load_json(fp)
 
         return data
 
 
 class RemoteApplication(Application):
-    def __init__(self, config, session=None, session_config=None):
+    def __init__(self, config, session=None, session_config=None, path=None, read_snapshot=False):
+        """
+        Args:
+            read_snapshot (bool): Serve files from the snapshot cache while they are current. Only meant for
+                comparisons: get and put always read the server, and only keep the snapshot cache up to date
+        """
+        self.path = path
+        self.read_snapshot = read_snapshot
+
         if session:
             self._connected = True
             self._address = session._tm1_rest._address
@@ -383,6 +706,11 @@ class RemoteApplication(Application):
             self._port = session_config.get('port', '')
             self._session_config = session_config
 
+        self._hierarchy_size = {}
+        self._cube_timestamps = {}
+        self._inventory = None
+        self._snapshot_cache = None
+
         super().__init__(config)
 
     def __str__(self):
@@ -396,6 +724,26 @@ class RemoteApplication(Application):
         self.connect()
         return self._session
 
+    @property
+    def inventory(self):
+        """Inventory of the objects on the server, loaded by load_inventory. None if it was not loaded"""
+        return self._inventory
+
+    @property
+    def snapshot_cache(self):
+        """SnapshotCache of the server in the project folder, when snapshot_cache is enabled"""
+        c = self.config
+
+        if self._snapshot_cache is None and c.get('snapshot_cache', False) and self.path:
+            self.connect()
+
+            # Every setting can change what the files look like, except those of the cache itself
+            settings = {key: value for key, value in c.items() if not key.startswith('snapshot_cache')}
+            max_age = float(c.get('snapshot_cache_max_age', 300))
+            self._snapshot_cache = SnapshotCache(self.path, self._session._tm1_rest._base_url, settings, max_age)
+
+        return self._snapshot_cache
+
     def _populate(self, overlay=None):
         logger = logging.getLogger(__name__)
 
@@ -406,138 +754,208 @@ class RemoteApplication(Application):
         c = self.config
 
         # Cubes & Rules
-        try:
-            request = '/api/v1/Cubes?$select=Name,Dimensions,Rules&$expand=Dimensions($select=Name)'
-            response = rest.GET(request)
-            result = json.loads(response.text)['value']
+        with self._timer('populate.cubes_rules'):
+            try:
+                if c.get('incremental_get', False) or c.get('snapshot_cache', False):
+                    request = '/api/v1/Cubes?$select=Name,Dimensions,Rules,LastSchemaUpdate,LastDataUpdate&$expand=Dimensions($select=Name)'
+                else:
+                    request = '/api/v1/Cubes?$select=Name,Dimensions,Rules&$expand=Dimensions($select=Name)'
+                response = rest.GET(request)
+                result = json.loads(response.text)['value']
 
-            self._cube_object = result
+                self._cube_object = result
 
-            # Remove sandbox dimension if present
-            for cube in result:
-                if cube['Dimensions'][0]['Name'] == 'Sandboxes':
-                    cube['Dimensions'].remove(cube['Dimensions'][0])
+                # Timestamps are kept aside so they don't end up in the cube files
+                self._cube_timestamps = {}
+                for cube in result:
+                    timestamps = (cube.pop('LastSchemaUpdate', None), cube.pop('LastDataUpdate', None))
+                    if all(timestamps):
+                        self._cube_timestamps[cube['Name']] = timestamps
 
-            self._rule_object = [x.copy() for x in self._cube_object if x['Rules']]
+                # Remove sandbox dimension if present
+                for cube in result:
+                    if cube['Dimensions'][0]['Name'] == 'Sandboxes':
+                        cube['Dimensions'].remove(cube['Dimensions'][0])
 
-            for cube in self._cube_object:
-                if 'Rules' in cube:
-                    cube.pop('Rules')
-        except Exception:
-            logger.exception('Exception occurred when populating cube and rule objects')
-            raise
+                self._rule_object = [x.copy() for x in self._cube_object if x['Rules']]
+
+                for cube in self._cube_object:
+                    if 'Rules' in cube:
+                        cube.pop('Rules')
+            except Exception:
+                logger.exception('Exception occurred when populating cube and rule objects')
+                raise
 
         # Views
-        try:
-            request = '/api/v1/Cubes?$select=Name,Views&$expand=Views($select=Name)'
-            response = rest.GET(request)
-            result = json.loads(response.text)['value']
+        with self._timer('populate.views'):
+            try:
+                request = '/api/v1/Cubes?$select=Name,Views&$expand=Views($select=Name)'
+                response = rest.GET(request)
+                result = json.loads(response.text)['value']
 
-            self._view_list = []
-            for cube in result:
-                for view in cube['Views']:
-                    self._view_list.append((cube['Name'], view['Name']))
-        except Exception:
-            logger.exception('Exception occurred when cube views')
-            raise
+                self._view_list = []
+                for cube in result:
+                    for view in cube['Views']:
+                        self._view_list.append((cube['Name'], view['Name']))
+            except Exception:
+                logger.exception('Exception occurred when cube views')
+                raise
 
         # Subsets
-        try:
-            request = '/api/v1/Dimensions?$select=Name,Hierarchies&$expand=Hierarchies($select=Name,Subsets;$expand=Subsets($select=Name))'
-            response = rest.GET(request)
-            result = json.loads(response.text)['value']
+        with self._timer('populate.subsets'):
+            try:
+                request = '/api/v1/Dimensions?$select=Name,Hierarchies&$expand=Hierarchies($select=Name,Subsets;$expand=Subsets($select=Name))'
+                response = rest.GET(request)
+                result = json.loads(response.text)['value']
 
-            self._subset_list = []
-            for dimension in result:
-                for hierarchy in dimension['Hierarchies']:
-                    for subset in hierarchy['Subsets']:
-                        self._subset_list.append((dimension['Name'], hierarchy['Name'], subset['Name']))
-        except Exception:
-            logger.exception('Exception occurred when populating subset list')
-            raise
+                self._subset_list = []
+                for dimension in result:
+                    for hierarchy in dimension['Hierarchies']:
+                        for subset in hierarchy['Subsets']:
+                            self._subset_list.append((dimension['Name'], hierarchy['Name'], subset['Name']))
+            except Exception:
+                logger.exception('Exception occurred when populating subset list')
+                raise
 
         # Dimensions & Hierarchies
-        try:
-            request = '/api/v1/Dimensions?$select=Name,UniqueName,Attributes,Hierarchies&$expand=Hierarchies($expand=Elements($count;$top=0);$select=Name)'
-            response = rest.GET(request)
-            result = json.loads(response.text)['value']
+        with self._timer('populate.dimensions_hierarchies'):
+            try:
+                request = '/api/v1/Dimensions?$select=Name,UniqueName,Attributes,Hierarchies&$expand=Hierarchies($expand=Elements($count;$top=0);$select=Name)'
+                response = rest.GET(request)
+                result = json.loads(response.text)['value']
 
-            self._dimension_object = result
+                self._dimension_object = result
 
-            self._hierarchy_list = []
-            for dimension in self._dimension_object:
-                for hierarchy in dimension['Hierarchies']:
-                    self._hierarchy_list.append((dimension['Name'], hierarchy['Name']))
-                # Remove Hierarchies
-                dimension['Hierarchies'] = []
-        except Exception:
-            logger.exception('Exception occurred when populating dimension and hierarchy objects')
-            raise
+                self._hierarchy_list = []
+                self._hierarchy_size = {}
+                for dimension in self._dimension_object:
+                    for hierarchy in dimension['Hierarchies']:
+                        self._hierarchy_list.append((dimension['Name'], hierarchy['Name']))
+                        self._hierarchy_size[(dimension['Name'], hierarchy['Name'])] = hierarchy.get('Elements@odata.count', 0)
+                    # Remove Hierarchies
+                    dimension['Hierarchies'] = []
+            except Exception:
+                logger.exception('Exception occurred when populating dimension and hierarchy objects')
+                raise
 
         # Processes
-        procedures = ['PrologProcedure', 'MetadataProcedure', 'DataProcedure', 'EpilogProcedure']
-        try:
-            processes = self._session.processes.get_all()
-            self._process_object = [json.loads(x._construct_body()) for x in processes]
-
-            autoformat = c.get('autoformat_ti_process', True)
-
-            for process in self._process_object:
-                for procedure in procedures:
-                    if autoformat:
-                        try:
-                            process[procedure] = format_procedure(process[procedure])
-                        except Exception:
-                            logger.warning('Auto formatting of TI process {} failed for {}. Using original formatting'.format(process['Name'], procedure))
-
-                if 'DataSource' in process:
-                    if 'password' in process['DataSource']:
-                        del process['DataSource']['password']
-        except Exception:
-            logger.exception('Exception occurred when populating process objects')
-            raise
+        with self._timer('populate.processes'):
+            try:
+                processes = self._session.processes.get_all()
+                self._process_object = [json.loads(x._construct_body()) for x in processes]
+
+                if c.get('autoformat_ti_process', True):
+                    self._format_processes(self._process_object)
+
+                for process in self._process_object:
+                    if 'DataSource' in process:
+                        if 'password' in process['DataSource']:
+                            del process['DataSource']['password']
+            except Exception:
+                logger.exception('Exception occurred when populating process objects')
+                raise
 
         # Files
-        if c.get('do_file_operations', False):
-            try:
-                process = c.get('file_to_blob_update_process', None)
-                if process:
-                    include = c.get('include_file', '')
-                    if isinstance(include, str):
-                        include = list(include)
+        with self._timer('populate.files'):
+            if c.get('do_file_operations', False):
+                try:
+                    process = c.get('file_to_blob_update_process', None)
+                    if process:
+                        include = c.get('include_file', '')
+                        if isinstance(include, str):
+                            include = list(include)
 
-                    exclude = c.get('exclude_file', '')
-                    if isinstance(exclude, str):
-                        exclude = list(exclude)
+                        exclude = c.get('exclude_file', '')
+                        if isinstance(exclude, str):
+                            exclude = list(exclude)
 
-                    exclude.append('*.pyc')
+                        exclude.append('*.pyc')
 
-                    data = {'Parameters': [
-                        {'Name': 'pInclude', 'Value': json.dumps(include)},
-                        {'Name': 'pExclude', 'Value': json.dumps(exclude)},
-                    ]}
+                        data = {'Parameters': [
+                            {'Name': 'pInclude', 'Value': json.dumps(include)},
+                            {'Name': 'pExclude', 'Value': json.dumps(exclude)},
+                        ]}
 
-                    self._session.processes.execute(process, data)
+                        self._session.processes.execute(process, data)
 
-                request = '/api/v1/Contents(\'Blobs\')/Contents?$select=Name&$filter=startswith(Name, \'tm1cm-\')'
-                response = rest.GET(request)
-                result = json.loads(response.text)['value']
+                    request = '/api/v1/Contents(\'Blobs\')/Contents?$select=Name&$filter=startswith(Name, \'tm1cm-\')'
+                    response = rest.GET(request)
+                    result = json.loads(response.text)['value']
 
-                self._file_list = [base64.b32decode(x['Name'][6:], casefold=True).decode().split('/') for x in result]
-            except Exception:
-                logger.exception('Exception occurred when populating file list')
-                raise
+                    self._file_list = [base64.b32decode(x['Name'][6:], casefold=True).decode().split('/') for x in result]
+                except Exception:
+                    logger.exception('Exception occurred when populating file list')
+                    raise
+
+    def get_timestamp(self, object_type, *names):
+        if object_type == 'view_data' and names[0] in self._cube_timestamps:
+            return '/'.join(self._cube_timestamps[names[0]])
+
+        return None
 
     def connect(self, session_config=None):
         if session_config:
             self._session_config = session_config
 
         if not self._connected:
-            self._session = TM1Service(**self._session_config)
+            self._session = create_session(self._session_config)
 
             self._connected = True
             self._update_config()
 
+    def _prepare_workers(self, max_workers):
+        self.connect()
+
+        # Make sure there are enough pooled connections for every worker to keep its own connection alive
+        set_pool_size(self._session, max_workers)
+
+    def load_inventory(self):
+        """Loads the names of every process, cube, view, dimension, hierarchy, subset and (with do_file_operations) tm1cm
+        blob on the server, unfiltered, into an Inventory that operations use instead of asking the server whether an
+        object exists
+
+        Returns:
+            Inventory: Inventory
+        """
+        logger = logging.getLogger(__name__)
+
+        self.connect()
+
+        rest = self._session._tm1_rest
+        inventory = Inventory()
+
+        try:
+            request = '/api/v1/Processes?$select=Name'
+            for process in json.loads(rest.GET(request).text)['value']:
+                inventory.added('process', process['Name'])
+
+            request = '/api/v1/Cubes?$select=Name&$expand=Dimensions($select=Name),Views($select=Name)'
+            for cube in json.loads(rest.GET(request).text)['value']:
+                inventory.added('cube', cube['Name'], dimensions=[x['Name'] for x in cube['Dimensions']])
+                for view in cube['Views']:
+                    inventory.added('view', cube['Name'], view['Name'])
+
+            request = '/api/v1/Dimensions?$select=Name&$expand=Hierarchies($select=Name;$expand=Subsets($select=Name))'
+            for dimension in json.loads(rest.GET(request).text)['value']:
+                hierarchies = dimension['Hierarchies']
+                inventory.added('dimension', dimension['Name'], hierarchies=[x['Name'] for x in hierarchies])
+                for hierarchy in hierarchies:
+                    for subset in hierarchy['Subsets']:
+                        inventory.added('subset', dimension['Name'], hierarchy['Name'], subset['Name'])
+
+            if self.config.get('do_file_operations', False):
+                request = '/api/v1/Contents(\'Blobs\')/Contents?$select=Name&$filter=startswith(Name, \'tm1cm-\')'
+                for blob in json.loads(rest.GET(request).text)['value']:
+                    inventory.added('blob', blob['Name'])
+        except Exception:
+            logger.exception('Exception occurred when loading the inventory')
+            raise
+
+        logger.info('Loaded inventory of {} objects'.format(len(inventory)))
+
+        self._inventory = inventory
+        return inventory
+
     def _update_config(self):
         request = '/api/v1/Configuration'
         response = self._session._tm1_rest.GET(request)
@@ -550,16 +968,10 @@ class RemoteApplication(Application):
 
         self.connect()
 
-        include = list(self.config.get('include_dimension_hierarchy_element', '*/*'))
-        exclude = list(self.config.get('exclude_dimension_hierarchy_element', ''))
-
-        name_comp = '{}/{}'.format(dimension, hierarchy)
-
-        if any([fnmatch(name_comp, x) for x in include]) and not any([fnmatch(name_comp, x) for x in exclude]):
-            request = '/api/v1/Dimensions(\'{}\')/Hierarchies(\'{}\')?$select=DefaultMember,ElementAttributes,Name,UniqueName,Edges,Elements&$expand=DefaultMember,ElementAttributes,Edges($select=ParentName,ComponentName,Weight),Elements($select=Name,UniqueName,Index,Type,Attributes)'.format(
-                dimension, hierarchy)
+        if self._include_elements(dimension, hierarchy):
+            request = '/api/v1/Dimensions(\'{}\')/Hierarchies(\'{}\')?$select={}&$expand={}'.format(dimension, hierarchy, HIERARCHY_SELECT, HIERARCHY_EXPAND)
         else:
-            request = '/api/v1/Dimensions(\'{}\')/Hierarchies(\'{}\')?$select=DefaultMember,ElementAttributes,Name,UniqueName&$expand=DefaultMember,ElementAttributes'.format(dimension, hierarchy)
+            request = '/api/v1/Dimensions(\'{}\')/Hierarchies(\'{}\')?$select={}&$expand={}'.format(dimension, hierarchy, HIERARCHY_SELECT_NO_ELEMENTS, HIERARCHY_EXPAND_NO_ELEMENTS)
 
         try:
             response = self._session._tm1_rest.GET(request)
@@ -567,23 +979,108 @@ class RemoteApplication(Application):
             if '@odata.context' in result:
                 del result['@odata.context']
 
-            result.setdefault('Elements', [])
-            result.setdefault('Edges', [])
-            result.setdefault('Subsets', [])
+            return self._clean_hierarchy(dimension, result)
+        except Exception:
+            logger.exception('Unable to get dimension hierarchy {}/{}'.format(dimension, hierarchy))
+            raise
+
+    def get_hierarchies(self, hierarchy_list):
+        if not self.config.get('bulk_hierarchy_export', False):
+            return super().get_hierarchies(hierarchy_list)
 
-            for element in result['Elements']:
-                element.pop('Index')
-                element.pop('UniqueName')
+        return self._get_hierarchies_bulk(hierarchy_list)
 
-            result.pop('DefaultMember')
+    def _get_hierarchies_bulk(self, hierarchy_list):
+        self.connect()
 
-            self._filter_hierarchy(dimension, result)
+        chunk_size = int(self.config.get('bulk_hierarchy_chunk_size', 100000))
 
-            return result
+        # Hierarchies with and without elements need different $select/$expand options, so they are never mixed in a chunk
+        chunks = []
+        for include_elements in (True, False):
+            chunk = []
+            chunk_elements = 0
+            for dimension, hierarchy in hierarchy_list:
+                if self._include_elements(dimension, hierarchy) != include_elements:
+                    continue
+
+                elements = self._hierarchy_size.get((dimension, hierarchy), 0) if include_elements else 0
+                if chunk and (chunk_elements + elements > chunk_size or len(chunk) >= BULK_HIERARCHY_MAX_COUNT):
+                    chunks.append((chunk, include_elements))
+                    chunk = []
+                    chunk_elements = 0
+
+                chunk.append((dimension, hierarchy))
+                chunk_elements += elements
+
+            if chunk:
+                chunks.append((chunk, include_elements))
+
+        for _, results in self._fetch_all(self._get_hierarchy_chunk, chunks):
+            for item, result in results:
+                yield item, result
+
+    def _get_hierarchy_chunk(self, chunk, include_elements):
+        logger = logging.getLogger(__name__)
+
+        dimensions = sorted(set(x[0] for x in chunk))
+        hierarchies = sorted(set(x[1] for x in chunk))
+
+        if include_elements:
+            select, expand = HIERARCHY_SELECT, HIERARCHY_EXPAND
+        else:
+            select, expand = HIERARCHY_SELECT_NO_ELEMENTS, HIERARCHY_EXPAND_NO_ELEMENTS
+
+        request = '/api/v1/Dimensions?$select=Name&$filter={}&$expand=Hierarchies($select={};$filter={};$expand={})'.format(
+            _odata_name_filter(dimensions), select, _odata_name_filter(hierarchies), expand)
+
+        try:
+            response = self._session._tm1_rest.GET(request)
+            result = json.loads(response.text)['value']
         except Exception:
-            logger.exception('Unable to get dimension hierarchy {}/{}'.format(dimension, hierarchy))
+            logger.exception('Unable to get dimension hierarchies {}'.format(', '.join('/'.join(x) for x in chunk)))
             raise
 
+        # The name filters can match more combinations than were asked for, so only keep the requested hierarchies
+        found = {}
+        for dimension in result:
+            for hierarchy in dimension['Hierarchies']:
+                for key in [x for x in hierarchy if x.startswith('@odata.')]:
+                    del hierarchy[key]
+                found[(dimension['Name'], hierarchy['Name'])] = hierarchy
+
+        results = []
+        for dimension, hierarchy in chunk:
+            if (dimension, hierarchy) in found:
+                results.append(((dimension, hierarchy), self._clean_hierarchy(dimension, found[(dimension, hierarchy)])))
+            else:
+                results.append(((dimension, hierarchy), self.get_hierarchy(dimension, hierarchy)))
+
+        return results
+
+    def _include_elements(self, dimension, hierarchy):
+        include = list(self.config.get('include_dimension_hierarchy_element', '*/*'))
+        exclude = list(self.config.get('exclude_dimension_hierarchy_element', ''))
+
+        name_comp = '{}/{}'.format(dimension, hierarchy)
+
+        return any([fnmatch(name_comp, x) for x in include]) and not any([fnmatch(name_comp, x) for x in exclude])
+
+    def _clean_hierarchy(self, dimension, result):
+        result.setdefault('Elements', [])
+        result.setdefault('Edges', [])
+        result.setdefault('Subsets', [])
+
+        for element in result['Elements']:
+            element.pop('Index')
+            element.pop('UniqueName')
+
+        result.pop('DefaultMember')
+
+        self._filter_hierarchy(dimension, result)
+
+        return result
+
     def get_file(self, file):
         logger = logging.getLogger(__name__)
 
@@ -640,6 +1137,55 @@ class RemoteApplication(Application):
             logger.error('Unable to get cube view data for cube={} and view={}'.format(cube, view))
             raise
 
+    def iter_view_data(self, cube, view):
+        """Yields the rows of the view data of a view. When view_data_page_size is set, the cellset is read in pages
+        of that many cells, so only one page is held in memory at a time
+        """
+        logger = logging.getLogger(__name__)
+
+        page_size = int(self.config.get('view_data_page_size', 0) or 0)
+        if page_size <= 0:
+            yield from self.get_view_data(cube, view)
+            return
+
+        self.connect()
+
+        cell_service = self._session.cubes.cells
+        rest = self._session._tm1_rest
+        try:
+            try:
+                request = '/api/v1/Cubes(\'{}\')/tm1.Unlock'.format(cube)
+                rest.POST(request)
+                locked = True
+            except Exception:
+                locked = False
+
+            cellset_id = cell_service.create_cellset_from_view(cube, view, False)
+            try:
+                metadata = cell_service.extract_cellset_metadata_raw(cellset_id, elem_properties=['UniqueName'], member_properties=['UniqueName'])
+
+                skip = 0
+                while True:
+                    cells = cell_service.extract_cellset_cells_raw(cellset_id, cell_properties=['Value', 'Updateable', 'Ordinal'], top=page_size, skip=skip)['Cells']
+
+                    data = build_content_from_cellset_dict({**metadata, 'Cells': cells})
+                    for k, v in data.items():
+                        if not v['Updateable'] & 0x10000000:
+                            yield [*k, v['Value']]
+
+                    if len(cells) < page_size:
+                        break
+                    skip += page_size
+            finally:
+                cell_service.delete_cellset(cellset_id)
+
+            if locked:
+                request = '/api/v1/Cubes(\'{}\')/tm1.Lock'.format(cube)
+                rest.POST(request)
+        except Exception:
+            logger.error('Unable to get cube view data for cube={} and view={}'.format(cube, view))
+            raise
+
     def _construct_empty_view(self, cube, view):
         logger = logging.getLogger(__name__)
 
@@ -674,6 +1220,128 @@ class RemoteApplication(Application):
             raise
 
 
+def create_remote_application(config, session=None, session_config=None, path=None, read_snapshot=False):
+    """Returns an AsyncRemoteApplication when async_remote is enabled, otherwise a RemoteApplication"""
+    if config.get('async_remote', False):
+        from tm1cm.async_application import AsyncRemoteApplication
+        return AsyncRemoteApplication(config, session, session_config, path, read_snapshot)
+
+    return RemoteApplication(config, session, session_config, path, read_snapshot)
+
+
+def _odata_name_filter(names):
+    return ' or '.join('Name eq \'{}\''.format(name.replace('\'', '\'\'')) for name in names)
+
+
+def _view_file(cube_name, view_name):
+    return os.path.join('data', 'view', cube_name, '{}.view'.format(view_name))
+
+
+def _view_data_file(cube_name, view_name):
+    return os.path.join('data', 'view_data', cube_name, '{}.view_data'.format(view_name))
+
+
+def _subset_file(dimension_name, hierarchy_name, subset_name):
+    return os.path.join('data', 'subset', dimension_name, hierarchy_name, '{}.subset'.format(subset_name))
+
+
+def _hierarchy_file(dimension_name, hierarchy_name):
+    return os.path.join('data', 'hierarchy', dimension_name, '{}.hierarchy'.format(hierarchy_name))
+
+
+def _object_class(name):
+    """Returns the object class of a file written by to_local, e.g. 'hierarchy' for data/hierarchy/a/b.hierarchy"""
+    parts = name.split(os.sep)
+    return parts[1] if parts[0] == 'data' and len(parts) > 2 else parts[0]
+
+
+def _by_name(objects):
+    if isinstance(objects, LazyObjects):
+        return objects
+    return {x['Name']: x for x in objects}
+
+
+def _filter_objects(objects, include, exclude):
+    if isinstance(objects, LazyObjects):
+        return objects.filter(include, exclude)
+    return filter_list(objects, include, exclude, name_func=lambda x, extra: x['Name'])
+
+
+def _hierarchy_to_columnar(hierarchy):
+    """Converts a hierarchy to the columnar file format: element names, types and every attribute are stored as
+    parallel lists, and edges as lists of element indexes. Hierarchies that cannot be represented exactly (e.g. edges
+    to elements that are not in the hierarchy) are returned unchanged
+
+    Args:
+        hierarchy (dict): Hierarchy, as returned by get_hierarchy
+
+    Returns:
+        dict: Hierarchy in columnar format
+    """
+    elements = hierarchy['Elements']
+    index = {element['Name']: i for i, element in enumerate(elements)}
+
+    attribute_names = sorted({key for element in elements for key in element['Attributes']})
+    if len(index) != len(elements) or any(set(element) != {'Name', 'Type', 'Attributes'} or len(element['Attributes']) != len(attribute_names) for element in elements):
+        return hierarchy
+
+    edges = hierarchy['Edges']
+    if any(set(edge) != {'ParentName', 'ComponentName', 'Weight'} or edge['ParentName'] not in index or edge['ComponentName'] not in index for edge in edges):
+        return hierarchy
+
+    result = {key: value for key, value in hierarchy.items() if key not in ['Elements', 'Edges']}
+    result['Format'] = HIERARCHY_FORMAT_COLUMNAR
+    result['Elements'] = {
+        'Name': FlowList(element['Name'] for element in elements),
+        'Type': FlowList(element['Type'] for element in elements),
+        'Attributes': {name: FlowList(element['Attributes'][name] for element in elements) for name in attribute_names},
+    }
+    result['Edges'] = {
+        'Parent': FlowList(index[edge['ParentName']] for edge in edges),
+        'Component': FlowList(index[edge['ComponentName']] for edge in edges),
+        'Weight': FlowList(edge['Weight'] for edge in edges),
+    }
+
+    return result
+
+
+def _hierarchy_from_columnar(hierarchy):
+    """Converts a hierarchy in columnar file format back to the standard format. Hierarchies in the standard format
+    are returned unchanged
+    """
+    if hierarchy.get('Format') != HIERARCHY_FORMAT_COLUMNAR:
+        return hierarchy
+
+    result = {key: value for key, value in hierarchy.items() if key not in ['Format', 'Elements', 'Edges']}
+
+    elements = hierarchy['Elements']
+    names = elements['Name']
+    attributes = elements['Attributes']
+    result['Elements'] = [{
+        'Name': name,
+        'Type': element_type,
+        'Attributes': {key: values[i] for key, values in attributes.items()},
+    } for i, (name, element_type) in enumerate(zip(names, elements['Type']))]
+
+    edges = hierarchy['Edges']
+    result['Edges'] = [{
+        'ParentName': names[parent],
+        'ComponentName': names[component],
+        'Weight': weight,
+    } for parent, component, weight in zip(edges['Parent'], edges['Component'], edges['Weight'])]
+
+    return result
+
+
+def _format_procedure(text):
+    """Formats a TI procedure, returning None if it cannot be formatted. Module level so it can run in a worker
+    process"""
+    try:
+        return format_procedure(text)
+    except Exception:
+        return None
+
+
 class LocalApplication(Application):
 
     def __init__(self, config, path):
@@ -685,143 +1353,167 @@ class LocalApplication(Application):
         logger = logging.getLogger(__name__)
         c = self.config
 
+        lazy = c.get('lazy_load', False)
+
         # Cubes & Rules
-        try:
-            result = []
-            path = os.path.join(self.path, 'data', 'cube', '*.cube')
-            for filename in iglob(path):
-                with open(filename, 'rb') as fp:
-                    result.append(self.load(fp))
-
-            self._cube_object = result
-
-            result = []
-            path = os.path.join(self.path, 'data', 'rule', '*.rule')
-            for filename in iglob(path):
-                with open(filename, 'rb') as fp:
-                    _, name = os.path.split(filename)
-                    name = os.path.splitext(name)[0]
-                    result.append({'Name': name, 'Rules': fp.read().decode('utf8')})
-
-            self._rule_object = result
-        except Exception:
-            logger.exception('Exception occurred when populating cube and rule objects')
-            raise
+        with self._timer('populate.cubes_rules'):
+            try:
+                self._cube_object = self._load_objects('cube', self._load_cube, lazy)
+                self._rule_object = self._load_objects('rule', self._load_rule, lazy)
+            except Exception:
+                logger.exception('Exception occurred when populating cube and rule objects')
+                raise
 
         # Views
-        try:
-            result = []
-            view_path = os.path.join(self.path, 'data', 'view')
-            path = os.path.join(view_path, '**', '*.view')
-            for filename in iglob(path, recursive=True):
-                if os.path.isfile(filename):
-                    result.append(filename[len(view_path) + 1:-5].split(os.sep))
-
-                self._view_list = result
-        except Exception:
-            logger.exception('Exception occurred when populating view objects')
-            raise
+        with self._timer('populate.views'):
+            try:
+                result = []
+                view_path = os.path.join(self.path, 'data', 'view')
+                path = os.path.join(view_path, '**', '*.view')
+                for filename in iglob(path, recursive=True):
+                    if os.path.isfile(filename):
+                        result.append(filename[len(view_path) + 1:-5].split(os.sep))
+
+                    self._view_list = result
+            except Exception:
+                logger.exception('Exception occurred when populating view objects')
+                raise
 
         # View Data
-        try:
-            result = []
-            view_path = os.path.join(self.path, 'data', 'view_data')
-            path = os.path.join(view_path, '**', '*.view_data')
-            for filename in iglob(path, recursive=True):
-                if os.path.isfile(filename):
-                    result.append(filename[len(view_path) + 1:-10].split(os.sep))
-
-                self._view_data_list = result
-        except Exception:
-            logger.exception('Exception occurred when populating view data objects')
-            raise
+        with self._timer('populate.view_data'):
+            try:
+                result = []
+                view_path = os.path.join(self.path, 'data', 'view_data')
+                path = os.path.join(view_path, '**', '*.view_data')
+                for filename in iglob(path, recursive=True):
+                    if os.path.isfile(filename):
+                        result.append(filename[len(view_path) + 1:-10].split(os.sep))
+
+                    self._view_data_list = result
+            except Exception:
+                logger.exception('Exception occurred when populating view data objects')
+                raise
 
         # Subsets
-        try:
-            result = []
-            subset_path = os.path.join(self.path, 'data', 'subset')
-            path = os.path.join(subset_path, '**', '*.subset')
-            for filename in iglob(path, recursive=True):
-                if os.path.isfile(filename):
-                    result.append(filename[len(subset_path) + 1:-7].split(os.sep))
-            self._subset_list = result
-        except Exception:
-            logger.exception('Exception occurred when populating subset objects')
-            raise
+        with self._timer('populate.subsets'):
+            try:
+                result = []
+                subset_path = os.path.join(self.path, 'data', 'subset')
+                path = os.path.join(subset_path, '**', '*.subset')
+                for filename in iglob(path, recursive=True):
+                    if os.path.isfile(filename):
+                        result.append(filename[len(subset_path) + 1:-7].split(os.sep))
+                self._subset_list = result
+            except Exception:
+                logger.exception('Exception occurred when populating subset objects')
+                raise
 
         # Dimensions & Hierarchies
-        try:
-            result = []
-            path = os.path.join(self.path, 'data', 'dimension', '*.dimension')
-            for filename in iglob(path):
-                with open(filename, 'rb') as fp:
-                    result.append(self.load(fp))
-            self._dimension_object = result
-
-            result = []
-            hierarchy_path = os.path.join(self.path, 'data', 'hierarchy')
-            path = os.path.join(hierarchy_path, '**', '*.hierarchy')
-            for filename in iglob(path, recursive=True):
-                if os.path.isfile(filename):
-                    result.append(filename[len(hierarchy_path) + 1:-10].split(os.sep))
-            self._hierarchy_list = result
-        except Exception:
-            logger.exception('Exception occurred when populating dimension and hierarchy objects')
-            raise
+        with self._timer('populate.dimensions_hierarchies'):
+            try:
+                self._dimension_object = self._load_objects('dimension', self._load_dimension, lazy)
+
+                result = []
+                hierarchy_path = os.path.join(self.path, 'data', 'hierarchy')
+                path = os.path.join(hierarchy_path, '**', '*.hierarchy')
+                for filename in iglob(path, recursive=True):
+                    if os.path.isfile(filename):
+                        result.append(filename[len(hierarchy_path) + 1:-10].split(os.sep))
+                self._hierarchy_list = result
+            except Exception:
+                logger.exception('Exception occurred when populating dimension and hierarchy objects')
+                raise
 
         # Processes
-        try:
-            result = []
-            path = os.path.join(self.path, 'data', 'process', '*.process')
+        with self._timer('populate.processes'):
+            try:
+                # Processes loaded together are formatted in one batch
+                autoformat = self._format_processes if c.get('autoformat_ti_process', True) else None
+                self._process_object = self._load_objects('process', self._load_process, lazy, autoformat)
+            except Exception:
+                logger.exception('Exception occurred when populating process objects')
+                raise
 
-            overlay_options = []
-            if c.get('include_ti_queue', False):
-                overlay_options.append('queue')
-            if c.get('include_ti_overlay', False):
-                overlay_options.append('metrics')
+        # Files
+        with self._timer('populate.files'):
+            try:
+                result = []
+                for folder in ['files', 'scripts']:
+                    path = os.path.join(self.path, folder, '**', '*')
+                    for filename in iglob(path, recursive=True):
+                        if os.path.isfile(filename):
+                            result.append(filename[len(self.path) + 1:].split(os.sep))
+
+                self._file_list = result
+            except Exception:
+                logger.exception('Exception occurred when populating dimension and hierarchy objects')
+                raise
 
-            autoformat = c.get('autoformat_ti_process', True)
+    def _load_objects(self, object_type, loader, lazy, prepare=None):
+        """Loads every object of a type from the data folder. When lazy is set only the object names are read, and
+        the objects are loaded on first access
 
-            for filename in iglob(path):
-                with open(filename, 'rb') as fp:
-                    process_text = fp.read().decode('utf8')
-                    process_properties = self.load(self._get_process_text(process_text, 'PropertiesProcedure'))
+        Args:
+            object_type (str): Object type, which is also the name of the folder and the file extension
+            loader (callable): Called as loader(name), returns the object
+            lazy (bool): Return a LazyObjects mapping instead of a list
+            prepare (callable): Optional, called with every list of objects loaded together, e.g. to format them
 
-                    for procedure in ['PrologProcedure', 'MetadataProcedure', 'DataProcedure', 'EpilogProcedure']:
-                        procedure_text = self._get_process_text(process_text, procedure)
+        Returns:
+            list|LazyObjects: Objects
+        """
+        path = os.path.join(self.path, 'data', object_type, '*.{}'.format(object_type))
+        names = [os.path.splitext(os.path.basename(filename))[0] for filename in iglob(path)]
 
-                        if autoformat:
-                            try:
-                                procedure_text = format_procedure(procedure_text)
-                            except Exception:
-                                logger.warning('Auto formatting of TI process {} failed for {}. Using original formatting'.format(process_properties['Name'], procedure))
+        def load(names):
+            result = [loader(name) for name in names]
+            if prepare:
+                prepare(result)
 
-                        process_properties[procedure] = procedure_text
+            return result
 
-                    if 'DataSource' in process_properties:
-                        if 'password' in process_properties['DataSource']:
-                            del process_properties['DataSource']['password']
+        if lazy:
+            return LazyObjects(names, load)
 
-                    result.append(process_properties)
+        return load(names)
 
-            self._process_object = result
-        except Exception:
-            logger.exception('Exception occurred when populating process objects')
-            raise
+    def _read_known(self, name, known):
+        digest = known.get('/'.join(name.split(os.sep))) if known and self.config.get('lazy_load', False) else None
+        if digest is None:
+            return None
 
-        # Files
-        try:
-            result = []
-            for folder in ['files', 'scripts']:
-                path = os.path.join(self.path, folder, '**', '*')
-                for filename in iglob(path, recursive=True):
-                    if os.path.isfile(filename):
-                        result.append(filename[len(self.path) + 1:].split(os.sep))
+        with open(os.path.join(self.path, name), 'rb') as fp:
+            data = fp.read()
 
-            self._file_list = result
-        except Exception:
-            logger.exception('Exception occurred when populating dimension and hierarchy objects')
-            raise
+        # A file with the same content as the caller's copy needs no loading, only files that differ are loaded
+        return data if hashlib.sha256(data).digest() == digest else None
+
+    def _load_cube(self, name):
+        with open(os.path.join(self.path, 'data', 'cube', '{}.cube'.format(name)), 'rb') as fp:
+            return self.load(fp)
+
+    def _load_rule(self, name):
+        with open(os.path.join(self.path, 'data', 'rule', '{}.rule'.format(name)), 'rb') as fp:
+            return {'Name': name, 'Rules': fp.read().decode('utf8')}
+
+    def _load_dimension(self, name):
+        with open(os.path.join(self.path, 'data', 'dimension', '{}.dimension'.format(name)), 'rb') as fp:
+            return self.load(fp)
+
+    def _load_process(self, name):
+        with open(os.path.join(self.path, 'data', 'process', '{}.process'.format(name)), 'rb') as fp:
+            process_text = fp.read().decode('utf8')
+
+        process_properties = self.load(self._get_process_text(process_text, 'PropertiesProcedure'))
+
+        for procedure in ['PrologProcedure', 'MetadataProcedure', 'DataProcedure', 'EpilogProcedure']:
+            process_properties[procedure] = self._get_process_text(process_text, procedure)
+
+        if 'DataSource' in process_properties:
+            if 'password' in process_properties['DataSource']:
+                del process_properties['DataSource']['password']
+
+        return process_properties
 
     def get_hierarchy(self, dimension, hierarchy):
         logger = logging.getLogger(__name__)
@@ -831,7 +1523,7 @@ class LocalApplication(Application):
 
         try:
             with open(os.path.join(path, filename), 'rb') as fp:
-                result = self.load(fp)
+                result = _hierarchy_from_columnar(self.load(fp))
 
                 self._filter_hierarchy(dimension, result)
                 return result
@@ -875,6 +1567,19 @@ class LocalApplication(Application):
             logger.exception('Unable to get cube view data {}/{}'.format(cube, view))
             raise
 
+    def iter_view_data(self, cube, view):
+        """Yields the rows of the view data of a view, reading the file as rows are consumed"""
+        logger = logging.getLogger(__name__)
+
+        path = os.path.join(self.path, 'data', 'view_data', cube, '{}.view_data'.format(view))
+
+        try:
+            with open(path, 'r', encoding='utf8') as fp:
+                yield from self.load_rows(fp)
+        except Exception:
+            logger.exception('Unable to get cube view data {}/{}'.format(cube, view))
+            raise
+
     def get_subset(self, dimension, hierarchy, subset):
         logger = logging.getLogger(__name__)
 
@@ -916,6 +1621,16 @@ class LocalApplication(Application):
         return process_text
 
 
+HIERARCHY_SELECT = 'DefaultMember,ElementAttributes,Name,UniqueName,Edges,Elements'
+HIERARCHY_EXPAND = 'DefaultMember,ElementAttributes,Edges($select=ParentName,ComponentName,Weight),Elements($select=Name,UniqueName,Index,Type,Attributes)'
+HIERARCHY_SELECT_NO_ELEMENTS = 'DefaultMember,ElementAttributes,Name,UniqueName'
+HIERARCHY_EXPAND_NO_ELEMENTS = 'DefaultMember,ElementAttributes'
+
+HIERARCHY_FORMAT_COLUMNAR = 'columnar'
+
+# Upper bound on hierarchies per bulk request, keeps the $filter clause (and URL) at a sensible length
+BULK_HIERARCHY_MAX_COUNT = 50
+
 PROPERTIES_BEGIN = """
 # =-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-= #
 # BEGIN: PROPERTIES                                                           #
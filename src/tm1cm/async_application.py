@@ -0,0 +1,210 @@
+import asyncio
+import json
+import logging
+import ssl
+import time
+
+from TM1py.Objects.NativeView import NativeView
+from TM1py.Objects.Subset import Subset
+from TM1py.Utils.Utils import build_content_from_cellset_dict, format_url
+
+from tm1cm import profiler
+from tm1cm.application import HIERARCHY_EXPAND, HIERARCHY_EXPAND_NO_ELEMENTS, HIERARCHY_SELECT, HIERARCHY_SELECT_NO_ELEMENTS, RemoteApplication
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    aiohttp = None
+
+VIEW_REQUEST = "/api/v1/Cubes('{}')/Views('{}')?$expand=" \
+               "tm1.NativeView/Rows/Subset($expand=Hierarchy($select=Name;$expand=Dimension($select=Name)),Elements($select=Name);$select=Expression,UniqueName,Name, Alias),  " \
+               "tm1.NativeView/Columns/Subset($expand=Hierarchy($select=Name;$expand=Dimension($select=Name)),Elements($select=Name);$select=Expression,UniqueName,Name,Alias), " \
+               "tm1.NativeView/Titles/Subset($expand=Hierarchy($select=Name;$expand=Dimension($select=Name)),Elements($select=Name);$select=Expression,UniqueName,Name,Alias), " \
+               "tm1.NativeView/Titles/Selected($select=Name)"
+
+SUBSET_REQUEST = "/api/v1/Dimensions('{}')/Hierarchies('{}')/Subsets('{}')?$expand=Hierarchy($select=Dimension,Name),Elements($select=Name)&$select=*,Alias"
+
+CELLSET_REQUEST = "/api/v1/Cellsets('{}')?$expand=" \
+                  "Cube($select=Name;$expand=Dimensions($select=Name))," \
+                  "Axes($expand=Tuples($expand=Members($select=UniqueName;$expand=Element($select=UniqueName))))," \
+                  "Cells($select=Value,Updateable)"
+
+
+class AsyncRemoteApplication(RemoteApplication):
+    """RemoteApplication that fetches hierarchies, views, view data and subsets with asyncio, from a single thread, with
+    up to async_concurrency requests in flight. Logging in and all other requests go through the TM1py session, so
+    this can be used anywhere a RemoteApplication is used. Requires aiohttp
+    """
+
+    def __init__(self, config, session=None, session_config=None, path=None, read_snapshot=False):
+        if aiohttp is None:
+            raise ImportError('AsyncRemoteApplication requires aiohttp (pip install tm1cm[async])')
+
+        super().__init__(config, session, session_config, path, read_snapshot)
+
+    def __repr__(self):
+        return '<AsyncRemoteApplication ({})>'.format(self.__str__())
+
+    def _fetch_all(self, func, items):
+        coroutines = {
+            self.get_hierarchy: self.get_hierarchy_async,
+            self.get_view: self.get_view_async,
+            self.get_view_data: self.get_view_data_async,
+            self.get_subset: self.get_subset_async,
+        }
+
+        coroutine = coroutines.get(func)
+        if coroutine is None:
+            return super()._fetch_all(func, items)
+
+        return self._run_all(coroutine, items)
+
+    def _run_all(self, coroutine, items):
+        """Runs coroutine for every item on an event loop, yielding (item, result) in the order of items. Items are
+        started a window at a time, so results do not pile up faster than they are consumed
+        """
+        self.connect()
+
+        items = list(items)
+        if not items:
+            return
+
+        concurrency = int(self.config.get('async_concurrency', 32) or 1)
+        window = concurrency * 4
+
+        loop = asyncio.new_event_loop()
+        try:
+            client = loop.run_until_complete(self._open_client(concurrency))
+            try:
+                for start in range(0, len(items), window):
+                    chunk = items[start:start + window]
+                    results = loop.run_until_complete(_gather(coroutine, client, chunk))
+                    yield from zip(chunk, results)
+            finally:
+                loop.run_until_complete(client.close())
+        finally:
+            loop.close()
+
+    async def _open_client(self, concurrency):
+        return _Client(self._session._tm1_rest, concurrency)
+
+    async def get_hierarchy_async(self, client, dimension, hierarchy):
+        logger = logging.getLogger(__name__)
+
+        if self._include_elements(dimension, hierarchy):
+            request = '/api/v1/Dimensions(\'{}\')/Hierarchies(\'{}\')?$select={}&$expand={}'.format(dimension, hierarchy, HIERARCHY_SELECT, HIERARCHY_EXPAND)
+        else:
+            request = '/api/v1/Dimensions(\'{}\')/Hierarchies(\'{}\')?$select={}&$expand={}'.format(dimension, hierarchy, HIERARCHY_SELECT_NO_ELEMENTS, HIERARCHY_EXPAND_NO_ELEMENTS)
+
+        try:
+            result = json.loads(await client.request('GET', request))
+            if '@odata.context' in result:
+                del result['@odata.context']
+
+            return self._clean_hierarchy(dimension, result)
+        except Exception:
+            logger.exception('Unable to get dimension hierarchy {}/{}'.format(dimension, hierarchy))
+            raise
+
+    async def get_view_async(self, client, cube, view):
+        logger = logging.getLogger(__name__)
+
+        try:
+            text = await client.request('GET', format_url(VIEW_REQUEST, cube, view))
+            return json.loads(NativeView.from_json(text, cube).body)
+        except Exception:
+            logger.error('Unable to get cube view {}/{}, because it is invalid. Using default view'.format(cube, view))
+            return await asyncio.get_running_loop().run_in_executor(None, self._construct_empty_view, cube, view)
+
+    async def get_view_data_async(self, client, cube, view):
+        logger = logging.getLogger(__name__)
+
+        try:
+            try:
+                await client.request('POST', '/api/v1/Cubes(\'{}\')/tm1.Unlock'.format(cube))
+                locked = True
+            except Exception:
+                locked = False
+
+            response = await client.request('POST', format_url("/api/v1/Cubes('{}')/Views('{}')/tm1.Execute", cube, view))
+            cellset_id = json.loads(response)['ID']
+            try:
+                cellset = json.loads(await client.request('GET', CELLSET_REQUEST.format(cellset_id)))
+            finally:
+                await client.request('DELETE', "/api/v1/Cellsets('{}')".format(cellset_id))
+
+            data = build_content_from_cellset_dict(cellset)
+            restructed_data = [[*k, v['Value']] for k, v in data.items() if not v['Updateable'] & 0x10000000]
+
+            if locked:
+                await client.request('POST', '/api/v1/Cubes(\'{}\')/tm1.Lock'.format(cube))
+
+            return restructed_data
+        except Exception:
+            logger.error('Unable to get cube view data for cube={} and view={}'.format(cube, view))
+            raise
+
+    async def get_subset_async(self, client, dimension, hierarchy, subset):
+        logger = logging.getLogger(__name__)
+
+        try:
+            text = await client.request('GET', format_url(SUBSET_REQUEST, dimension, hierarchy, subset))
+            return Subset.from_dict(json.loads(text)).body_as_dict
+        except Exception:
+            logger.exception('Unable to get subset {}/{}/{}'.format(dimension, hierarchy, subset))
+            raise
+
+
+async def _gather(coroutine, client, items):
+    return await asyncio.gather(*(coroutine(client, *item) for item in items))
+
+
+class _Client:
+    """aiohttp session that shares the login, headers and settings of a TM1py session, and limits the number of
+    requests in flight
+    """
+
+    def __init__(self, tm1_rest, concurrency):
+        self._base_url = tm1_rest._base_url
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+        verify = tm1_rest._verify
+        if isinstance(verify, str):
+            verify = ssl.create_default_context(cafile=verify)
+        elif verify:
+            verify = None
+
+        timeout = aiohttp.ClientTimeout(total=tm1_rest._timeout)
+        connector = aiohttp.TCPConnector(limit=concurrency, ssl=verify)
+
+        auth = tm1_rest._s.auth
+        if isinstance(auth, tuple):
+            auth = aiohttp.BasicAuth(*auth)
+
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={**tm1_rest._s.headers, **tm1_rest._headers},
+            cookies={cookie.name: cookie.value for cookie in tm1_rest._s.cookies},
+            auth=auth)
+
+    async def request(self, method, request, data=''):
+        """Sends a request, returns the response text. Raises an exception if the request was not successful"""
+        url = URL(self._base_url + request.replace(' ', '%20'), encoded=True)
+        body = data.encode('utf8')
+
+        async with self._semaphore:
+            start = time.perf_counter()
+            async with self._session.request(method, url, data=body) as response:
+                text = await response.text()
+
+                profiler.add_request(method, request, len(body), len(text.encode('utf8')), time.perf_counter() - start, response.status)
+
+                if response.status >= 400:
+                    raise RuntimeError('{} {} failed with status {}: {}'.format(method, request, response.status, text))
+
+                return text
+
+    async def close(self):
+        await self._session.close()
@@ -1,9 +1,21 @@
+import json
 import logging
 import os
-from fnmatch import fnmatch
+import re
+from collections.abc import Mapping
+from fnmatch import translate
+from functools import lru_cache
 
 import yaml
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Use libyaml to parse YAML when PyYAML was built with it
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 
 def get_config(path, config_name, environment=None):
     logger = logging.getLogger(__name__)
@@ -43,46 +55,257 @@ def filter_list(lst, include, exclude, name_func=None, filter_func=None, extra={
         def name_func(obj, extra={}):
             return str(obj)
 
-    if not filter_func:
-        def filter_func(obj, pattern, extra={}):
-            result = fnmatch(name_func(obj, extra), pattern)
-            return result
+    if filter_func:
+        return _filter_list_with_func(lst, include, exclude, name_func, filter_func, extra)
+
+    pattern_filter = get_filter(include, exclude)
+
+    if isinstance(lst, dict):
+        return {key: val for key, val in lst.items() if pattern_filter.match(name_func((key, val), extra))}
+    else:
+        return [obj for obj in lst if pattern_filter.match(name_func(obj, extra))]
+
 
+def _filter_list_with_func(lst, include, exclude, name_func, filter_func, extra):
     if not isinstance(include, list):
         include = [include]
     if not isinstance(exclude, list):
         exclude = [exclude]
 
-    if isinstance(lst, dict):
-        iterator = lst.items()
-    else:
-        iterator = lst
-
-    include_list = []
-    for obj in iterator:
-        obj_name = name_func(obj, extra)
-        for pattern in include:
-            if filter_func(obj, pattern, extra):
-                include_list.append(obj_name)
-                break
-
-    exclude_list = []
-    for obj in iterator:
-        obj_name = name_func(obj, extra)
-        for pattern in exclude:
-            if filter_func(obj, pattern, extra):
-                exclude_list.append(obj_name)
-                break
-
-    name_list = set(include_list) - set(exclude_list)
+    def keep(obj):
+        return any(filter_func(obj, pattern, extra) for pattern in include) and not any(filter_func(obj, pattern, extra) for pattern in exclude)
 
     if isinstance(lst, dict):
-        return {key: val for key, val in lst.items() if name_func((key, val), extra) in name_list}
+        return {key: val for key, val in lst.items() if keep((key, val))}
     else:
-        return [obj for obj in iterator if name_func(obj, extra) in name_list]
+        return [obj for obj in lst if keep(obj)]
+
+
+def get_filter(include, exclude):
+    """Returns a compiled Filter for a set of include and exclude patterns. Filters are cached, so the patterns of a
+    config key are only compiled once
+
+    Args:
+        include (str|list): Include pattern(s)
+        exclude (str|list): Exclude pattern(s)
+    """
+    if not isinstance(include, list):
+        include = [include]
+    if not isinstance(exclude, list):
+        exclude = [exclude]
+
+    return _get_filter(tuple(include), tuple(exclude))
+
+
+@lru_cache(maxsize=256)
+def _get_filter(include, exclude):
+    return Filter(include, exclude)
+
+
+class Filter:
+    """Matches names against include and exclude fnmatch patterns. All patterns are translated into one regular
+    expression for includes and one for excludes, so a name is classified with at most two regex matches
+    """
+
+    def __init__(self, include, exclude):
+        self._include = self._compile(include)
+        self._exclude = self._compile(exclude)
+
+    @staticmethod
+    def _compile(patterns):
+        patterns = [os.path.normcase(str(x)) for x in patterns if x is not None]
+        if not patterns:
+            return None
+
+        return re.compile('|'.join(translate(x) for x in patterns))
+
+    def match(self, name):
+        name = os.path.normcase(name)
+
+        if not self._include or not self._include.match(name):
+            return False
+
+        return not (self._exclude and self._exclude.match(name))
+
+
+class LazyObjects(Mapping):
+    """Read-only {name: object} mapping where objects are only loaded, by calling loader(names) with a list of names,
+    when first accessed. loader returns the objects in the same order. Loaded objects are kept, so every object is
+    loaded at most once
+    """
+
+    def __init__(self, names, loader):
+        self._names = list(names)
+        self._keys = set(self._names)
+        self._loader = loader
+        self._objects = {}
+        self._funcs = []
+
+    def __getitem__(self, name):
+        if name not in self._keys:
+            raise KeyError(name)
+
+        if name not in self._objects:
+            self.load([name])
+
+        return self._objects[name]
+
+    def load(self, names):
+        """Loads the objects of names that were not loaded yet, with a single call to loader"""
+        missing = [x for x in names if x in self._keys and x not in self._objects]
+        if not missing:
+            return
+
+        for name, obj in zip(missing, self._loader(missing)):
+            for func in self._funcs:
+                func(obj)
+            self._objects[name] = obj
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def filter(self, include, exclude):
+        """Returns a new LazyObjects with the names matching include and exclude, without loading any object"""
+        result = LazyObjects(filter_list(self._names, include, exclude), self._loader)
+        result._objects = {key: value for key, value in self._objects.items() if key in result._keys}
+        result._funcs = list(self._funcs)
+
+        return result
+
+    def apply(self, func):
+        """Calls func on every object, as soon as it is loaded"""
+        for obj in self._objects.values():
+            func(obj)
+
+        self._funcs.append(func)
 
 
 class Dumper(yaml.Dumper):
 
     def increase_indent(self, flow=False, indentless=False):
         return super(Dumper, self).increase_indent(flow, False)
+
+
+class FlowList(list):
+    """List that is written in YAML flow style ([a, b, c]) instead of one item per line"""
+
+
+Dumper.add_representer(FlowList, lambda dumper, data: dumper.represent_sequence('tag:yaml.org,2002:seq', data, flow_style=True))
+
+
+def dump_yaml(data):
+    # libyaml always writes block sequences indentless, so the C emitter cannot produce the Dumper layout
+    return yaml.dump(data, Dumper=Dumper, width=255)
+
+
+def load_yaml(stream):
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def iter_yaml_list(stream, batch_size=1000):
+    """Yields the items of a YAML list, as written by dump_yaml, without loading the whole document. Items start with
+    '- ' in the first column and are parsed in batches of batch_size. Documents in any other layout are loaded at once
+
+    Args:
+        stream (iterable): Lines of text, e.g. a file opened in text mode
+        batch_size (int): Number of items parsed at a time
+    """
+    lines = iter(stream)
+    first = next(lines, '')
+    if not _is_yaml_item(first):
+        yield from load_yaml(first + ''.join(lines)) or []
+        return
+
+    batch = [first]
+    count = 1
+    for line in lines:
+        if _is_yaml_item(line):
+            if count >= batch_size:
+                yield from load_yaml(''.join(batch))
+                batch = []
+                count = 0
+            count += 1
+        batch.append(line)
+
+    yield from load_yaml(''.join(batch))
+
+
+def _is_yaml_item(line):
+    return line[:1] == '-' and line[1:2] in (' ', '\r', '\n')
+
+
+def iter_json_list(stream, chunk_size=1 << 16):
+    """Yields the items of a JSON list without loading the whole document
+
+    Args:
+        stream (file): File opened in text mode
+        chunk_size (int): Number of characters read at a time
+    """
+    decoder = json.JSONDecoder()
+
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+
+        if pos == len(buffer):
+            if eof:
+                raise ValueError('Unexpected end of JSON list')
+            buffer = stream.read(chunk_size)
+            pos = 0
+            eof = not buffer
+            continue
+
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError('Expected a JSON list')
+            started = True
+            pos += 1
+            continue
+
+        if buffer[pos] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # A number at the end of the buffer may continue in the next chunk
+            complete = eof or end < len(buffer) or isinstance(item, (list, dict))
+        except ValueError:
+            if eof:
+                raise
+            complete = False
+
+        if not complete:
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield item
+        pos = end
+
+
+def dump_json(data):
+    return json.dumps(data, indent=4, sort_keys=True, ensure_ascii=False)
+
+
+def load_json(stream):
+    """Parses JSON from a string, bytes or file object, using orjson when it is installed"""
+    if hasattr(stream, 'read'):
+        stream = stream.read()
+
+    if orjson:
+        try:
+            return orjson.loads(stream)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than json (e.g. NaN, big integers), fall back for those
+            pass
+
+    return json.loads(stream)
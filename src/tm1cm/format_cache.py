@@ -0,0 +1,75 @@
+import hashlib
+import json
+import logging
+import os
+
+from tm1cm.manifest import MANIFEST_FOLDER
+from tm1cm.ti_format import VERSION as FORMAT_VERSION
+
+CACHE_FILE = 'format_cache.json'
+
+
+class FormatCache:
+    """Persistent cache of formatted TI procedures, keyed by the SHA-256 of the raw procedure text and the formatter
+    version. The least recently used entries are dropped once the cache holds more than size entries.
+    """
+
+    def __init__(self, path, size=10000):
+        self.file = os.path.join(path, MANIFEST_FOLDER, CACHE_FILE)
+        self.size = size
+
+        self._entries = self._load()
+        self._dirty = False
+
+    def _load(self):
+        logger = logging.getLogger(__name__)
+
+        if not os.path.isfile(self.file):
+            return {}
+
+        try:
+            with open(self.file, 'r', encoding='utf8') as fp:
+                return json.load(fp)
+        except Exception:
+            logger.warning('Unable to read TI format cache {}, starting with an empty cache'.format(self.file))
+            return {}
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha256('{}\0{}'.format(FORMAT_VERSION, text).encode('utf8')).hexdigest()
+
+    def get(self, text):
+        key = self.key(text)
+        if key not in self._entries:
+            return None
+
+        # Move to the end, so the entry is the last to be evicted. This is persisted along with the next change
+        value = self._entries.pop(key)
+        self._entries[key] = value
+
+        return value
+
+    def put(self, text, formatted):
+        self._entries[self.key(text)] = formatted
+        self._dirty = True
+
+    def save(self):
+        logger = logging.getLogger(__name__)
+
+        if not self._dirty:
+            return
+
+        while len(self._entries) > self.size:
+            del self._entries[next(iter(self._entries))]
+
+        try:
+            os.makedirs(os.path.dirname(self.file), exist_ok=True)
+
+            temp_file = self.file + '.tmp'
+            with open(temp_file, 'w', encoding='utf8') as fp:
+                json.dump(self._entries, fp, ensure_ascii=False)
+            os.replace(temp_file, self.file)
+
+            self._dirty = False
+        except Exception:
+            logger.warning('Unable to write TI format cache {}'.format(self.file))
@@ -0,0 +1,340 @@
+import logging
+import math
+import os
+import random
+import re
+import zlib
+
+from tm1cm.application import Application
+from tm1cm.common import get_config
+from tm1cm.scaffold import create_scaffold
+
+# Number of objects of a synthetic model of size 1. Counts marked as scaled grow linearly with the size of the model
+DEFAULT_SHAPE = {
+    'processes': 100,  # scaled
+    'process_lines': 200,
+    'dimensions': 10,  # scaled
+    'elements': 5000,  # scaled, leaves of the largest dimension. Dimension n has elements / n leaves
+    'fanout': 10,
+    'attributes': 6,
+    'alternate_hierarchies': 3,  # scaled, number of dimensions with a second hierarchy
+    'subsets': 4,
+    'cubes': 5,  # scaled
+    'cube_dimensions': 4,
+    'views': 4,
+    'view_data_cells': 400,
+}
+
+SCALED = ['processes', 'dimensions', 'elements', 'alternate_hierarchies', 'cubes']
+
+# Settings the project of a generated model gets, so views, view data and subsets are part of it
+GENERATOR_CONFIG = {
+    'include_cube_view': '*/*',
+    'include_cube_view_data': '*/Data',
+    'include_dimension_hierarchy_subset': '*/*/*',
+}
+
+GENERATED_STATEMENTS = '#****Begin: Generated Statements***\r\n#****End: Generated Statements****\r\n'
+
+
+class SyntheticApplication(Application):
+    """Application holding a synthetic TM1 model, made up from a size and a seed. The same size, shape and seed always
+    give the same model. Hierarchies, views, view data and subsets are only made when they are fetched, so models with
+    millions of elements can be written with to_local without holding them in memory
+    """
+
+    def __init__(self, config, size=1, seed=0, shape=None):
+        super().__init__(config)
+
+        self.path = None
+        self.size = size
+        self.seed = seed
+        self.shape = get_shape(size, shape)
+
+        self._cube_dimensions = {}
+
+    def __str__(self):
+        return 'synthetic size={} seed={}'.format(self.size, self.seed)
+
+    def __repr__(self):
+        return '<SyntheticApplication ({})>'.format(self.__str__())
+
+    def _random(self, *names):
+        return random.Random('/'.join(str(x) for x in (self.seed, *names)))
+
+    def _populate(self, overlay=True):
+        shape = self.shape
+        rng = self._random('model')
+
+        dimensions = ['Dimension {}'.format(i) for i in range(shape['dimensions'])]
+        alternate = set(rng.sample(dimensions, min(shape['alternate_hierarchies'], len(dimensions))))
+
+        self._dimension_object = [{'Name': x, 'UniqueName': '[{}]'.format(x), 'Attributes': {'Caption': x}, 'Hierarchies': []} for x in dimensions]
+
+        self._hierarchy_list = []
+        for dimension in dimensions:
+            self._hierarchy_list.append((dimension, dimension))
+            if dimension in alternate:
+                self._hierarchy_list.append((dimension, 'Alternate'))
+
+        self._subset_list = []
+        for dimension, hierarchy in self._hierarchy_list:
+            self._subset_list += [(dimension, hierarchy, x) for x in _subset_names(shape)]
+
+        self._cube_object = []
+        self._rule_object = []
+        self._view_list = []
+        for i in range(shape['cubes']):
+            name = 'Cube {}'.format(i)
+            cube_dimensions = rng.sample(dimensions, min(max(shape['cube_dimensions'], 2), len(dimensions)))
+            self._cube_dimensions[name] = cube_dimensions
+
+            self._cube_object.append({'Name': name, 'Dimensions': [{'Name': x} for x in cube_dimensions]})
+            if i % 2 == 0:
+                self._rule_object.append({'Name': name, 'Rules': self._make_rules(name, cube_dimensions)})
+
+            self._view_list += [(name, x) for x in _view_names(shape)]
+
+        self._process_object = [self._make_process('Process {}'.format(i)) for i in range(shape['processes'])]
+        if self.config.get('autoformat_ti_process', True):
+            self._format_processes(self._process_object)
+
+        self._file_list = []
+
+    def get_hierarchy(self, dimension, hierarchy):
+        shape = self.shape
+        rng = self._random(dimension, hierarchy)
+
+        leaves = _leaf_names(shape, dimension)
+        if hierarchy != dimension:
+            leaves = rng.sample(leaves, len(leaves))
+
+        elements = [{'Name': x, 'Type': 'Numeric'} for x in leaves]
+        edges = []
+
+        # Consolidations are built bottom up, fanout children at a time, until a single top element is left
+        level = 1
+        children = leaves
+        while len(children) > 1:
+            parents = []
+            for start in range(0, len(children), shape['fanout']):
+                parent = 'Total' if len(children) <= shape['fanout'] else 'Level {} {}'.format(level, start // shape['fanout'])
+                parents.append(parent)
+                elements.append({'Name': parent, 'Type': 'Consolidated'})
+                edges += [{'ComponentName': x, 'ParentName': parent, 'Weight': 1} for x in children[start:start + shape['fanout']]]
+            children = parents
+            level += 1
+
+        # Attribute values belong to the element, so they are the same in every hierarchy of the dimension
+        attributes = _attributes(shape)
+        for element in elements:
+            values = {}
+            for attribute in attributes:
+                number = zlib.crc32('{}/{}/{}/{}'.format(self.seed, dimension, element['Name'], attribute['Name']).encode('utf8'))
+                if attribute['Type'] == 'Alias':
+                    values[attribute['Name']] = '{} ({})'.format(element['Name'].upper(), dimension)
+                elif attribute['Type'] == 'Numeric':
+                    values[attribute['Name']] = number % 1000
+                else:
+                    values[attribute['Name']] = 'S{:06d}'.format(number % 10 ** 6)
+            element['Attributes'] = values
+
+        result = {
+            'Name': hierarchy,
+            'UniqueName': '[{}].[{}]'.format(dimension, hierarchy),
+            'Elements': elements,
+            'Edges': edges,
+            'ElementAttributes': attributes,
+            'Subsets': [],
+        }
+
+        self._filter_hierarchy(dimension, result)
+
+        return result
+
+    def get_subset(self, dimension, hierarchy, subset):
+        bind = "Dimensions('{}')/Hierarchies('{}')".format(dimension, hierarchy)
+        result = {'Name': subset, 'Hierarchy@odata.bind': bind}
+
+        if subset == 'All':
+            result['Expression'] = '{{TM1SUBSETALL([{}].[{}])}}'.format(dimension, hierarchy)
+        elif subset == 'Leaves':
+            result['Expression'] = '{{TM1FILTERBYLEVEL({{TM1SUBSETALL([{}].[{}])}}, 0)}}'.format(dimension, hierarchy)
+        else:
+            result['Elements@odata.bind'] = ["{}/Elements('{}')".format(bind, x) for x in self._static_subset(dimension, hierarchy, subset)]
+
+        return result
+
+    def get_view(self, cube, view):
+        dimensions = self._cube_dimensions[cube]
+        rng = self._random(cube, view)
+
+        def selection(dimension, subset, selected=None):
+            result = {'Subset@odata.bind': "Dimensions('{0}')/Hierarchies('{0}')/Subsets('{1}')".format(dimension, subset)}
+            if selected:
+                result['Selected@odata.bind'] = "Dimensions('{0}')/Hierarchies('{0}')/Elements('{1}')".format(dimension, selected)
+            return result
+
+        statics = [x for x in _subset_names(self.shape) if x.startswith('Static')]
+        row, column = dimensions[0], dimensions[1]
+
+        return {
+            '@odata.type': 'ibm.tm1.api.v1.NativeView',
+            'Columns': [selection(column, statics[0] if view == 'Data' else rng.choice(statics))],
+            'FormatString': '0.#########',
+            'Name': view,
+            'Rows': [selection(row, statics[0] if view == 'Data' else rng.choice(statics))],
+            'SuppressEmptyColumns': False,
+            'SuppressEmptyRows': view != 'Data',
+            'Titles': [selection(x, 'All', 'Element 0') for x in dimensions[2:]],
+        }
+
+    def get_view_data(self, cube, view):
+        dimensions = self._cube_dimensions[cube]
+        rng = self._random(cube, view, 'data')
+
+        view_definition = self.get_view(cube, view)
+        rows = self._static_subset(dimensions[0], dimensions[0], _bind_name(view_definition['Rows'][0]['Subset@odata.bind']))
+        columns = self._static_subset(dimensions[1], dimensions[1], _bind_name(view_definition['Columns'][0]['Subset@odata.bind']))
+        titles = ['Element 0'] * (len(dimensions) - 2)
+
+        result = []
+        for row in rows:
+            for column in columns:
+                members = [row, column] + titles
+                result.append(['[{0}].[{0}].[{1}]'.format(x, y) for x, y in zip(dimensions, members)] + [rng.randrange(1000)])
+
+        return result
+
+    def _static_subset(self, dimension, hierarchy, subset):
+        count = _leaf_count(self.shape, dimension)
+        rng = self._random(dimension, hierarchy, subset)
+        # Static subsets are sized so the view data of a Data view has about view_data_cells cells
+        side = max(1, int(math.sqrt(self.shape['view_data_cells'])))
+        return ['Element {}'.format(x) for x in rng.sample(range(count), min(side, count))]
+
+    def _make_rules(self, cube, dimensions):
+        rng = self._random(cube, 'rules')
+        lines = ['SKIPCHECK;', '']
+        for i in range(min(20, _leaf_count(self.shape, dimensions[0]))):
+            lines.append("['{}':'Element {}'] = N: {};".format(dimensions[0], i, rng.randrange(1000)))
+        lines += ['', 'FEEDERS;', '']
+
+        return '\r\n'.join(lines)
+
+    def _make_process(self, name):
+        shape = self.shape
+        rng = self._random(name)
+
+        cubes = list(self._cube_dimensions.items())
+
+        lines = []
+        while len(lines) < shape['process_lines']:
+            cube, dimensions = rng.choice(cubes)
+            elements = ["'Element {}'".format(rng.randrange(min(100, _leaf_count(shape, x)))) for x in dimensions]
+            variable = 'nValue{}'.format(len(lines))
+            lines += [
+                "{} = CellGetN('{}', {});".format(variable, cube, ', '.join(elements)),
+                'IF({} > {});'.format(variable, rng.randrange(1000)),
+                "   CellPutN({} * 2, '{}', {});".format(variable, cube, ', '.join(elements)),
+                'ENDIF;',
+            ]
+
+        def procedure(text_lines):
+            return GENERATED_STATEMENTS + '\r\n'.join(text_lines)
+
+        return {
+            'DataSource': {'Type': 'None'},
+            'EpilogProcedure': procedure(["LogOutput('INFO', '{} done');".format(name)]),
+            'HasSecurityAccess': False,
+            'MetadataProcedure': procedure([]),
+            'DataProcedure': procedure([]),
+            'Name': name,
+            'Parameters': [{'Name': 'pValue', 'Prompt': '', 'Type': 'Numeric', 'Value': 0}],
+            'PrologProcedure': procedure(lines[:shape['process_lines']]),
+            'UIData': '',
+            'Variables': [],
+            'VariablesUIData': [],
+        }
+
+
+def get_shape(size=1, shape=None):
+    """Returns the number of objects of a synthetic model
+
+    Args:
+        size (int): Size of the model, scales the counts in SCALED
+        shape (dict): Optional, counts that override DEFAULT_SHAPE, before scaling
+
+    Returns:
+        dict: Counts, like DEFAULT_SHAPE
+    """
+    result = {**DEFAULT_SHAPE, **(shape or {})}
+    for key in SCALED:
+        result[key] = max(1, int(result[key] * size))
+
+    result['dimensions'] = max(2, result['dimensions'])
+
+    return result
+
+
+def generate(path, size=1, seed=0, shape=None):
+    """Creates a project at path, the same as scaffold does, holding a synthetic model
+
+    Args:
+        path (str): Path of the project, must not exist
+        size (int): Size of the model
+        seed (int): Seed of the model
+        shape (dict): Optional, counts that override DEFAULT_SHAPE
+
+    Returns:
+        SyntheticApplication: The model that was written
+    """
+    logger = logging.getLogger(__name__)
+
+    create_scaffold(path)
+
+    config_path = os.path.join(path, 'config', 'default', 'tm1cm.yaml')
+    with open(config_path) as fp:
+        text = fp.read()
+
+    for key, value in GENERATOR_CONFIG.items():
+        text = re.sub(r'^{}:.*$'.format(key), "{}: '{}'".format(key, value), text, flags=re.MULTILINE)
+
+    with open(config_path, 'w') as fp:
+        fp.write(text)
+
+    app = SyntheticApplication(get_config(path, 'tm1cm'), size, seed, shape).refresh()
+    app.to_local(path)
+
+    logger.info('Generated synthetic model of size {} with seed {} at {}'.format(size, seed, path))
+
+    return app
+
+
+def _leaf_count(shape, dimension):
+    index = int(dimension.split(' ')[-1])
+    return max(10, shape['elements'] // (index + 1))
+
+
+def _leaf_names(shape, dimension):
+    return ['Element {}'.format(i) for i in range(_leaf_count(shape, dimension))]
+
+
+def _attributes(shape):
+    types = ['String', 'Numeric']
+    attributes = [{'Name': 'Caption', 'Type': 'Alias'}]
+    attributes += [{'Name': 'Attribute {}'.format(i), 'Type': types[i % 2]} for i in range(1, shape['attributes'])]
+    return attributes[:shape['attributes']]
+
+
+def _subset_names(shape):
+    names = ['All', 'Leaves'] + ['Static {}'.format(i) for i in range(max(1, shape['subsets'] - 2))]
+    return names[:max(shape['subsets'], 3)]
+
+
+def _view_names(shape):
+    return ['Data'] + ['View {}'.format(i) for i in range(1, shape['views'])]
+
+
+def _bind_name(bind):
+    return bind.rsplit("('", 1)[1][:-2]
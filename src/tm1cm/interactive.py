@@ -10,7 +10,7 @@ from fnmatch import fnmatch
 
 from termcolor import colored
 
-from tm1cm.application import RemoteApplication, LocalApplication
+from tm1cm.application import create_remote_application, LocalApplication
 from tm1cm.common import get_config
 from tm1cm.migration import Migration
 
@@ -79,7 +79,7 @@ class Interactive(cmd.Cmd):
 
         session_config = {**connect, **credentials}
 
-        self.apps[name] = RemoteApplication(config, session_config=session_config)
+        self.apps[name] = create_remote_application(config, session_config=session_config, path=path, read_snapshot=True)
 
     def do_do(self, arg):
         """Execute the currently staged operations. Optionally, specify 'all'
@@ -121,15 +121,42 @@ class Interactive(cmd.Cmd):
                 pass
 
                 target = self.migration.target
-                for op in ops:
-                    print(colored('Doing: {}'.format(str(op)), 'green'))
+                if target.snapshot_cache is not None:
                     spinner.start()
-                    op.do(target)
+                    ops = self._revalidate(ops, arg == 'all')
                     spinner.stop()
+
+                try:
+                    dimension_cubes = self.migration.get_dimension_cubes(ops)
+                    for op in ops:
+                        print(colored('Doing: {}'.format(str(op)), 'green'))
+                        spinner.start()
+                        op.do(target, dimension_cubes)
+                        spinner.stop()
+                finally:
+                    target.save_snapshot()
         except Exception:
             print('Error occurred:', traceback.format_exc())
             logger.exception('Error occurred')
 
+    def _revalidate(self, ops, all_operations=False):
+        """Computes the migration again from the current state of the target, ignoring the snapshot cache, which can
+        be out of date. Returns the operations that are still needed, so changes made on the target by someone else
+        are not missed or reverted"""
+        self.migration.target.clear_snapshot()
+        self.migration = Migration(self.migration.source.refresh(), self.migration.target.refresh())
+
+        current = self.migration.operations
+        if all_operations:
+            return current
+
+        for op in ops:
+            if op not in current:
+                print(colored('Skipping, no longer needed: {}'.format(op), 'yellow'))
+
+        self.stage = [op for op in ops if op in current]
+        return self.stage
+
     def do_ls(self, arg):
         logger = logging.getLogger(__name__)
         try:
@@ -169,6 +196,29 @@ class Interactive(cmd.Cmd):
         finally:
             spinner.stop()
 
+    def do_refresh(self, args):
+        """Reads applications again, all of them unless names are given. Files are served from the snapshot cache while
+        they are current, add --force to fetch everything again"""
+        logger = logging.getLogger(__name__)
+        spinner = Spinner()
+        try:
+            args = args.split()
+            force = '--force' in args
+            names = [x for x in args if x != '--force'] or list(self.apps)
+
+            spinner.start()
+
+            for name in names:
+                app = self.apps[name]
+                if force:
+                    app.clear_snapshot()
+                app.refresh()
+        except Exception:
+            print('Error occurred:', '\n', traceback.format_exc())
+            logger.exception('Error occurred')
+        finally:
+            spinner.stop()
+
     def do_add(self, arg):
         logger = logging.getLogger(__name__)
         try:
@@ -212,8 +262,9 @@ class Interactive(cmd.Cmd):
             return
         try:
             exe = '/usr/local/bin/github'
-            print(self.migration.path)
-            subprocess.run([exe, self.migration.path], check=True)
+            path = self.migration.export()
+            print(path)
+            subprocess.run([exe, path], check=True)
         except Exception:
             print('Error. You may need to install github command line tools from the github desktop application')
             logger.exception('Error running github gui')
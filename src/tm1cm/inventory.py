@@ -0,0 +1,158 @@
+import threading
+
+from TM1py.Utils.Utils import lower_and_drop_spaces
+
+# Object types held in the inventory, along with the number of names that identify an object of that type
+OBJECT_TYPES = {
+    'process': 1,
+    'cube': 1,
+    'view': 2,
+    'dimension': 1,
+    'hierarchy': 2,
+    'subset': 3,
+    'blob': 1,
+}
+
+
+class Inventory:
+    """In-memory index of the objects that exist on a TM1 server, so operations can check whether an object exists
+    without a request. Names are compared like TM1 does, ignoring case and spaces.
+
+    The index is kept up to date by calling added and deleted as objects are created and deleted. When the children of
+    an object cannot be known (e.g. the hierarchies TM1 creates along with a dimension), exists returns None for them
+    and the caller checks the server instead. Safe to use from many threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._objects = set()
+        self._unknown = set()
+        self._cube_dimensions = {}
+
+        # {key: keys of the objects that directly belong to it}, so a delete only visits its own subtree
+        self._children = {}
+
+    def __len__(self):
+        return len(self._objects)
+
+    def exists(self, object_type, *names):
+        """Checks if an object exists
+
+        Args:
+            object_type (str): Object type, one of OBJECT_TYPES
+            *names: Names identifying the object, e.g. dimension, hierarchy and subset name for a subset
+
+        Returns:
+            bool: True if the object exists, False if it does not, None if it is not known
+        """
+        key = _key(object_type, names)
+
+        with self._lock:
+            if key in self._objects:
+                return True
+
+            if self._is_unknown(key):
+                return None
+
+            return False
+
+    def get_cube_dimensions(self, cube_name):
+        """Returns the names of the dimensions of a cube, or None if they are not known"""
+        with self._lock:
+            dimensions = self._cube_dimensions.get(_key('cube', [cube_name]))
+            return list(dimensions) if dimensions is not None else None
+
+    def added(self, object_type, *names, dimensions=None, hierarchies=None):
+        """Records that an object was created, or found to exist
+
+        Args:
+            object_type (str): Object type
+            *names: Names identifying the object
+            dimensions (list): Optional, dimension names of a cube
+            hierarchies (list): Optional, hierarchy names of a dimension. When not given, the hierarchies of the
+                dimension are not known, since TM1 creates hierarchies along with a dimension
+        """
+        key = _key(object_type, names)
+
+        with self._lock:
+            self._add(key)
+            self._unknown.discard(key)
+
+            if object_type == 'cube':
+                self._cube_dimensions[key] = list(dimensions) if dimensions is not None else None
+            elif object_type == 'dimension':
+                if hierarchies is None:
+                    self._unknown.add(key)
+                else:
+                    for hierarchy in hierarchies:
+                        self._add(_key('hierarchy', [names[0], hierarchy]))
+
+    def deleted(self, object_type, *names):
+        """Records that an object, and every object that belongs to it, was deleted or found not to exist
+
+        Args:
+            object_type (str): Object type
+            *names: Names identifying the object
+        """
+        key = _key(object_type, names)
+
+        with self._lock:
+            keys = [key]
+            for x in keys:
+                keys.extend(self._children.pop(x, ()))
+
+            for x in keys:
+                self._objects.discard(x)
+                self._unknown.discard(x)
+
+            parent = _parent(key)
+            if parent in self._children:
+                self._children[parent].discard(key)
+
+            if object_type == 'cube':
+                self._cube_dimensions.pop(key, None)
+
+    def _add(self, key):
+        self._objects.add(key)
+
+        # Every ancestor is linked, even if it is not known to exist, so deleting any of them reaches the object
+        parent = _parent(key)
+        while parent:
+            children = self._children.setdefault(parent, set())
+            if key in children:
+                break
+
+            children.add(key)
+            key, parent = parent, _parent(parent)
+
+    def _is_unknown(self, key):
+        if key in self._unknown:
+            return True
+
+        parent = _parent(key)
+        while parent:
+            if parent in self._unknown:
+                return True
+            parent = _parent(parent)
+
+        return False
+
+
+def _key(object_type, names):
+    if OBJECT_TYPES.get(object_type) != len(names):
+        raise ValueError('Invalid names for {}: {}'.format(object_type, names))
+
+    return (object_type, *(lower_and_drop_spaces(name) for name in names))
+
+
+def _parent(key):
+    """Returns the key of the object that key belongs to, e.g. the hierarchy of a subset"""
+    object_type = key[0]
+    if object_type == 'view':
+        return ('cube', key[1])
+    if object_type == 'hierarchy':
+        return ('dimension', key[1])
+    if object_type == 'subset':
+        return ('hierarchy', key[1], key[2])
+
+    return None
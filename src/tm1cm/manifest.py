@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+
+MANIFEST_FOLDER = '.tm1cm'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+class Manifest:
+    """Keeps track of every file written by Application.to_local, along with a hash of its content and the server
+    timestamp (if any) of the object it was generated from. Used to skip fetching and writing objects that have
+    not changed since the last run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = os.path.join(path, MANIFEST_FOLDER, MANIFEST_FILE)
+
+        self._objects = self._load()
+        self._seen = set()
+
+    def _load(self):
+        logger = logging.getLogger(__name__)
+
+        if not os.path.isfile(self.file):
+            return {}
+
+        try:
+            with open(self.file, 'r', encoding='utf8') as fp:
+                data = json.load(fp)
+
+            if data.get('version') != MANIFEST_VERSION:
+                logger.info('Ignoring manifest {} with unsupported version'.format(self.file))
+                return {}
+
+            return data.get('objects', {})
+        except Exception:
+            logger.warning('Unable to read manifest {}, doing a full refresh'.format(self.file))
+            return {}
+
+    def unchanged(self, name, timestamp):
+        """Checks if an object is known to be unchanged on the server. If so, the existing file is kept
+
+        Args:
+            name (str): File name, relative to the project path
+            timestamp (str): Current server timestamp of the object
+
+        Returns:
+            bool: True if the object does not need to be fetched again
+        """
+        entry = self._objects.get(_key(name))
+        if not timestamp or not entry or entry.get('timestamp') != timestamp:
+            return False
+
+        if not self._on_disk(name, entry):
+            return False
+
+        self._seen.add(_key(name))
+        return True
+
+    def update(self, name, data, timestamp=None):
+        """Records a file in the manifest
+
+        Args:
+            name (str): File name, relative to the project path
+            data (bytes): File content
+            timestamp (str): Server timestamp of the object, if known
+
+        Returns:
+            bool: True if the file content differs from what is on disk and must be written
+        """
+        return self.update_digest(name, hashlib.sha256(data).hexdigest(), timestamp)
+
+    def update_digest(self, name, digest, timestamp=None):
+        """Records a file in the manifest, by the SHA-256 hex digest of its content. See update"""
+        key = _key(name)
+
+        entry = self._objects.get(key)
+        changed = not entry or entry.get('hash') != digest or not self._on_disk(name, entry)
+
+        self._objects[key] = {'hash': digest, 'timestamp': timestamp}
+        self._seen.add(key)
+
+        return changed
+
+    def _on_disk(self, name, entry):
+        """Checks if the file on disk still has the content recorded in the manifest, e.g. it was not edited or
+        replaced by a git checkout. Only files whose size or modification time changed are hashed again
+        """
+        file_name = os.path.join(self.path, name)
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            return False
+
+        if entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns:
+            return True
+
+        digest = hashlib.sha256()
+        with open(file_name, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b''):
+                digest.update(chunk)
+
+        if digest.hexdigest() != entry.get('hash'):
+            return False
+
+        entry['size'] = stat.st_size
+        entry['mtime'] = stat.st_mtime_ns
+        return True
+
+    def prune(self, folders):
+        """Deletes any file in folders that was not written or kept during this run
+
+        Args:
+            folders (list): Folders, relative to the project path
+        """
+        logger = logging.getLogger(__name__)
+
+        for folder in folders:
+            for root, _, files in os.walk(os.path.join(self.path, folder), topdown=False):
+                for file_name in files:
+                    file_path = os.path.join(root, file_name)
+                    if _key(os.path.relpath(file_path, self.path)) not in self._seen:
+                        logger.debug('Removing stale file {}'.format(file_path))
+                        os.remove(file_path)
+
+                if root != os.path.join(self.path, folder) and not os.listdir(root):
+                    os.rmdir(root)
+
+        self._objects = {key: value for key, value in self._objects.items() if key in self._seen}
+
+    def save(self):
+        # Files are written after they are recorded, so their size and modification time are only known now
+        for key in self._seen:
+            entry = self._objects.get(key)
+            try:
+                stat = os.stat(os.path.join(self.path, *key.split('/')))
+            except OSError:
+                continue
+
+            if entry is not None:
+                entry['size'] = stat.st_size
+                entry['mtime'] = stat.st_mtime_ns
+
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+
+        data = {
+            'version': MANIFEST_VERSION,
+            'objects': self._objects,
+        }
+
+        with open(self.file, 'w', encoding='utf8') as fp:
+            json.dump(data, fp, indent=4, sort_keys=True, ensure_ascii=False)
+
+
+def _key(name):
+    return '/'.join(name.split(os.sep))
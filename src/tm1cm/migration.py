@@ -1,50 +1,43 @@
-
+import hashlib
+import heapq
 import logging
 import os
 import TM1py
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from git import Repo
 from shutil import rmtree
 from tempfile import mkdtemp
 
-from tm1cm.application import LocalApplication, RemoteApplication
-from tm1cm.operation import Operation, Ops
+from tm1cm import profiler, tracing
+from tm1cm.operation import get_dimension_cubes, Operation, Ops
 
 AUTHOR = 'tm1cm <tm1cm@local>'
 
+# Operations of these types run one at a time when they touch the same object
+SERIAL_OPERATIONS = (Ops.DELETE_HIERARCHY, Ops.UPDATE_HIERARCHY)
+
+# Operations of these types wait for every operation of the listed types, regardless of the objects involved. Rules
+# can reference any cube, and file operations are performed through TI processes
+TYPE_DEPENDENCIES = {
+    Ops.UPDATE_RULE: (Ops.UPDATE_DIMENSION, Ops.UPDATE_HIERARCHY, Ops.UPDATE_CUBE),
+    Ops.UPDATE_FILE: (Ops.UPDATE_PROCESS,),
+}
+
 
 class Migration:
     def __init__(self, source, target):
-        logger = logging.getLogger(__name__)
-
         self.source = source
         self.target = target
 
-        self.path = mkdtemp(prefix='tm1cm_')
-        self.repo = Repo.init(self.path)
-
-        if self.target:
-            self.target.to_local(self.path, False)
-            self.repo.git.add('*')
-            self.repo.git.commit('-m', 'initial', author=AUTHOR)
-
-            for folder in ['data', 'scripts', 'files']:
-                self._git_rm_path(folder)
-        else:
-            self.repo.git.commit('--allow-empty', '-m', 'initial')
+        self.path = None
+        self.repo = None
 
-        self.source.to_local(self.path, True)
-        if isinstance(self.source, RemoteApplication):
-            self.source = LocalApplication.from_remote(self.source, self.path)
+        self._dimension_cubes = None
 
         # Patch TM1py to not delete attributes
         TM1py.Services.HierarchyService._update_element_attributes = _update_element_attributes
 
-        try:
-            self.repo.git.add('*')
-        except Exception:
-            logger.info('Unable to add new files, probably fine')
-
         self._compute_operations()
 
     @property
@@ -52,20 +45,185 @@ class Migration:
         return sorted(self._operations, key=lambda x: x.type)
 
     def do_operations(self, operations):
+        """Performs operations against the target. Operations are ordered by type; when max_workers is configured,
+        operations that do not depend on each other are performed concurrently
+
+        Args:
+            operations (list): List of operations
+        """
+        operations = sorted(operations, key=lambda x: x.type)
+
+        try:
+            with profiler.timer('migration.operations', {'tm1cm.operations': len(operations)}):
+                self._do_operations(operations)
+        finally:
+            self.target.save_snapshot()
+
+    def _do_operations(self, operations):
+        # One inventory of the target replaces the existence checks of every operation
+        if operations and self.target.config.get('prefetch_inventory', True):
+            with profiler.timer('migration.inventory'):
+                self.target.load_inventory()
+
+        # Built here, before operations run concurrently
+        self.get_dimension_cubes(operations)
+
+        max_workers = int(self.target.config.get('max_workers', 1) or 1)
+        if max_workers <= 1 or len(operations) <= 1:
+            for operation in operations:
+                self._do_operation(operation)
+            return
+
+        self.target._prepare_workers(max_workers)
+
+        dependencies = self._get_dependencies(operations)
+        dependents = {i: [] for i in dependencies}
+        for i, depends_on in dependencies.items():
+            for j in depends_on:
+                dependents[j].append(i)
+
+        remaining = {i: len(depends_on) for i, depends_on in dependencies.items()}
+        ready = [i for i, count in remaining.items() if count == 0]
+        heapq.heapify(ready)
+
+        def finish(i):
+            for j in dependents[i]:
+                remaining[j] -= 1
+                if remaining[j] == 0:
+                    if j < len(operations):
+                        heapq.heappush(ready, j)
+                    else:
+                        # Barriers hold no work, they are done as soon as everything they wait for is
+                        finish(j)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+            while ready or running:
+                while ready and len(running) < max_workers:
+                    i = heapq.heappop(ready)
+                    running[executor.submit(tracing.wrap(self._do_operation), operations[i])] = i
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(running.pop(future))
+
+    def _do_operation(self, operation):
         logger = logging.getLogger(__name__)
-        retry = []
-        for operation in sorted(operations, key=lambda x: x.type):
+
+        retries = int(self.target.config.get('operation_retries', 1))
+        for attempt in range(retries + 1):
             try:
-                operation.do(self.target)
+                operation.do(self.target, self._dimension_cubes)
+                return True
             except Exception:
-                logger.error('Operation {} Failed, will retry at the end'.format(operation))
-                retry.append(operation)
+                if attempt < retries:
+                    logger.error('Operation {} Failed, retrying'.format(operation))
+                else:
+                    logger.error('Operation {} Failed'.format(operation))
 
-        for operation in retry:
+        return False
+
+    def get_dimension_cubes(self, operations):
+        """Returns the index of the source and target cubes that operations use to drop the views of every cube built
+        from a changed dimension from the snapshot cache, see operation.get_dimension_cubes. Built once per migration,
+        and only when the target has a snapshot cache and operations change dimensions. Returns None otherwise
+
+        Args:
+            operations (list): Operations about to be performed
+        """
+        if self._dimension_cubes is None and self.target.snapshot_cache is not None:
+            if any(x.type.name.split('_', 1)[1] in ('DIMENSION', 'HIERARCHY', 'SUBSET') for x in operations):
+                self._dimension_cubes = get_dimension_cubes([self.source, self.target])
+
+        return self._dimension_cubes
+
+    def _get_dependencies(self, operations):
+        """Builds the dependency graph of a list of operations sorted by type. An operation depends on every operation
+        of an earlier type that touches one of the same objects (e.g. a cube and the dimensions it is built from), so
+        deletes always happen before creates of the same name, and dimensions before the cubes, views and subsets
+        that use them.
+
+        Operations of one type that touch the same object form a group. Rather than on every earlier operation, an
+        operation depends on the group before its own, through a barrier that waits for the whole group. That group
+        waits for the one before it, so the graph grows linearly with the number of operations
+
+        Args:
+            operations (list): Operations, sorted by type
+
+        Returns:
+            dict: {index: set of indexes it depends on}. Indexes from len(operations) on are barriers
+        """
+        dependencies = {i: set() for i in range(len(operations))}
+
+        def barrier(depends_on):
+            if len(depends_on) == 1:
+                return depends_on[0]
+
+            dependencies[len(dependencies)] = set(depends_on)
+            return len(dependencies) - 1
+
+        cubes = []
+        for app in (self.source, self.target):
             try:
-                operation.do(self.target)
+                cubes.append(app.cubes)
             except Exception:
-                logger.error('Retry Operation {} Failed'.format(operation))
+                pass
+        cube_dimensions = {}
+
+        # {key: [type of the current group, operations in the current group, barrier of the group before]}
+        groups = {}
+        by_type = {}
+        type_barriers = {}
+        for i, operation in enumerate(operations):
+            for key in self._get_operation_keys(operation, cubes, cube_dimensions):
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [operation.type, [], None]
+                elif group[0] != operation.type:
+                    group[:] = [operation.type, [], barrier(group[1])]
+
+                if group[2] is not None:
+                    dependencies[i].add(group[2])
+                if operation.type in SERIAL_OPERATIONS and group[1]:
+                    dependencies[i].add(group[1][-1])
+                group[1].append(i)
+
+            if operation.type in TYPE_DEPENDENCIES:
+                if operation.type not in type_barriers:
+                    depends_on = [j for operation_type in TYPE_DEPENDENCIES[operation.type] for j in by_type.get(operation_type, [])]
+                    type_barriers[operation.type] = barrier(depends_on) if depends_on else None
+
+                if type_barriers[operation.type] is not None:
+                    dependencies[i].add(type_barriers[operation.type])
+            by_type.setdefault(operation.type, []).append(i)
+
+        return dependencies
+
+    def _get_operation_keys(self, operation, cubes, cube_dimensions):
+        """Returns the objects an operation touches, as ('type', name) tuples
+
+        Args:
+            operation (Operation): Operation
+            cubes (list): {name: cube} mappings of the source and target
+            cube_dimensions (dict): {cube name: dimension names}, filled in as cubes are looked up
+        """
+        object_type = operation.type.name.split('_', 1)[1]
+        args = operation._arguments
+
+        if object_type == 'PROCESS':
+            return [('process', args[0])]
+        if object_type == 'FILE':
+            return [('file', args[0])]
+        if object_type in ('DIMENSION', 'HIERARCHY', 'SUBSET'):
+            return [('dimension', args[0])]
+
+        keys = [('cube', args[0])]
+        if object_type in ('CUBE', 'VIEW', 'VIEW_DATA'):
+            if args[0] not in cube_dimensions:
+                cube_dimensions[args[0]] = _get_cube_dimensions(cubes, args[0])
+            keys.extend(('dimension', dimension) for dimension in cube_dimensions[args[0]])
+
+        return keys
 
     def do_all_operations(self):
         self.do_operations(self.operations)
@@ -86,33 +244,89 @@ class Migration:
             return [Operation(self.source, operation_type, operation_args)]
 
     def _compute_operations(self):
-        head_commit = self.repo.head.commit
-        self._operations = []
-        for diff_added in head_commit.diff(None):
-            change_type = diff_added.change_type[:1]
+        with profiler.timer('migration.snapshot.target'):
+            target_files = _snapshot(self.target) if self.target else {}
+        with profiler.timer('migration.snapshot.source'):
+            # With lazy_load, only the source files that differ from the target are loaded
+            source_files = _snapshot(self.source, target_files)
 
-            folder, sub_folder, *object_a = diff_added.a_path.split('/')
-            object_a = os.sep.join(object_a)
+        with profiler.timer('migration.diff'):
+            self._operations = self._diff(source_files, target_files)
 
-            try:
-                object_a_name, object_a_ext = object_a.rsplit('.', 1)
-            except Exception:
-                object_a_name = object_a
+    def _diff(self, source_files, target_files):
+        """Returns the operations that make the target files equal to the source files
+
+        Args:
+            source_files (dict): {path: digest} of the source, see _snapshot
+            target_files (dict): {path: digest} of the target
+
+        Returns:
+            list: Operations
+        """
+        operations = []
+        for path in sorted(set(target_files) | set(source_files)):
+            if path not in source_files:
+                change_type = 'D'
+            elif path not in target_files:
+                change_type = 'A'
+            elif source_files[path] != target_files[path]:
+                change_type = 'M'
+            else:
+                continue
 
-            _, _, *object_b = diff_added.b_path.split('/')
-            object_b = os.sep.join(object_b)
+            folder, sub_folder, *object_name = path.split('/')
+            object_name = os.sep.join(object_name)
 
             try:
-                object_b_name, object_b_ext = object_b.rsplit('.', 1)
+                object_name, object_ext = object_name.rsplit('.', 1)
             except Exception:
-                object_b_name = object_b
+                object_ext = None
 
             if folder == 'data':
-                op = self._get_operation_list(change_type, object_b_ext, object_b_name, object_a_name)
+                op = self._get_operation_list(change_type, object_ext, object_name)
             else:
-                op = self._get_operation_list(change_type, 'file', diff_added.b_path, diff_added.a_path)
+                op = self._get_operation_list(change_type, 'file', path)
+
+            operations.extend(op)
+
+        return operations
+
+    def export(self, path=None):
+        """Writes the target, and then the source, into a git repository so the migration can be reviewed with git
+        tools. The target is committed and the source is staged on top of it
+
+        Args:
+            path (str): Optional, path of the repository. A temporary directory is used by default
+
+        Returns:
+            str: Path of the repository
+        """
+        logger = logging.getLogger(__name__)
+
+        if self.path:
+            return self.path
+
+        self.path = path or mkdtemp(prefix='tm1cm_')
+        self.repo = Repo.init(self.path)
+
+        if self.target:
+            self.target.to_local(self.path, False)
+            self.repo.git.add('*')
+            self.repo.git.commit('-m', 'initial', author=AUTHOR)
+
+            for folder in ['data', 'scripts', 'files']:
+                self._git_rm_path(folder)
+        else:
+            self.repo.git.commit('--allow-empty', '-m', 'initial')
+
+        self.source.to_local(self.path, True)
+
+        try:
+            self.repo.git.add('*')
+        except Exception:
+            logger.info('Unable to add new files, probably fine')
 
-            self._operations.extend(op)
+        return self.path
 
     def _git_rm_path(self, folder):
         try:
@@ -122,6 +336,34 @@ class Migration:
             pass
 
 
+def _get_cube_dimensions(cubes, cube_name):
+    dimensions = set()
+    for objects in cubes:
+        cube = objects.get(cube_name)
+        if cube:
+            dimensions.update(x['Name'] for x in cube['Dimensions'])
+
+    return dimensions
+
+
+def _snapshot(app, known=None):
+    """Returns a {path: digest} dict with a SHA-256 digest of every file in the local representation of app. Paths use
+    '/' as separator. known is passed on to iter_files
+    """
+    return {'/'.join(name.split(os.sep)): _digest(data) for name, data, _ in app.iter_files(known=known)}
+
+
+def _digest(data):
+    if isinstance(data, bytes):
+        return hashlib.sha256(data).digest()
+
+    digest = hashlib.sha256()
+    for chunk in data:
+        digest.update(chunk)
+
+    return digest.digest()
+
+
 def _update_element_attributes(self, hierarchy):
     # get existing attributes first.
     element_attributes = self.elements.get_element_attributes(dimension_name=hierarchy.dimension_name, hierarchy_name=hierarchy.name)
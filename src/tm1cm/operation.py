@@ -2,7 +2,9 @@ import base64
 import json
 import logging
 import os
+import queue
 import re
+import threading
 
 from enum import IntEnum, auto
 
@@ -11,6 +13,11 @@ from TM1py.Objects.Dimension import Dimension
 from TM1py.Objects.Rules import Rules
 from TM1py.Objects.Process import Process
 from TM1py.Objects.Hierarchy import Hierarchy
+from TM1py.Utils.Utils import build_content_from_cellset_dict, lower_and_drop_spaces
+
+from tm1cm import profiler
+
+RE_MEMBER = re.compile(r'(\[)(.*?)(\]\.\[)(.*?)(\]\.\[)(.*?)(\])')
 
 
 class Operation:
@@ -54,9 +61,102 @@ class Operation:
     def __hash__(self):
         return hash(self.type.value + str(self._arguments))
 
-    def do(self, target):
+    def do(self, target, dimension_cubes=None):
+        """Performs the operation against target
+
+        Args:
+            target (Application): Target application
+            dimension_cubes (dict): Optional, index of the cubes of source and target, see get_dimension_cubes. Built
+                when needed if not given
+        """
         self.target = target
-        self._function(*self._arguments)
+
+        attributes = {'tm1cm.operation': self.type.name, 'tm1cm.object': '/'.join(self._arguments)}
+        try:
+            with profiler.timer('operation.{}'.format(self.type.name), attributes):
+                self._function(*self._arguments)
+        finally:
+            # Even a failed operation may have changed part of the object
+            if target.snapshot_cache is not None:
+                target.invalidate_snapshot(self._get_snapshot_prefixes(dimension_cubes))
+
+    def _get_snapshot_prefixes(self, dimension_cubes=None):
+        """Returns the files and folders of the local representation of the target that the operation can change. A
+        dimension can change the views and view data of every cube built from it
+
+        Args:
+            dimension_cubes (dict): Optional, see get_dimension_cubes
+        """
+        object_type = self.type.name.split('_', 1)[1]
+        if object_type == 'FILE':
+            return [self._arguments[0]]
+        if object_type == 'PROCESS':
+            return []
+
+        if object_type in ('DIMENSION', 'HIERARCHY', 'SUBSET'):
+            dimension_name = self._arguments[0]
+            prefixes = [os.path.join('data', 'hierarchy', dimension_name, ''), os.path.join('data', 'subset', dimension_name, '')]
+
+            if dimension_cubes is None:
+                dimension_cubes = get_dimension_cubes([self.source, self.target])
+            cube_names = dimension_cubes.get(lower_and_drop_spaces(dimension_name), ())
+        else:
+            prefixes = []
+            cube_names = {self._arguments[0]}
+
+        for cube_name in cube_names:
+            prefixes.extend([os.path.join('data', 'view', cube_name, ''), os.path.join('data', 'view_data', cube_name, '')])
+
+        return prefixes
+
+    def _exists(self, object_type, *names):
+        """Checks if an object exists on the target. The target inventory is used when it was loaded, the server is
+        only asked about objects the inventory does not know
+
+        Args:
+            object_type (str): Inventory object type, e.g. 'cube' or 'subset'
+            *names: Names identifying the object
+        """
+        inventory = self.target.inventory
+        if inventory is not None:
+            exists = inventory.exists(object_type, *names)
+            if exists is not None:
+                return exists
+
+        session = self.target.session
+        if object_type == 'process':
+            exists = session.processes.exists(*names)
+        elif object_type == 'cube':
+            exists = session.cubes.exists(*names)
+        elif object_type == 'view':
+            exists = session.cubes.views.exists(*names, False)
+        elif object_type == 'dimension':
+            exists = session.dimensions.exists(*names)
+        elif object_type == 'hierarchy':
+            exists = session.dimensions.hierarchies.exists(*names)
+        elif object_type == 'subset':
+            dimension_name, hierarchy_name, subset_name = names
+            exists = session.dimensions.subsets.exists(subset_name, dimension_name, hierarchy_name, False)
+        else:
+            raise ValueError('Unable to check if {} exists'.format(object_type))
+
+        if inventory is not None:
+            if exists:
+                inventory.added(object_type, *names)
+            else:
+                inventory.deleted(object_type, *names)
+
+        return exists
+
+    def _added(self, object_type, *names, **kwargs):
+        """Records a created object in the target inventory"""
+        if self.target.inventory is not None:
+            self.target.inventory.added(object_type, *names, **kwargs)
+
+    def _deleted(self, object_type, *names):
+        """Records a deleted object in the target inventory"""
+        if self.target.inventory is not None:
+            self.target.inventory.deleted(object_type, *names)
 
     def _operation_delete_process(self, process_name):
         """Deletes a turbo integrator process
@@ -69,8 +169,9 @@ class Operation:
 
         session = self.target.session
         try:
-            if session.processes.exists(process_name):
+            if self._exists('process', process_name):
                 session.processes.delete(process_name)
+                self._deleted('process', process_name)
                 logger.info('Deleted process {}'.format(process_name))
         except Exception:
             logger.exception('Encountered error while deleting process {}'.format(process_name))
@@ -87,7 +188,7 @@ class Operation:
 
         session = self.target.session
         try:
-            if session.cubes.exists(cube_name):
+            if self._exists('cube', cube_name):
                 empty_rule = Rules('')
                 cube = session.cubes.get(cube_name)
                 cube.rules = empty_rule
@@ -110,8 +211,9 @@ class Operation:
 
         session = self.target.session
         try:
-            if session.cubes.exists(cube_name):
+            if self._exists('cube', cube_name):
                 session.cubes.delete(cube_name)
+                self._deleted('cube', cube_name)
                 logger.info('Deleted cube {}'.format(cube_name))
         except Exception:
             logger.exception('Encountered error while deleting cube {}'.format(cube_name))
@@ -128,8 +230,9 @@ class Operation:
 
         session = self.target.session
         try:
-            if session.cubes.views.exists(cube_name, view_name, False):
+            if self._exists('view', cube_name, view_name):
                 session.cubes.views.delete(cube_name, view_name, False)
+                self._deleted('view', cube_name, view_name)
                 logger.info('Deleted cube view {}/{}'.format(cube_name, view_name))
         except Exception:
             logger.exception('Encountered error while deleting cube view {}/{}'.format(cube_name, view_name))
@@ -151,8 +254,9 @@ class Operation:
 
         session = self.target.session
         try:
-            if session.dimensions.subsets.exists(subset_name, dimension_name, hierarchy_name, False):
+            if self._exists('subset', dimension_name, hierarchy_name, subset_name):
                 session.dimensions.subsets.delete(subset_name, dimension_name, hierarchy_name, False)
+                self._deleted('subset', dimension_name, hierarchy_name, subset_name)
                 logger.info('Deleted subset {}/{}/{}'.format(dimension_name, hierarchy_name, subset_name))
         except Exception:
             logger.exception('Encountered error while deleting subset {}/{}/{}'.format(dimension_name, hierarchy_name, subset_name))
@@ -171,8 +275,9 @@ class Operation:
         session = self.target.session
 
         try:
-            if session.dimensions.hierarchies.exists(dimension_name, hierarchy_name):
+            if self._exists('hierarchy', dimension_name, hierarchy_name):
                 session.dimensions.hierarchies.delete(dimension_name, hierarchy_name)
+                self._deleted('hierarchy', dimension_name, hierarchy_name)
                 logger.info('Deleted hierarchy {}:{}'.format(dimension_name, hierarchy_name))
             else:
                 logger.info('Unable to delete hierarchy {}:{} because it does not exist'.format(dimension_name, hierarchy_name))
@@ -192,8 +297,9 @@ class Operation:
         session = self.target.session
 
         try:
-            if session.dimensions.exists(dimension_name):
+            if self._exists('dimension', dimension_name):
                 session.dimensions.delete(dimension_name)
+                self._deleted('dimension', dimension_name)
                 logger.info('Deleted dimension {}'.format(dimension_name))
         except Exception:
             logger.exception('Encountered error while deleting dimension {}'.format(dimension_name))
@@ -217,6 +323,7 @@ class Operation:
             request = '/api/v1/Contents(\'Blobs\')/Contents(\'{}\')'.format(name)
 
             tm1_rest.DELETE(request)
+            self._deleted('blob', name)
 
             process = 'TAP.File.Delete File'
             params = {
@@ -250,7 +357,7 @@ class Operation:
         session = self.target.session
 
         try:
-            if session.cubes.exists(cube_name):
+            if self._exists('cube', cube_name):
                 cube = session.cubes.get(cube_name)
                 cube.rules = Rules(self.source.rules[cube_name]['Rules'])
                 session.cubes.update(cube)
@@ -275,21 +382,33 @@ class Operation:
             cube = self.source.cubes[cube_name]
             dimensions = [x['Name'] for x in cube['Dimensions']]
 
-            if session.cubes.exists(cube_name):
-                if session.cubes.get(cube_name).dimensions != dimensions:
-                    logger.info('Deleting cube {} for being different'.format(cube_name))
-                    session.cubes.delete(cube_name)
+            exists = self._exists('cube', cube_name)
+            if exists and self._get_cube_dimensions(cube_name) != dimensions:
+                logger.info('Deleting cube {} for being different'.format(cube_name))
+                session.cubes.delete(cube_name)
+                self._deleted('cube', cube_name)
+                exists = False
 
-            if not session.cubes.exists(cube_name):
+            if not exists:
                 cube.setdefault('Rules', '')
                 for dimension in dimensions:
-                    if not session.dimensions.exists(dimension):
+                    if not self._exists('dimension', dimension):
                         session.dimensions.create(Dimension(dimension))
+                        self._added('dimension', dimension)
                 session.cubes.create(Cube.from_dict(cube))
+                self._added('cube', cube_name, dimensions=dimensions)
         except Exception:
             logger.exception('Encountered error while updating cube {}'.format(cube_name))
             raise
 
+    def _get_cube_dimensions(self, cube_name):
+        inventory = self.target.inventory
+        dimensions = inventory.get_cube_dimensions(cube_name) if inventory is not None else None
+        if dimensions is None:
+            dimensions = self.target.session.cubes.get(cube_name).dimensions
+
+        return dimensions
+
     def _operation_update_view(self, cube_name, view_name):
         """Updates a cube
 
@@ -305,7 +424,7 @@ class Operation:
         try:
             view = json.dumps(self.source.get_view(cube_name, view_name), ensure_ascii=False)
 
-            if session.cubes.views.exists(cube_name, view_name, False):
+            if self._exists('view', cube_name, view_name):
                 request = '/api/v1/Cubes(\'{}\')/Views(\'{}\')'.format(cube_name, view_name)
                 func = rest.PATCH
             else:
@@ -313,6 +432,7 @@ class Operation:
                 func = rest.POST
 
             func(request, view)
+            self._added('view', cube_name, view_name)
         except Exception:
             logger.exception('Encountered error while updating cube view {}/{}'.format(cube_name, view_name))
             raise
@@ -337,17 +457,23 @@ class Operation:
             except Exception:
                 locked = False
 
-            view_data = self.source.get_view_data(cube_name, view_name)
-            for row in view_data:
-                groups = [re.match(r'(\[)(.*?)(\]\.\[)(.*?)(\]\.\[)(.*?)(\])', a) for a in row[:-1]]
-                dimensions = [g.group(2) for g in groups]
-                elements = [g.group(6) for g in groups]
-                value = row[-1]
+            batch_size = int(self.target.config.get('view_data_batch_size', 1000) or 1)
 
-                try:
-                    session.cubes.cells.write_value(value, cube_name, elements, dimensions)
-                except Exception:
-                    logger.error('Error writing row {}:"{}" to {}'.format(elements, value, cube_name))
+            # Rows are read ahead in the background, so the file is read while the previous batch is being sent
+            rows = _read_ahead(self.source.iter_view_data(cube_name, view_name), batch_size * 2)
+
+            batch = []
+            batch_dimensions = None
+            for dimensions, elements, value in _parse_view_data(rows):
+                if batch and (dimensions != batch_dimensions or len(batch) >= batch_size):
+                    self._write_view_data_batch(cube_name, batch_dimensions, batch)
+                    batch = []
+
+                batch_dimensions = dimensions
+                batch.append((elements, value))
+
+            if batch:
+                self._write_view_data_batch(cube_name, batch_dimensions, batch)
 
             if locked:
                 request = '/api/v1/Cubes(\'{}\')/tm1.Lock'.format(cube_name)
@@ -356,6 +482,30 @@ class Operation:
             logger.exception('Encountered error while updating cube view {}/{}'.format(cube_name, view_name))
             raise
 
+    def _write_view_data_batch(self, cube_name, dimensions, batch):
+        """Writes a batch of cells in a single request. If the request fails, the cells are written one at a time so
+        that errors are reported for each row
+
+        Args:
+            cube_name (str): Cube name
+            dimensions (list): Dimension names in cube order
+            batch (list): List of (elements, value) tuples
+        """
+        logger = logging.getLogger(__name__)
+
+        session = self.target.session
+        try:
+            session.cubes.cells.write_values(cube_name, {tuple(elements): value for elements, value in batch}, dimensions=list(dimensions))
+            return
+        except Exception:
+            logger.info('Batch write of {} cells to {} failed, writing cells individually'.format(len(batch), cube_name))
+
+        for elements, value in batch:
+            try:
+                session.cubes.cells.write_value(value, cube_name, elements, dimensions)
+            except Exception:
+                logger.error('Error writing row {}:"{}" to {}'.format(elements, value, cube_name))
+
     def _operation_update_subset(self, dimension_name, hierarchy_name, subset_name):
         """Updates a subset
 
@@ -371,18 +521,20 @@ class Operation:
         rest = session._tm1_rest
         try:
             subset = json.dumps(self.source.get_subset(dimension_name, hierarchy_name, subset_name), ensure_ascii=False)
-            if session.dimensions.subsets.exists(subset_name, dimension_name, hierarchy_name, False):
+            if self._exists('subset', dimension_name, hierarchy_name, subset_name):
                 request = '/api/v1/Dimensions(\'{}\')/Hierarchies(\'{}\')/Subsets(\'{}\')'.format(dimension_name, hierarchy_name, subset_name)
                 rest.PATCH(request, subset)
             else:
                 request = '/api/v1/Dimensions(\'{}\')/Hierarchies(\'{}\')/Subsets'.format(dimension_name, hierarchy_name)
                 rest.POST(request, subset)
+                self._added('subset', dimension_name, hierarchy_name, subset_name)
         except Exception:
             logger.exception('Encountered error while updating subset {}/{}/{}'.format(dimension_name, hierarchy_name, subset_name))
             raise
 
     def _operation_update_hierarchy(self, dimension_name, hierarchy_name):
-        """Updates a hierarchy on a dimension
+        """Updates a hierarchy on a dimension. Only the elements, edges and attribute values that differ from the
+        target are sent
 
         Args:
             dimension_name (str): Dimension Name
@@ -397,56 +549,163 @@ class Operation:
             data = self.source.get_hierarchy(dimension_name, hierarchy_name)
             hierarchy = Hierarchy.from_dict(data)
 
-            if not session.dimensions.hierarchies.exists(dimension_name, hierarchy_name):
+            created = False
+            if not self._exists('hierarchy', dimension_name, hierarchy_name):
                 session.dimensions.hierarchies.create(Hierarchy(hierarchy_name, dimension_name))
+                self._added('hierarchy', dimension_name, hierarchy_name)
+                created = True
 
             session.dimensions.hierarchies.update_element_attributes(hierarchy)
 
-            target_hierarchy = self.target.get_hierarchy(dimension_name, hierarchy_name)
-            if target_hierarchy['Elements'] or data['Elements']:
-                session.dimensions.hierarchies.update(hierarchy)
+            if created:
+                target_hierarchy = {'Elements': [], 'Edges': []}
+            else:
+                target_hierarchy = self.target.get_hierarchy(dimension_name, hierarchy_name)
 
-                attributes = [x['Name'] for x in data['ElementAttributes']]
-                elements = [x['Name'] for x in data['Elements']]
+            if not target_hierarchy['Elements'] and not data['Elements']:
+                return
 
-                if len(attributes) == 0 or len(elements) == 0:
-                    return
+            self._update_hierarchy_structure(hierarchy, data, target_hierarchy)
+            self._update_attribute_values(dimension_name, hierarchy_name, data, target_hierarchy)
+        except Exception:
+            logger.exception('Encountered error while updating dimension {}'.format(dimension_name))
+            raise
+
+    def _update_hierarchy_structure(self, hierarchy, data, target_hierarchy):
+        """Adds and removes the elements and edges that differ between the source and target hierarchy. The whole
+        hierarchy is sent instead when the target has no elements, when elements change type, when the changes
+        would take more than hierarchy_delta_limit requests, or when they would not give the order of the source
+
+        Args:
+            hierarchy (Hierarchy): Source hierarchy
+            data (dict): Source hierarchy, as returned by get_hierarchy
+            target_hierarchy (dict): Target hierarchy, as returned by get_hierarchy
+        """
+        logger = logging.getLogger(__name__)
+
+        session = self.target.session
+        dimension_name, hierarchy_name = hierarchy.dimension_name, hierarchy.name
+
+        # Elements and edges are deleted one request at a time, above this many deletes a hierarchy is replaced as a whole
+        limit = int(self.target.config.get('hierarchy_delta_limit', 100))
+
+        delta = _hierarchy_delta(data, target_hierarchy, limit) if target_hierarchy['Elements'] else None
+        if delta is None:
+            session.dimensions.hierarchies.update(hierarchy)
+            return
+
+        deleted_elements, deleted_edges, added_elements, added_edges = delta
+        if not any(delta):
+            logger.info('Structure of hierarchy {}:{} is unchanged'.format(dimension_name, hierarchy_name))
+            return
+
+        element_service = session.dimensions.hierarchies.elements
+        for element_name in deleted_elements:
+            element_service.delete(dimension_name, hierarchy_name, element_name)
+        for parent, component in deleted_edges:
+            element_service.remove_edge(dimension_name, hierarchy_name, parent, component)
+        if added_elements:
+            element_service.add_elements(dimension_name, hierarchy_name, [hierarchy.elements[x] for x in added_elements])
+        if added_edges:
+            element_service.add_edges(dimension_name, hierarchy_name, added_edges)
+
+        logger.info('Updated hierarchy {}:{}, {} elements deleted, {} edges deleted, {} elements added, {} edges added'.format(
+            dimension_name, hierarchy_name, len(deleted_elements), len(deleted_edges), len(added_elements), len(added_edges)))
+
+    def _update_attribute_values(self, dimension_name, hierarchy_name, data, target_hierarchy):
+        """Writes the attribute values that differ between the source and target hierarchy. The changed cells are read
+        and written through one cellset for every attribute_chunk_size elements, so no MDX query grows past the
+        request size limits of the server
+
+        Args:
+            dimension_name (str): Dimension Name
+            hierarchy_name (str): Hierarchy Name
+            data (dict): Source hierarchy, as returned by get_hierarchy
+            target_hierarchy (dict): Target hierarchy, as returned by get_hierarchy
+        """
+        session = self.target.session
+        cell_service = session.cubes.cells
+
+        attributes = set(x['Name'] for x in data['ElementAttributes'])
+        if not attributes:
+            return
+
+        target_values = {lower_and_drop_spaces(x['Name']): x.get('Attributes') or {} for x in target_hierarchy['Elements']}
+
+        changes = []
+        for element in data['Elements']:
+            current = target_values.get(lower_and_drop_spaces(element['Name']), {})
+            values = {attribute: value for attribute, value in (element.get('Attributes') or {}).items()
+                      if attribute in attributes and (attribute not in current or current[attribute] != value)}
+            if values:
+                changes.append((element['Name'], values))
+
+        if not changes:
+            return
+
+        chunk_size = int(self.target.config.get('attribute_chunk_size', 1000) or 1)
+
+        cube_name = '}ElementAttributes_' + dimension_name
+        for start in range(0, len(changes), chunk_size):
+            chunk = changes[start:start + chunk_size]
+            chunk_attributes = sorted(set(attribute for _, values in chunk for attribute in values))
+
+            attribute_list = ['[%s].[%s].[%s]' % (cube_name, cube_name, attribute) for attribute in chunk_attributes]
+            element_list = ['[{}].[{}].[{}]'.format(dimension_name, hierarchy_name, element) for element, _ in chunk]
+            mdx = 'SELECT { %s } ON ROWS, { %s } ON COLUMNS FROM [%s]' % (','.join(element_list), ','.join(attribute_list), cube_name)
 
-                attribute_list = ['[}ElementAttributes_%s].[}ElementAttributes_%s].[%s]' % (dimension_name, dimension_name, attribute) for attribute in attributes]
-                element_list = ['[{}].[{}].[{}]'.format(dimension_name, hierarchy_name, element) for element in elements]
-                mdx = 'SELECT { %s } ON ROWS, { %s } ON COLUMNS FROM [%s]' % (','.join(element_list), ','.join(attribute_list), '}ElementAttributes_' + dimension_name)
-
-                cellset_id = session.cubes.cells.create_cellset(mdx)
-                cellset = session.cubes.cells.execute_mdx(mdx, cell_properties=['Ordinal', 'Value', 'Updateable', 'RuleDerived'])
-
-                updates = []
-                for element in data['Elements']:
-                    for attribute, value in element.get('Attributes', {}).items():
-                        if attribute not in attributes:
-                            continue
-                        cellset_value = cellset.get(
-                            ('[%s].[%s].[%s]' % (dimension_name, hierarchy_name, element['Name']), '[}ElementAttributes_%s].[}ElementAttributes_%s].[%s]' % (dimension_name, dimension_name, attribute)), {'Value': '_____'})
-                        if value != cellset_value['Value']:
-                            if not cellset_value['Updateable'] & 0x10000000:
-                                if attribute == 'Format':
-                                    value = 'd:' + value
-                                update = {
-                                    "Ordinal": cellset_value['Ordinal'],
-                                    "Value": value
-                                }
-                                updates.append(update)
-                            else:
-                                logger.info('Did not update {} for attribute {} in dimension {} because not updateable'.format(element['Name'], attribute, dimension_name))
+            cellset_id = cell_service.create_cellset(mdx)
+            try:
+                # The cellset is read and written to, so the query only runs once
+                cellset = build_content_from_cellset_dict(cell_service.extract_cellset_raw(
+                    cellset_id, cell_properties=['Ordinal', 'Value', 'Updateable'], elem_properties=['UniqueName'], member_properties=['UniqueName'],
+                    delete_cellset=False))
 
+                updates = self._get_attribute_updates(dimension_name, hierarchy_name, chunk, cellset)
                 if updates:
-                    tm1_rest = session._tm1_rest
                     request = "/api/v1/Cellsets('{}')/Cells".format(cellset_id)
+                    session._tm1_rest.PATCH(request, json.dumps(updates, ensure_ascii=False))
+            finally:
+                cell_service.delete_cellset(cellset_id)
 
-                    tm1_rest.PATCH(request, json.dumps(updates, ensure_ascii=False))
-                    session.cubes.cells.delete_cellset(cellset_id)
-        except Exception:
-            logger.exception('Encountered error while updating dimension {}'.format(dimension_name))
-            raise
+    def _get_attribute_updates(self, dimension_name, hierarchy_name, chunk, cellset):
+        """Returns the cell updates of a chunk of attribute values
+
+        Args:
+            dimension_name (str): Dimension Name
+            hierarchy_name (str): Hierarchy Name
+            chunk (list): List of (element name, {attribute: value}) tuples
+            cellset (dict): Cells of the chunk, by coordinates
+
+        Returns:
+            list: List of {"Ordinal": ordinal, "Value": value} updates
+        """
+        logger = logging.getLogger(__name__)
+
+        cube_name = '}ElementAttributes_' + dimension_name
+
+        updates = []
+        for element, values in chunk:
+            for attribute, value in values.items():
+                cellset_value = cellset.get(
+                    ('[%s].[%s].[%s]' % (dimension_name, hierarchy_name, element), '[%s].[%s].[%s]' % (cube_name, cube_name, attribute)))
+                if cellset_value is None:
+                    logger.error('Unable to update {} for attribute {} in dimension {} because the cell was not found'.format(element, attribute, dimension_name))
+                    continue
+
+                if value != cellset_value['Value']:
+                    if not cellset_value['Updateable'] & 0x10000000:
+                        if attribute == 'Format':
+                            value = 'd:' + value
+                        update = {
+                            "Ordinal": cellset_value['Ordinal'],
+                            "Value": value
+                        }
+                        updates.append(update)
+                    else:
+                        logger.info('Did not update {} for attribute {} in dimension {} because not updateable'.format(element, attribute, dimension_name))
+
+        return updates
 
     def _operation_update_dimension(self, dimension_name):
         """Updates a dimension
@@ -462,8 +721,9 @@ class Operation:
             data = self.source.dimensions[dimension_name]
             dimension = Dimension.from_dict(data)
 
-            if not session.dimensions.exists(dimension_name):
+            if not self._exists('dimension', dimension_name):
                 session.dimensions.create(dimension)
+                self._added('dimension', dimension_name)
         except Exception:
             logger.exception('Encountered error while updating dimension {}'.format(dimension_name))
             raise
@@ -483,10 +743,11 @@ class Operation:
             process = self.source.processes[process_name]
             process = Process.from_dict(process)
 
-            if session.processes.exists(process_name):
+            if self._exists('process', process_name):
                 session.processes.update(process)
             else:
                 session.processes.create(process)
+                self._added('process', process_name)
 
         except Exception:
             logger.exception('Encountered error while updating process {}'.format(process_name))
@@ -513,10 +774,13 @@ class Operation:
                 "Name": name
             }
 
-            try:
-                tm1_rest.POST(request, json.dumps(data))
-            except Exception:
-                pass
+            inventory = self.target.inventory
+            if inventory is None or not inventory.exists('blob', name):
+                try:
+                    tm1_rest.POST(request, json.dumps(data))
+                    self._added('blob', name)
+                except Exception:
+                    pass
 
             request = '/api/v1/Contents(\'Blobs\')/Contents(\'{}\')/Content'.format(name)
             data = self.source.get_file(file_name)
@@ -525,7 +789,7 @@ class Operation:
                 url = tm1_rest._base_url + request
                 url = url.replace(' ', '%20').replace('#', '%23')
 
-                tm1_rest._s.patch(url=url, headers=tm1_rest._headers, data=data, verify=tm1_rest._verify)
+                tm1_rest._s.patch(url=url, headers=tm1_rest._headers, data=data, verify=tm1_rest._verify, timeout=tm1_rest._timeout)
             except Exception:
                 logger.exception('unable to patch')
 
@@ -553,6 +817,142 @@ class Operation:
             raise
 
 
+def _parse_view_data(view_data):
+    """Yields a (dimensions, elements, value) tuple for every row of view data
+
+    Args:
+        view_data (list): Rows of '[dimension].[hierarchy].[element]' members, followed by the cell value
+    """
+    for row in view_data:
+        groups = [RE_MEMBER.match(a) for a in row[:-1]]
+        dimensions = tuple(g.group(2) for g in groups)
+        elements = [g.group(6) for g in groups]
+
+        yield dimensions, elements, row[-1]
+
+
+def get_dimension_cubes(apps):
+    """Returns {dimension name: set of cube names} of the cubes of apps, to find the cubes built from a dimension.
+    Dimension names are compared like TM1 does, so they are keys as returned by lower_and_drop_spaces
+
+    Args:
+        apps (list): Applications, None is skipped
+    """
+    result = {}
+    for app in apps:
+        if app is None:
+            continue
+
+        for cube in app.cubes.values():
+            for dimension in cube['Dimensions']:
+                result.setdefault(lower_and_drop_spaces(dimension['Name']), set()).add(cube['Name'])
+
+    return result
+
+
+def _hierarchy_delta(source, target, limit):
+    """Compares the elements and edges of two hierarchies, as returned by get_hierarchy. Names are compared like TM1
+    does, ignoring case and spaces
+
+    Args:
+        source (dict): Source hierarchy
+        target (dict): Target hierarchy
+        limit (int): Maximum number of elements and edges to delete one at a time
+
+    Returns:
+        tuple: (deleted element names, deleted (parent, component) edges, added element names, added
+            {(parent, component): weight} edges), or None if the hierarchy has to be replaced as a whole. That is the
+            case when adding the elements and edges after the existing ones does not give the order of the source
+    """
+    source_elements = {lower_and_drop_spaces(x['Name']): x for x in source['Elements']}
+    target_elements = {lower_and_drop_spaces(x['Name']): x for x in target['Elements']}
+
+    for key in source_elements.keys() & target_elements.keys():
+        if source_elements[key]['Type'] != target_elements[key]['Type']:
+            return None
+
+    source_edges = {(lower_and_drop_spaces(x['ParentName']), lower_and_drop_spaces(x['ComponentName'])): x for x in source['Edges']}
+    target_edges = {(lower_and_drop_spaces(x['ParentName']), lower_and_drop_spaces(x['ComponentName'])): x for x in target['Edges']}
+
+    def changed(key):
+        return key not in source_edges or key not in target_edges or source_edges[key]['Weight'] != target_edges[key]['Weight']
+
+    deleted_elements = [x['Name'] for key, x in target_elements.items() if key not in source_elements]
+    added_elements = [x['Name'] for key, x in source_elements.items() if key not in target_elements]
+
+    # Edges of deleted elements are deleted along with the elements
+    deleted_edges = [(x['ParentName'], x['ComponentName']) for key, x in target_edges.items()
+                     if changed(key) and key[0] in source_elements and key[1] in source_elements]
+    added_edges = {(x['ParentName'], x['ComponentName']): x['Weight'] for key, x in source_edges.items() if changed(key)}
+
+    if len(deleted_elements) + len(deleted_edges) > limit:
+        return None
+
+    # TM1 adds elements after the existing elements, and edges after the existing children of their parent
+    kept_elements = [key for key in target_elements if key in source_elements]
+    if kept_elements + [key for key in source_elements if key not in target_elements] != list(source_elements):
+        return None
+
+    kept_edges = [key for key in target_edges if not changed(key)]
+    if _children(kept_edges + [key for key in source_edges if changed(key)]) != _children(source_edges):
+        return None
+
+    return deleted_elements, deleted_edges, added_elements, added_edges
+
+
+def _children(edges):
+    """Returns {parent: [components]} of a list of (parent, component) edges, in order"""
+    result = {}
+    for parent, component in edges:
+        result.setdefault(parent, []).append(component)
+
+    return result
+
+
+def _read_ahead(iterable, size):
+    """Yields the items of iterable, which is consumed by a background thread up to size items ahead
+
+    Args:
+        iterable (iterable): Items
+        size (int): Maximum number of items read ahead
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
 class Ops(IntEnum):
 
     """This enum defines all the possible operations that can take place as part
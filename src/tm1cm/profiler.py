@@ -0,0 +1,234 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from urllib.parse import unquote, urlsplit
+
+from tm1cm import tracing
+
+PROFILE_FOLDER = '.tm1cm'
+PROFILE_FILE = 'profile.json'
+
+RE_KEY = re.compile(r"\('(?:[^']|'')*'\)")
+
+_profiler = None
+
+
+class Profiler:
+    """Collects the time spent in every phase of get, put and migrations, and the requests sent to the TM1 server by
+    endpoint. Phases that run in many threads at once add up, so their total can be more than the wall time. Safe to
+    use from many threads
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._timers = {}
+        self._requests = {}
+
+    @contextmanager
+    def timer(self, name):
+        """Times the body of a with statement
+
+        Args:
+            name (str): Name of the phase, e.g. 'RemoteApplication.populate.cubes'
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        """Adds time spent in a phase
+
+        Args:
+            name (str): Name of the phase
+            seconds (float): Time spent
+        """
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+
+            timer['count'] += 1
+            timer['total'] += seconds
+            timer['max'] = max(timer['max'], seconds)
+
+    def add_request(self, method, url, sent, received, seconds, status):
+        """Adds a request sent to the TM1 server
+
+        Args:
+            method (str): HTTP method
+            url (str): URL, or path after the server address
+            sent (int): Number of bytes in the request body
+            received (int): Number of bytes in the response body
+            seconds (float): Time until the response was received
+            status (int): HTTP status code
+        """
+        endpoint = '{} {}'.format(method.upper(), get_endpoint(url))
+
+        with self._lock:
+            request = self._requests.get(endpoint)
+            if request is None:
+                request = self._requests[endpoint] = {'count': 0, 'errors': 0, 'sent': 0, 'received': 0, 'total': 0.0}
+
+            request['count'] += 1
+            request['errors'] += 1 if status >= 400 else 0
+            request['sent'] += sent
+            request['received'] += received
+            request['total'] += seconds
+
+    def summary(self):
+        """Returns everything collected so far
+
+        Returns:
+            dict: {'wall_time': seconds, 'timers': {name: stats}, 'requests': {endpoint: stats}}
+        """
+        with self._lock:
+            return {
+                'wall_time': time.perf_counter() - self._start,
+                'timers': {name: dict(timer) for name, timer in sorted(self._timers.items())},
+                'requests': {name: dict(request) for name, request in sorted(self._requests.items(), key=lambda x: -x[1]['total'])},
+            }
+
+    def format_table(self):
+        summary = self.summary()
+
+        lines = ['{:<60} {:>7} {:>10} {:>10}'.format('Phase', 'count', 'total (s)', 'max (s)')]
+        for name, timer in summary['timers'].items():
+            lines.append('{:<60} {:>7} {:>10.3f} {:>10.3f}'.format(name, timer['count'], timer['total'], timer['max']))
+
+        lines.append('')
+        lines.append('{:<60} {:>7} {:>10} {:>12} {:>12}'.format('Request', 'count', 'total (s)', 'sent', 'received'))
+        for name, request in summary['requests'].items():
+            lines.append('{:<60} {:>7} {:>10.3f} {:>12} {:>12}'.format(name[:60], request['count'], request['total'], request['sent'], request['received']))
+
+        count = sum(x['count'] for x in summary['requests'].values())
+        lines.append('')
+        lines.append('Wall time {:.3f}s, {} requests'.format(summary['wall_time'], count))
+
+        return '\n'.join(lines)
+
+    def save(self, path):
+        """Writes the summary to .tm1cm/profile.json in a project
+
+        Args:
+            path (str): Path of the project
+
+        Returns:
+            str: Path of the file
+        """
+        logger = logging.getLogger(__name__)
+
+        file = os.path.join(path, PROFILE_FOLDER, PROFILE_FILE)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+
+        with open(file, 'w', encoding='utf8') as fp:
+            json.dump(self.summary(), fp, indent=4)
+
+        logger.info('Wrote profile to {}'.format(file))
+
+        return file
+
+
+def enable():
+    """Starts collecting a profile, returns the Profiler"""
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def disable():
+    global _profiler
+    _profiler = None
+
+
+def get_profiler():
+    """Returns the Profiler, or None if profiling is not enabled"""
+    return _profiler
+
+
+def timer(name, attributes=None):
+    """Times the body of a with statement when profiling is enabled, see Profiler.timer. When tracing is enabled, the
+    body is recorded as a span as well
+
+    Args:
+        name (str): Name of the phase
+        attributes (dict): Optional, attributes of the span
+    """
+    profiler = _profiler
+    tracer = tracing.get_tracer()
+    if profiler is None and tracer is None:
+        return nullcontext()
+    if tracer is None:
+        return profiler.timer(name)
+    if profiler is None:
+        return tracer.span(name, attributes)
+
+    return _timer(profiler, tracer, name, attributes)
+
+
+@contextmanager
+def _timer(profiler, tracer, name, attributes):
+    with profiler.timer(name), tracer.span(name, attributes):
+        yield
+
+
+def add(name, seconds):
+    profiler = _profiler
+    if profiler is not None:
+        profiler.add(name, seconds)
+
+
+def record(name, start, end, attributes=None):
+    """Adds a phase that has already ended to the profile and the trace, whichever is enabled
+
+    Args:
+        name (str): Name of the phase
+        start (float): perf_counter at the start
+        end (float): perf_counter at the end
+        attributes (dict): Optional, attributes of the span
+    """
+    add(name, end - start)
+
+    tracer = tracing.get_tracer()
+    if tracer is not None:
+        tracer.add_span(name, start, end, attributes)
+
+
+def add_request(method, url, sent, received, seconds, status):
+    """Adds a request sent to the TM1 server to the profile and the trace, whichever is enabled. See
+    Profiler.add_request
+    """
+    profiler = _profiler
+    if profiler is not None:
+        profiler.add_request(method, url, sent, received, seconds, status)
+
+    tracer = tracing.get_tracer()
+    if tracer is not None:
+        tracer.add_request(method, url, get_endpoint(url), sent, received, seconds, status)
+
+
+def record_response(response, *args, **kwargs):
+    """requests response hook, adds every response of a session to the profile and the trace when enabled"""
+    if _profiler is None and tracing.get_tracer() is None:
+        return
+
+    request = response.request
+    body = request.body or b''
+    add_request(request.method, request.url, len(body), len(response.content), response.elapsed.total_seconds(), response.status_code)
+
+
+def get_endpoint(url):
+    """Returns the REST API endpoint of a URL, without the query and with the object names replaced by *, e.g.
+    Dimensions('*')/Hierarchies('*')
+    """
+    path = unquote(urlsplit(url).path)
+    if '/api/v1/' in path:
+        path = path.split('/api/v1/', 1)[1]
+
+    return RE_KEY.sub("('*')", path)
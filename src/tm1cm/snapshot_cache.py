@@ -0,0 +1,254 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from tm1cm.manifest import MANIFEST_FOLDER
+
+SNAPSHOT_FOLDER = 'snapshots'
+OBJECT_FOLDER = 'objects'
+SNAPSHOT_VERSION = 1
+
+# Files that take a request each to fetch. Everything else is read in a handful of requests by refresh, so it is
+# never cached
+CACHED_FOLDERS = ('data/view/', 'data/view_data/', 'data/subset/', 'data/hierarchy/', 'files/', 'scripts/')
+
+
+class SnapshotCache:
+    """Persistent cache of the files that make up the local representation of a TM1 server, so they don't have to be
+    fetched again every time the server is compared with another application.
+
+    File contents are kept once in a content-addressed object store (.tm1cm/objects), shared by every server. Each
+    server has an index (.tm1cm/snapshots/<key>.json) of file names to the SHA-256 of their content, the server
+    timestamp (if any) and the time they were fetched. A file is served from the cache when its server timestamp is
+    unchanged or, for objects without a timestamp, when it was fetched less than max_age seconds ago. The index is
+    ignored when the settings it was made with change. Safe to use from many threads.
+    """
+
+    def __init__(self, path, key, settings, max_age=300):
+        self.folder = os.path.join(path, MANIFEST_FOLDER)
+        self.file = os.path.join(self.folder, SNAPSHOT_FOLDER, '{}.json'.format(_hash(key.encode('utf8'))))
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._settings = _hash(json.dumps(settings, sort_keys=True, default=str).encode('utf8'))
+        self._entries = self._load()
+        self._dirty = False
+        self._released = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        logger = logging.getLogger(__name__)
+
+        if not os.path.isfile(self.file):
+            return {}
+
+        try:
+            with open(self.file, 'r', encoding='utf8') as fp:
+                data = json.load(fp)
+
+            if data.get('version') != SNAPSHOT_VERSION or data.get('settings') != self._settings:
+                logger.info('Ignoring snapshot cache {}, it was made with other settings'.format(self.file))
+                return {}
+
+            return data.get('files', {})
+        except Exception:
+            logger.warning('Unable to read snapshot cache {}, starting with an empty cache'.format(self.file))
+            return {}
+
+    @staticmethod
+    def is_cached(name):
+        """Checks if files of this name are kept in the cache
+
+        Args:
+            name (str): File name, relative to the project path
+        """
+        return _key(name).startswith(CACHED_FOLDERS)
+
+    def is_fresh(self, name, timestamp=None):
+        """Checks if a file can be served from the cache
+
+        Args:
+            name (str): File name, relative to the project path
+            timestamp (str): Current server timestamp of the object, if the server has one
+
+        Returns:
+            bool: True if the cached content is still current
+        """
+        with self._lock:
+            entry = self._entries.get(_key(name))
+
+        if not entry:
+            return False
+
+        if timestamp or entry.get('timestamp'):
+            if entry.get('timestamp') != timestamp:
+                return False
+        elif time.time() - entry['time'] > self.max_age:
+            return False
+
+        return os.path.isfile(self._object_file(entry['hash']))
+
+    def digest(self, name):
+        """Returns the SHA-256 hex digest of the cached content of a file, or None"""
+        with self._lock:
+            entry = self._entries.get(_key(name))
+
+        return entry['hash'] if entry else None
+
+    def read(self, name):
+        """Returns the cached content of a file, as bytes. See is_fresh"""
+        with open(self._object_file(self.digest(name)), 'rb') as fp:
+            return fp.read()
+
+    def put(self, name, data, timestamp=None):
+        """Stores the content of a file
+
+        Args:
+            name (str): File name, relative to the project path
+            data (bytes|iterator): File content, or an iterator of bytes
+            timestamp (str): Server timestamp of the object, if known
+
+        Returns:
+            bytes|iterator: data, or for an iterator, an iterator that stores the content once it was read to the end
+        """
+        if isinstance(data, bytes):
+            digest = _hash(data)
+            file = self._object_file(digest)
+            if not os.path.isfile(file):
+                self._write_object(file, data)
+
+            self._add(name, digest, timestamp)
+            return data
+
+        return self._put_stream(name, data, timestamp)
+
+    def _put_stream(self, name, data, timestamp):
+        temp_file = os.path.join(self.folder, OBJECT_FOLDER, '{}.{}.tmp'.format(os.getpid(), threading.get_ident()))
+        os.makedirs(os.path.dirname(temp_file), exist_ok=True)
+
+        digest = hashlib.sha256()
+        try:
+            with open(temp_file, 'wb') as fp:
+                for chunk in data:
+                    digest.update(chunk)
+                    fp.write(chunk)
+                    yield chunk
+
+            file = self._object_file(digest.hexdigest())
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            os.replace(temp_file, file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+        self._add(name, digest.hexdigest(), timestamp)
+
+    def _add(self, name, digest, timestamp):
+        key = _key(name)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['hash'] != digest:
+                self._released = True
+
+            self._entries[key] = {'hash': digest, 'timestamp': timestamp, 'time': time.time()}
+            self._dirty = True
+
+    def invalidate(self, prefixes):
+        """Drops every file whose name starts with one of prefixes, e.g. after the objects were changed on the server
+
+        Args:
+            prefixes (list): File names or folders, relative to the project path. Folders end with '/'
+        """
+        prefixes = tuple(_key(x) for x in prefixes)
+
+        with self._lock:
+            names = [x for x in self._entries if x.startswith(prefixes)]
+            for name in names:
+                del self._entries[name]
+
+            if names:
+                self._dirty = self._released = True
+
+    def clear(self):
+        """Drops every file, so everything is fetched again"""
+        with self._lock:
+            self._dirty = self._released = bool(self._entries)
+            self._entries = {}
+
+    def save(self):
+        logger = logging.getLogger(__name__)
+
+        with self._lock:
+            if not self._dirty:
+                return
+
+            data = {
+                'version': SNAPSHOT_VERSION,
+                'settings': self._settings,
+                'files': dict(self._entries),
+            }
+            released = self._released
+            self._dirty = self._released = False
+
+        try:
+            os.makedirs(os.path.dirname(self.file), exist_ok=True)
+
+            temp_file = self.file + '.tmp'
+            with open(temp_file, 'w', encoding='utf8') as fp:
+                json.dump(data, fp, ensure_ascii=False)
+            os.replace(temp_file, self.file)
+        except Exception:
+            logger.warning('Unable to write snapshot cache {}'.format(self.file))
+            return
+
+        if released:
+            self.prune()
+
+    def prune(self):
+        """Deletes objects that no snapshot index refers to anymore"""
+        logger = logging.getLogger(__name__)
+
+        used = set()
+        snapshot_folder = os.path.join(self.folder, SNAPSHOT_FOLDER)
+        for file_name in os.listdir(snapshot_folder):
+            if not file_name.endswith('.json'):
+                continue
+
+            try:
+                with open(os.path.join(snapshot_folder, file_name), 'r', encoding='utf8') as fp:
+                    used.update(x['hash'] for x in json.load(fp).get('files', {}).values())
+            except Exception:
+                # Objects of an index that cannot be read may still be needed by another process
+                logger.warning('Unable to read snapshot cache {}, not pruning'.format(file_name))
+                return
+
+        object_folder = os.path.join(self.folder, OBJECT_FOLDER)
+        for root, _, files in os.walk(object_folder):
+            for file_name in files:
+                if not file_name.endswith('.tmp') and file_name not in used:
+                    os.remove(os.path.join(root, file_name))
+
+    def _object_file(self, digest):
+        return os.path.join(self.folder, OBJECT_FOLDER, digest[:2], digest)
+
+    def _write_object(self, file, data):
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+
+        temp_file = '{}.{}.tmp'.format(file, threading.get_ident())
+        with open(temp_file, 'wb') as fp:
+            fp.write(data)
+        os.replace(temp_file, file)
+
+
+def _hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _key(name):
+    return '/'.join(name.split(os.sep))
@@ -1,11 +1,13 @@
-import random
 import re
-import string
+
+# Bump whenever a change to the formatter changes its output, so cached results are not reused
+VERSION = 1
 
 INDENT = ' ' * 3
 
-RE_TOKENIZE_STRING = r'(\')(.*?)(\')'
-RE_TOKENIZE_COMMENT = r'^([ \t]*?)(#)(.*?)(?=\n|$)'
+TOKEN = '^{}:{}^'
+
+RE_TOKEN = r'\^(COMMENT|STRING):(\d+)\^'
 RE_FUNC = r'(?<=[^\w\d])({})(?=[^\w\d])'
 RE_FUNC_PAREN = r'(?<=[^\w\d])({})(\s*)([^\w\d\(])'
 RE_OPERATOR = r'(\s*)(\@\<\=|\@\>\=|\@\<\>|\@\=|\@\<|\@\>|\<\=|\>\=|\<\>|\+|\-|\/|\\|\*|\<|\>|\~|\||=|\&|\%)(\s*)'
@@ -107,11 +109,16 @@ TI_VARIABLES = (
     'PrologMinorErrorCount'
 )
 
+# Every whole word is matched once and looked up, rather than trying each known name at every position
+_RE_TOKEN = re.compile(RE_TOKEN)
+_RE_WORD = re.compile(RE_FUNC.format(r'\w+'))
+_FUNCTIONS = {x.casefold() for x in TI_FUNCTIONS}
+_CONTROL = {x.casefold() for x in TI_CONTROL_PARAM}
+_VARIABLES = {x.casefold(): x for x in TI_VARIABLES}
 
-def format_procedure(text):
-    token_dict = {}
 
-    text = _tokenize(text, token_dict)
+def format_procedure(text):
+    text, tokens = _tokenize(text)
 
     text = text.replace('\t', '   ')
     text = text.replace(' ', '')
@@ -124,62 +131,71 @@ def format_procedure(text):
     text = _update_indent(text)
     text = _update_executeprocess(text)
 
-    text = _detokenize(text, token_dict)
+    text = _detokenize(text, tokens)
 
     return text
 
 
-def _detokenize(text, token_dict):
+def _detokenize(text, tokens):
     # Replace tokens with their original values
-    for k, v in token_dict.items():
-        text = text.replace(v, k)
+    return _RE_TOKEN.sub(lambda x: tokens[int(x.group(2))], text)
 
-    return text
 
+def _tokenize(text):
+    """Splits comments and strings out of a procedure, so the formatting passes only see code. Each comment and string
+    is replaced by a placeholder that refers to its position in the returned token list.
 
-def _tokenize(text, token_dict):
-    # Replace comments with tokens
-    found_string = re.search(RE_TOKENIZE_COMMENT, text, flags=re.MULTILINE)
-    while found_string:
+    Comment lines are replaced first, so quotes within comments never start a string. Both scans are linear in the
+    length of the procedure.
 
-        start = found_string.start(0)
-        end = found_string.end(0)
+    Args:
+        text (str): Procedure text
 
-        entry = ''.join(found_string.groups()).lstrip()
+    Returns:
+        tuple: (text with placeholders, list of tokens)
+    """
+    tokens = []
 
-        if entry not in token_dict:
-            key = '^COMMENT:' + ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(20)) + '^'
-            token_dict[entry] = key
-        else:
-            key = token_dict[entry]
+    def placeholder(kind, value):
+        tokens.append(value)
+        return TOKEN.format(kind, len(tokens) - 1)
 
-        text = text[:start] + key + text[end:]
+    # Replace comments with tokens
+    lines = text.split('\n')
+    for i, line in enumerate(lines):
+        entry = line.lstrip(' \t')
+        if entry.startswith('#'):
+            lines[i] = placeholder('COMMENT', entry)
 
-        found_string = re.search(RE_TOKENIZE_COMMENT, text, flags=re.MULTILINE)
+    text = '\n'.join(lines)
 
     # Replace strings with tokens
-    found_string = re.search(RE_TOKENIZE_STRING, text, flags=re.DOTALL)
-    while found_string:
-        start = found_string.start(0)
-        end = found_string.end(0)
+    output = []
+    position = 0
+    while True:
+        start = text.find('\'', position)
+        end = text.find('\'', start + 1) if start != -1 else -1
+        if end == -1:
+            break
 
-        entry = ''.join(found_string.groups())
+        entry = text[start:end + 1]
 
-        if entry not in token_dict:
-            key = '^STRING:' + ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(20)) + '^'
-            token_dict[entry] = key
-        else:
-            key = token_dict[entry]
+        # A string that spans several lines can contain lines that look like comments, put them back
+        if '\n' in entry:
+            entry = _detokenize(entry, tokens)
 
-        text = text[:start] + key + text[end:]
+        output.append(text[position:start])
+        output.append(placeholder('STRING', entry))
 
-        found_string = re.search(RE_TOKENIZE_STRING, text, flags=re.DOTALL)
+        position = end + 1
 
-    return text
+    output.append(text[position:])
+
+    return ''.join(output), tokens
 
 
 def _update_functions(text):
-    text = re.sub(RE_FUNC.format('|'.join(TI_FUNCTIONS)), lambda x: x.group(1).upper(), text, flags=re.IGNORECASE)
+    text = _RE_WORD.sub(lambda x: x.group(1).upper() if x.group(1).casefold() in _FUNCTIONS else x.group(1), text)
     text = re.sub(RE_PARAM_PAREN, r'\2', text)
     text = re.sub(RE_PARAM_COMMA, r'\2 ', text)
     text = re.sub(RE_END, r'\2\4', text)
@@ -188,7 +204,7 @@ def _update_functions(text):
 
 
 def _update_control(text):
-    text = re.sub(RE_FUNC.format('|'.join(TI_CONTROL_PARAM)), lambda x: x.group(1).upper(), text, flags=re.IGNORECASE)
+    text = _RE_WORD.sub(lambda x: x.group(1).upper() if x.group(1).casefold() in _CONTROL else x.group(1), text)
 
     return text
 
@@ -200,8 +216,7 @@ def _update_operator(text):
 
 
 def _update_variables(text):
-    for var in TI_VARIABLES:
-        text = re.sub(RE_FUNC.format(var), var, text, flags=re.IGNORECASE)
+    text = _RE_WORD.sub(lambda x: _VARIABLES.get(x.group(1).casefold(), x.group(1)), text)
 
     text = re.sub(RE_DIGITS, r'\1 \3\5', text)
 
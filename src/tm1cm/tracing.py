@@ -0,0 +1,286 @@
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+TRACE_FORMATS = ['chrome', 'otlp']
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_tracer = None
+
+
+class Span:
+    """A timed piece of work, e.g. an operation or a request, within a trace"""
+
+    def __init__(self, tracer, name, parent=None, attributes=None, kind=SPAN_KIND_INTERNAL, start=None):
+        self.name = name
+        self.span_id = '{:016x}'.format(tracer.random.getrandbits(64))
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.kind = kind
+        self.start = start if start is not None else time.perf_counter()
+        self.end = None
+        self.error = None
+        self.thread = threading.get_ident()
+
+
+class Tracer:
+    """Records spans of get, put and migrations, from the run down to every request sent to the TM1 server, and
+    writes them to a file in Chrome trace or OTLP JSON format. Safe to use from many threads
+    """
+
+    def __init__(self, service_name='tm1cm'):
+        self.service_name = service_name
+        self.random = random.Random()
+        self.trace_id = '{:032x}'.format(self.random.getrandbits(128))
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._spans = []
+
+        # Spans are timed with perf_counter, this converts them to wall clock time
+        self._epoch_ns = time.time_ns()
+        self._perf_counter = time.perf_counter()
+
+    def __len__(self):
+        return len(self._spans)
+
+    def current_span(self):
+        """Returns the innermost open span of the calling thread, or None"""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, attributes=None, kind=SPAN_KIND_INTERNAL):
+        """Records the body of a with statement as a span, a child of the current span of the thread
+
+        Args:
+            name (str): Span name
+            attributes (dict): Optional, span attributes
+            kind (int): SPAN_KIND_INTERNAL or SPAN_KIND_CLIENT
+        """
+        span = Span(self, name, self.current_span(), attributes, kind)
+        with self.attach(span):
+            try:
+                yield span
+            except BaseException as e:
+                span.error = '{}: {}'.format(type(e).__name__, e)
+                raise
+            finally:
+                span.end = time.perf_counter()
+                self._add(span)
+
+    @contextmanager
+    def attach(self, span):
+        """Makes span the current span of the calling thread, e.g. in a worker thread, for the body of a with statement"""
+        if span is None:
+            yield
+            return
+
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        stack.append(span)
+        try:
+            yield
+        finally:
+            # Spans opened in generators can end out of order, when a generator is not read to the end
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i] is span:
+                    del stack[i]
+                    break
+
+    def add_span(self, name, start, end, attributes=None, kind=SPAN_KIND_INTERNAL, error=None):
+        """Records a span that has already ended, as a child of the current span of the thread
+
+        Args:
+            name (str): Span name
+            start (float): perf_counter at the start
+            end (float): perf_counter at the end
+            attributes (dict): Optional, span attributes
+            kind (int): SPAN_KIND_INTERNAL or SPAN_KIND_CLIENT
+            error (str): Optional, error message
+        """
+        span = Span(self, name, self.current_span(), attributes, kind, start)
+        span.end = end
+        span.error = error
+        self._add(span)
+
+    def add_request(self, method, url, endpoint, sent, received, seconds, status):
+        """Records a request sent to the TM1 server, that ended now. Its size is also added up on the current span,
+        so e.g. an operation span shows how much it sent and received. See Profiler.add_request
+
+        Args:
+            method (str): HTTP method
+            url (str): URL, or path after the server address
+            endpoint (str): REST API endpoint, see profiler.get_endpoint
+            sent (int): Number of bytes in the request body
+            received (int): Number of bytes in the response body
+            seconds (float): Time until the response was received
+            status (int): HTTP status code
+        """
+        end = time.perf_counter()
+
+        attributes = {
+            'http.method': method.upper(),
+            'http.url': url,
+            'http.route': endpoint,
+            'http.status_code': status,
+            'http.request_content_length': sent,
+            'http.response_content_length': received,
+        }
+        error = 'HTTP {}'.format(status) if status >= 400 else None
+        self.add_span('{} {}'.format(method.upper(), endpoint), end - seconds, end, attributes, SPAN_KIND_CLIENT, error)
+
+        parent = self.current_span()
+        if parent is not None:
+            with self._lock:
+                for key, value in [('tm1cm.requests', 1), ('tm1cm.bytes_sent', sent), ('tm1cm.bytes_received', received)]:
+                    parent.attributes[key] = parent.attributes.get(key, 0) + value
+
+    def _add(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def _unix_ns(self, value):
+        return self._epoch_ns + int((value - self._perf_counter) * 1e9)
+
+    def to_chrome(self):
+        """Returns the spans in Chrome trace event format, for chrome://tracing, Perfetto or speedscope"""
+        pid = os.getpid()
+        with self._lock:
+            spans = sorted(self._spans, key=lambda x: x.start)
+
+        events = []
+        for span in spans:
+            args = dict(span.attributes)
+            if span.error:
+                args['error'] = span.error
+
+            events.append({
+                'name': span.name,
+                'cat': 'request' if span.kind == SPAN_KIND_CLIENT else 'tm1cm',
+                'ph': 'X',
+                'ts': self._unix_ns(span.start) / 1000,
+                'dur': (span.end - span.start) * 1e6,
+                'pid': pid,
+                'tid': span.thread,
+                'args': args,
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_otlp(self):
+        """Returns the spans in OTLP JSON format, as sent to an OpenTelemetry collector"""
+        with self._lock:
+            spans = sorted(self._spans, key=lambda x: x.start)
+
+        result = []
+        for span in spans:
+            item = {
+                'traceId': self.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': span.kind,
+                'startTimeUnixNano': str(self._unix_ns(span.start)),
+                'endTimeUnixNano': str(self._unix_ns(span.end)),
+                'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span.attributes.items()],
+                'status': {'code': STATUS_ERROR, 'message': span.error} if span.error else {'code': STATUS_OK},
+            }
+            if span.parent_id:
+                item['parentSpanId'] = span.parent_id
+
+            result.append(item)
+
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+                'scopeSpans': [{'scope': {'name': 'tm1cm'}, 'spans': result}],
+            }]
+        }
+
+    def save(self, file, trace_format='chrome'):
+        """Writes the spans to a file
+
+        Args:
+            file (str): Path of the file
+            trace_format (str): One of TRACE_FORMATS
+        """
+        logger = logging.getLogger(__name__)
+
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError('Unsupported trace format {}, use one of {}'.format(trace_format, ', '.join(TRACE_FORMATS)))
+
+        data = self.to_chrome() if trace_format == 'chrome' else self.to_otlp()
+
+        directory = os.path.dirname(os.path.abspath(file))
+        os.makedirs(directory, exist_ok=True)
+        with open(file, 'w', encoding='utf8') as fp:
+            json.dump(data, fp)
+
+        logger.info('Wrote {} spans to {}'.format(len(self), file))
+
+
+def enable(service_name='tm1cm'):
+    """Starts recording spans, returns the Tracer"""
+    global _tracer
+    _tracer = Tracer(service_name)
+    return _tracer
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def get_tracer():
+    """Returns the Tracer, or None if tracing is not enabled"""
+    return _tracer
+
+
+def span(name, attributes=None):
+    """Records the body of a with statement as a span when tracing is enabled, see Tracer.span"""
+    tracer = _tracer
+    if tracer is None:
+        return nullcontext()
+
+    return tracer.span(name, attributes)
+
+
+def wrap(func):
+    """Returns func, made to run inside the current span of the calling thread. Used to hand work to worker threads
+    so their spans end up in the right place of the trace
+    """
+    tracer = _tracer
+    if tracer is None:
+        return func
+
+    parent = tracer.current_span()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.attach(parent):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+
+    return {'stringValue': str(value)}
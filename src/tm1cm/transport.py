@@ -0,0 +1,57 @@
+from TM1py.Services import TM1Service
+
+from tm1cm.profiler import record_response
+
+# connect.yaml settings that are handled by tm1cm, everything else is passed on to TM1py
+TRANSPORT_KEYS = ['pool_maxsize', 'keep_alive', 'compress']
+
+
+def create_session(session_config):
+    """Creates a TM1py session from connect.yaml and credentials.yaml settings, with its HTTP transport configured
+
+    Args:
+        session_config (dict): Merged connect.yaml and credentials.yaml settings
+
+    Returns:
+        TM1Service: Session
+    """
+    session = TM1Service(**{key: value for key, value in session_config.items() if key not in TRANSPORT_KEYS})
+    configure_session(session, session_config)
+
+    return session
+
+
+def configure_session(session, session_config):
+    """Configures the HTTP transport of a session: the size of its connection pool, keep-alive and compression. The
+    request timeout is the TM1py timeout setting. Responses are added to the profile, see profiler
+
+    Args:
+        session (TM1Service): Session
+        session_config (dict): connect.yaml settings
+    """
+    tm1_rest = session._tm1_rest
+
+    set_pool_size(session, int(session_config.get('pool_maxsize', 10) or 10))
+
+    tm1_rest._headers['Connection'] = 'keep-alive' if session_config.get('keep_alive', True) else 'close'
+    tm1_rest._headers['Accept-Encoding'] = 'gzip, deflate' if session_config.get('compress', True) else 'identity'
+
+    # Does nothing unless profiling is enabled
+    tm1_rest._s.hooks['response'].append(record_response)
+
+
+def set_pool_size(session, size):
+    """Makes the session keep up to size connections to the TM1 server open, so that many threads can each reuse a
+    warm connection. The pool never shrinks
+
+    Args:
+        session (TM1Service): Session
+        size (int): Number of connections
+    """
+    tm1_rest = session._tm1_rest
+
+    if tm1_rest._connection_pool_size and int(tm1_rest._connection_pool_size) >= size:
+        return
+
+    tm1_rest._connection_pool_size = size
+    tm1_rest._manage_http_adapter()
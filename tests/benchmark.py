@@ -0,0 +1,331 @@
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from tm1cm.common import get_default_config
+from tm1cm.generator import SyntheticApplication
+from tm1cm.ti_format import format_procedure
+
+from fake_server import FakeTM1Server
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCHMARKS = ['get', 'migration', 'put']
+
+DEFAULT_SIZES = [1, 2, 4]
+
+# Settings on top of the default tm1cm.yaml, so every kind of object is part of the benchmarks
+BENCHMARK_CONFIG = {
+    'include_cube_view': '*/*',
+    'include_cube_view_data': '*/Data*',
+    'include_dimension_hierarchy_subset': '*/*/*',
+}
+
+# Synthetic model of size 1, see generator.DEFAULT_SHAPE. Kept small, so a run takes seconds
+BENCHMARK_SHAPE = {
+    'processes': 10,
+    'process_lines': 80,
+    'dimensions': 4,
+    'elements': 50,
+    'alternate_hierarchies': 1,
+    'attributes': 3,
+    'subsets': 3,
+    'cubes': 2,
+    'cube_dimensions': 3,
+    'views': 2,
+    'view_data_cells': 100,
+}
+
+# A wall time this much above the baseline is reported as a regression
+WALL_TIME_TOLERANCE = 0.2
+
+DEFAULT_TI_LINES = [1000, 10000, 100000]
+
+# Formatting is reported as not linear when the time per line of the largest procedure is this many times that of
+# the smallest
+TI_LINEAR_TOLERANCE = 2.0
+
+TI_FUNCTIONS = ['CellGetN', 'cellputs', 'DIMIX', 'dimensionelementinsert', 'ATTRS', 'subst', 'Long', 'nvalue', 'asciioutput', 'ItemSkip']
+TI_VARIABLES = ['nValue', 'SVALUE', 'datasourcenameforserver', 'minorerrorlogmax', 'vTemp', 'sDim', 'pCube']
+TI_OPERATORS = ['+', '-', '*', '/', '=', '<>', '<=', '>=', '@=', '@<>', '&', '|', '~', '%', '\\']
+TI_STRINGS = ['abc', "it''s", 'a, b', '#not a comment', 'IF(x);', 'x + -1', '', 'cellgetn(', 'multi\r\nline']
+TI_COMMENTS = [' comment', "it's a 'quote", '', ' if(x);']
+
+
+def populate_model(model, size, seed=0):
+    """Fills a FakeModel with a synthetic model, whose number of objects grows linearly with size
+
+    Args:
+        model (FakeModel): Model
+        size (int): Size of the model
+        seed (int): Seed of the random generator
+    """
+    config = {**get_default_config('tm1cm'), **BENCHMARK_CONFIG}
+    model.load_application(SyntheticApplication(config, size, seed, BENCHMARK_SHAPE).refresh())
+
+
+def run_benchmarks(sizes=None, latency=0.0, seed=0):
+    """Times get, put and Migration against a FakeTM1Server, for synthetic models of every size. Every benchmark
+    runs in a new process, so its peak RSS is measured on its own
+
+    Args:
+        sizes (list): Model sizes, see populate_model
+        latency (float): Seconds every request to the server is delayed
+        seed (int): Seed of the synthetic models
+
+    Returns:
+        list: One {'benchmark', 'size', 'wall_time', 'requests', 'peak_rss_mb'} dict per benchmark and size
+    """
+    logger = logging.getLogger(__name__)
+
+    results = []
+    path = tempfile.mkdtemp(prefix='tm1cm_benchmark_')
+    try:
+        with FakeTM1Server(latency=latency) as server:
+            session_config = server.session_config
+            config = {**get_default_config('tm1cm'), **BENCHMARK_CONFIG}
+
+            for size in sizes or DEFAULT_SIZES:
+                repo = os.path.join(path, 'size_{}'.format(size))
+
+                for benchmark in BENCHMARKS:
+                    server.model.reset()
+                    if benchmark != 'put':
+                        populate_model(server.model, size, seed)
+
+                    server.reset_request_count()
+                    result = _run_in_process(benchmark, config, session_config, repo)
+                    result.update({'benchmark': benchmark, 'size': size, 'requests': server.reset_request_count()})
+
+                    logger.info('{benchmark} size={size}: {wall_time:.3f}s, {requests} requests, {peak_rss_mb} MB'.format(**result))
+                    results.append(result)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    return results
+
+
+def _run_in_process(benchmark, config, session_config, path):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+        return executor.submit(_run, benchmark, config, session_config, path).result()
+
+
+def _run(benchmark, config, session_config, path):
+    from tm1cm.application import create_remote_application, LocalApplication
+    from tm1cm.migration import Migration
+    from tm1cm.transport import create_session
+
+    start = time.perf_counter()
+
+    session = create_session(session_config)
+    try:
+        if benchmark == 'get':
+            app = create_remote_application(config, session, path=path).refresh(False)
+            app.to_local(path, clear=True)
+        else:
+            app_from = LocalApplication(config, path).refresh(True)
+            app_to = create_remote_application(config, session, path=path).refresh(None)
+
+            migration = Migration(app_from, app_to)
+            if benchmark == 'put':
+                migration.do_all_operations()
+    finally:
+        session.logout()
+
+    return {'wall_time': time.perf_counter() - start, 'peak_rss_mb': _peak_rss_mb()}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def compare(results, baseline):
+    """Compares results with the results of an earlier run
+
+    Args:
+        results (list): Results of run_benchmarks
+        baseline (list): Earlier results
+
+    Returns:
+        list: Descriptions of the regressions found
+    """
+    earlier = {(x['benchmark'], x['size']): x for x in baseline}
+
+    regressions = []
+    for result in results:
+        before = earlier.get((result['benchmark'], result['size']))
+        if not before:
+            continue
+
+        name = '{} size={}'.format(result['benchmark'], result['size'])
+        if result['requests'] > before['requests']:
+            regressions.append('{}: {} requests, was {}'.format(name, result['requests'], before['requests']))
+        if result['wall_time'] > before['wall_time'] * (1 + WALL_TIME_TOLERANCE):
+            regressions.append('{}: {:.3f}s, was {:.3f}s'.format(name, result['wall_time'], before['wall_time']))
+
+    return regressions
+
+
+def make_procedure(lines, seed=0):
+    """Returns a TI procedure of about lines lines, unformatted, with mixed case keywords, comments, quoted and
+    multi-line strings, nested IF and WHILE blocks and long ExecuteProcess calls
+
+    Args:
+        lines (int): Number of lines
+        seed (int): Seed of the random generator
+    """
+    rng = random.Random(seed)
+    output = ['#****Begin: Generated Statements***', '#****End: Generated Statements****', '']
+    while len(output) < lines:
+        output += _ti_block(rng, 0, 20)
+
+    return '\r\n'.join(output[:lines])
+
+
+def _ti_space(rng):
+    return rng.choice(['', ' ', '  ', '\t'])
+
+
+def _ti_expression(rng, depth=0):
+    choice = rng.random()
+    if depth > 2 or choice < 0.3:
+        return rng.choice([rng.choice(TI_VARIABLES), str(rng.randint(0, 99)), "'{}'".format(rng.choice(TI_STRINGS)), '-{}'.format(rng.randint(1, 9))])
+
+    if choice < 0.6:
+        return '{}{}{}{}{}'.format(_ti_expression(rng, depth + 1), _ti_space(rng), rng.choice(TI_OPERATORS), _ti_space(rng), _ti_expression(rng, depth + 1))
+
+    arguments = (',' + _ti_space(rng)).join(_ti_expression(rng, depth + 1) for _ in range(rng.randint(0, 4)))
+    return '{}{}({}{})'.format(rng.choice(TI_FUNCTIONS), _ti_space(rng), _ti_space(rng), arguments)
+
+
+def _ti_block(rng, depth, count):
+    output = []
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.12 and depth < 4:
+            output.append('{}{}({});'.format(_ti_space(rng), rng.choice(['if', 'IF', 'If']), _ti_expression(rng, 2)))
+            output += _ti_block(rng, depth + 1, rng.randint(1, 4))
+            if rng.random() < 0.5:
+                output.append('{}{}({});'.format(_ti_space(rng), rng.choice(['elseif', 'ElseIf']), _ti_expression(rng, 2)))
+                output += _ti_block(rng, depth + 1, rng.randint(1, 3))
+            if rng.random() < 0.5:
+                output.append(_ti_space(rng) + rng.choice(['else;', 'ELSE;']))
+                output += _ti_block(rng, depth + 1, rng.randint(1, 3))
+            output.append(_ti_space(rng) + rng.choice(['endif;', 'EndIf;']))
+        elif choice < 0.18 and depth < 4:
+            output.append('{}{}({});'.format(_ti_space(rng), rng.choice(['while', 'WHILE']), _ti_expression(rng, 2)))
+            output += _ti_block(rng, depth + 1, rng.randint(1, 4))
+            output.append(_ti_space(rng) + rng.choice(['end;', 'END;']))
+        elif choice < 0.26:
+            output.append('{}#{}'.format(_ti_space(rng), rng.choice(TI_COMMENTS)))
+        elif choice < 0.3:
+            output.append('')
+        elif choice < 0.36:
+            arguments = ', '.join(_ti_expression(rng, 3) for _ in range(rng.randint(1, 8)))
+            output.append('{}{}({});'.format(_ti_space(rng), rng.choice(['executeprocess', 'RunProcess', 'ExecuteProcess']), arguments))
+        else:
+            trailing = rng.choice(['', ' ', ' # trailing'])
+            output.append('{}{} = {};{}'.format(_ti_space(rng), rng.choice(TI_VARIABLES), _ti_expression(rng), trailing))
+
+    return output
+
+
+def run_format_benchmark(line_counts=None, seed=0):
+    """Times ti_format.format_procedure on generated procedures of growing length
+
+    Args:
+        line_counts (list): Number of lines of each procedure
+        seed (int): Seed of the procedures
+
+    Returns:
+        list: One {'lines', 'seconds', 'us_per_line'} dict per procedure
+    """
+    results = []
+    for lines in line_counts or DEFAULT_TI_LINES:
+        text = make_procedure(lines, seed)
+
+        start = time.perf_counter()
+        format_procedure(text)
+        seconds = time.perf_counter() - start
+
+        results.append({'lines': lines, 'seconds': seconds, 'us_per_line': seconds / lines * 1e6})
+
+    return results
+
+
+def format_results(results):
+    lines = ['{:<10} {:>5} {:>10} {:>9} {:>12}'.format('benchmark', 'size', 'wall (s)', 'requests', 'peak RSS (MB)')]
+    for result in results:
+        lines.append('{:<10} {:>5} {:>10.3f} {:>9} {:>12}'.format(result['benchmark'], result['size'], result['wall_time'], result['requests'], result['peak_rss_mb']))
+
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Times tm1cm get, put and Migration against a local stand-in TM1 server')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Sizes of the synthetic models')
+    parser.add_argument('--ti-lines', type=int, nargs='+', help='Time TI formatting of procedures of these lengths instead')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds every request to the server is delayed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Fail when results are worse than in this JSON file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.ti_lines:
+        return _main_format(args.ti_lines, args.seed)
+
+    results = run_benchmarks(args.sizes, args.latency, args.seed)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            regressions = compare(results, json.load(fp))
+
+        for regression in regressions:
+            print('Regression: {}'.format(regression))
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+def _main_format(line_counts, seed):
+    results = run_format_benchmark(line_counts, seed)
+
+    print('{:>8} {:>10} {:>12}'.format('lines', 'time (s)', 'us per line'))
+    for result in results:
+        print('{:>8} {:>10.3f} {:>12.1f}'.format(result['lines'], result['seconds'], result['us_per_line']))
+
+    ratio = results[-1]['us_per_line'] / results[0]['us_per_line']
+    if ratio > TI_LINEAR_TOLERANCE:
+        print('Not linear: {:.1f}x the time per line at {} lines than at {} lines'.format(ratio, results[-1]['lines'], results[0]['lines']))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
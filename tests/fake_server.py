@@ -0,0 +1,1062 @@
+import argparse
+import itertools
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from TM1py.Utils.Utils import lower_and_drop_spaces
+
+# Properties that are navigation properties in the TM1 REST API. They are only returned when expanded
+NAVIGATION = {
+    'Axes', 'Cells', 'Columns', 'Contents', 'Cube', 'DefaultMember', 'Dimension', 'Dimensions', 'Edges', 'Element',
+    'ElementAttributes', 'Elements', 'Hierarchies', 'Hierarchy', 'Members', 'Rows', 'Selected', 'Subset', 'Subsets',
+    'Titles', 'Tuples', 'Views',
+}
+
+PRODUCT_VERSION = '11.8.01300.1'
+
+# Updateable flag TM1 sets on cells that can not be written to, e.g. consolidations
+NOT_UPDATEABLE = 0x10000000
+
+RE_MEMBER = re.compile(r'\[((?:[^\]]|\]\])*)\]\.\[((?:[^\]]|\]\])*)\]\.\[((?:[^\]]|\]\])*)\]')
+RE_MDX = re.compile(r'SELECT\s*(.*?)\s*ON\s+(ROWS|COLUMNS|0|1)\s*,\s*(.*?)\s*ON\s+(ROWS|COLUMNS|0|1)\s+FROM\s+\[(.*)\]', re.IGNORECASE | re.DOTALL)
+RE_BIND_SEGMENT = re.compile(r"(\w+)\('((?:[^']|'')*)'\)")
+
+PROCEDURES = ['PrologProcedure', 'MetadataProcedure', 'DataProcedure', 'EpilogProcedure']
+GENERATED_STATEMENTS = '#****Begin: Generated Statements***\r\n#****End: Generated Statements****\r\n'
+
+
+class FakeError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Collection(dict):
+    """Entities by name, compared like TM1 does, ignoring case and spaces"""
+
+    def add(self, entity, key=None):
+        self[_norm(key if key is not None else entity['Name'])] = entity
+        return entity
+
+    def find(self, key):
+        return self.get(_norm(key))
+
+
+class FakeModel:
+    """In-memory TM1 model behind FakeTM1Server. Objects are stored as TM1 REST entities, so requests are answered
+    by projecting them with the $select and $expand options of the request
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Removes every object"""
+        with self._lock:
+            self.cubes = Collection()
+            self.dimensions = Collection()
+            self.processes = Collection()
+            self.cellsets = Collection()
+            self.blobs = Collection()
+            self.data = {}
+
+            self.root = {
+                'Cubes': self.cubes,
+                'Dimensions': self.dimensions,
+                'Processes': self.processes,
+                'Cellsets': self.cellsets,
+                'Contents': Collection(Blobs={'Name': 'Blobs', 'Contents': self.blobs}),
+                'Configuration': {'ServerName': 'tm1cm', 'ProductVersion': PRODUCT_VERSION, 'DataBaseDirectory': '/tm1cm/data/'},
+                'ActiveConfiguration': {'Administration': {'DisableSandboxing': False}},
+                'ActiveUser': {'Name': 'Admin', 'Groups': [{'Name': 'ADMIN'}]},
+            }
+
+    def add_dimension(self, name, hierarchies=None):
+        """Creates a dimension. A hierarchy with the name of the dimension is created when no hierarchies are given
+
+        Args:
+            name (str): Dimension name
+            hierarchies (list): Optional, hierarchy bodies as sent to the REST API
+        """
+        with self._lock:
+            dimension = self.dimensions.add({'Name': name, 'UniqueName': '[{}]'.format(name), 'Attributes': {'Caption': name}, 'Hierarchies': Collection()})
+            for hierarchy in hierarchies or [{'Name': name}]:
+                self.add_hierarchy(name, hierarchy)
+
+            return dimension
+
+    def add_hierarchy(self, dimension_name, body):
+        with self._lock:
+            dimension = self._find(self.dimensions, dimension_name)
+            hierarchy = dimension['Hierarchies'].add({
+                'Name': body['Name'],
+                'UniqueName': '[{}].[{}]'.format(dimension['Name'], body['Name']),
+                'Dimension': dimension,
+                'Elements': Collection(),
+                'Edges': Collection(),
+                'ElementAttributes': Collection(),
+                'Subsets': Collection(),
+                'DefaultMember': None,
+            })
+            self.update_hierarchy(dimension_name, body['Name'], body)
+
+            return hierarchy
+
+    def update_hierarchy(self, dimension_name, hierarchy_name, body):
+        """Replaces the elements and edges of a hierarchy, keeping the attribute values of existing elements"""
+        with self._lock:
+            hierarchy = self._find_hierarchy(dimension_name, hierarchy_name)
+
+            if 'Elements' in body:
+                existing = hierarchy['Elements']
+                hierarchy['Elements'] = Collection()
+                for element in body['Elements']:
+                    attributes = existing[_norm(element['Name'])]['Attributes'] if _norm(element['Name']) in existing else {}
+                    self.add_element(hierarchy, element, attributes)
+
+                hierarchy['Edges'] = Collection({key: edge for key, edge in hierarchy['Edges'].items() if key[0] in hierarchy['Elements'] and key[1] in hierarchy['Elements']})
+
+            if 'Edges' in body:
+                hierarchy['Edges'] = Collection()
+                self.add_edges(hierarchy, body['Edges'])
+
+            for attribute in body.get('ElementAttributes', []):
+                hierarchy['ElementAttributes'].add({'Name': attribute['Name'], 'Type': attribute['Type']})
+
+            if hierarchy['Elements']:
+                hierarchy['DefaultMember'] = next(iter(hierarchy['Elements'].values()))
+
+            return hierarchy
+
+    def add_element(self, hierarchy, body, attributes=None):
+        dimension_name = hierarchy['Dimension']['Name']
+        elements = hierarchy['Elements']
+
+        element = elements.add({
+            'Name': body['Name'],
+            'UniqueName': '[{}].[{}].[{}]'.format(dimension_name, hierarchy['Name'], body['Name']),
+            'Type': body.get('Type', 'Numeric'),
+            'Index': len(elements) + 1,
+            'Attributes': dict(attributes or body.get('Attributes') or {}),
+        })
+
+        if hierarchy['DefaultMember'] is None:
+            hierarchy['DefaultMember'] = element
+
+        return element
+
+    def add_edges(self, hierarchy, edges):
+        for edge in edges:
+            parent = self._find(hierarchy['Elements'], edge['ParentName'])
+            component = self._find(hierarchy['Elements'], edge['ComponentName'])
+            key = (_norm(parent['Name']), _norm(component['Name']))
+            hierarchy['Edges'][key] = {'ParentName': parent['Name'], 'ComponentName': component['Name'], 'Weight': edge.get('Weight', 1)}
+            parent['Type'] = 'Consolidated'
+
+    def add_subset(self, dimension_name, hierarchy_name, body):
+        with self._lock:
+            hierarchy = self._find_hierarchy(dimension_name, hierarchy_name)
+            return hierarchy['Subsets'].add(self._subset(hierarchy, body))
+
+    def add_cube(self, name, dimensions, rules=''):
+        """Creates a cube
+
+        Args:
+            name (str): Cube name
+            dimensions (list): Dimension names, in cube order
+            rules (str): Rules
+        """
+        with self._lock:
+            dimensions = [self._find(self.dimensions, x) for x in dimensions]
+            timestamp = _timestamp()
+            return self.cubes.add({'Name': name, 'Rules': rules or '', 'LastSchemaUpdate': timestamp, 'LastDataUpdate': timestamp, 'Dimensions': dimensions, 'Views': Collection()})
+
+    def add_view(self, cube_name, body):
+        with self._lock:
+            cube = self._find(self.cubes, cube_name)
+
+            view = {
+                '@odata.type': '#ibm.tm1.api.v1.NativeView',
+                'Name': body['Name'],
+                'SuppressEmptyColumns': body.get('SuppressEmptyColumns', False),
+                'SuppressEmptyRows': body.get('SuppressEmptyRows', False),
+                'FormatString': body.get('FormatString', '0.#########'),
+            }
+            for axis in ('Columns', 'Rows', 'Titles'):
+                view[axis] = [self._view_selection(selection) for selection in body.get(axis, [])]
+
+            return cube['Views'].add(view)
+
+    def add_process(self, body):
+        with self._lock:
+            process = {
+                'Name': body['Name'],
+                'HasSecurityAccess': False,
+                'PrologProcedure': '',
+                'MetadataProcedure': '',
+                'DataProcedure': '',
+                'EpilogProcedure': '',
+                'DataSource': {'Type': 'None'},
+                'Parameters': [],
+                'Variables': [],
+                'UIData': '',
+                'VariablesUIData': [],
+            }
+            process.update(body)
+            _generate_statements(process)
+            return self.processes.add(process)
+
+    def load_application(self, app):
+        """Creates every object of an application, e.g. a LocalApplication or a SyntheticApplication
+
+        Args:
+            app (Application): Refreshed application
+        """
+        with self._lock:
+            hierarchies = {}
+            for (dimension_name, hierarchy_name), hierarchy in app.get_hierarchies(app.hierarchies):
+                hierarchies.setdefault(dimension_name, []).append(hierarchy)
+
+            for dimension in app.dimensions.values():
+                self.add_dimension(dimension['Name'], hierarchies.get(dimension['Name']))
+
+            for dimension_name, hierarchy_name, subset_name in app.subsets:
+                self.add_subset(dimension_name, hierarchy_name, app.get_subset(dimension_name, hierarchy_name, subset_name))
+
+            rules = {name: rule.get('Rules', '') for name, rule in app.rules.items()}
+            for cube in app.cubes.values():
+                self.add_cube(cube['Name'], [x['Name'] for x in cube['Dimensions']], rules.get(cube['Name'], ''))
+
+            for cube_name, view_name in app.views:
+                self.add_view(cube_name, app.get_view(cube_name, view_name))
+
+            for cube_name, view_name in app._view_data_list:
+                dimensions = [_norm(x['Name']) for x in self._find(self.cubes, cube_name)['Dimensions']]
+                for row in app.iter_view_data(cube_name, view_name):
+                    members = {_norm(x[0]): x[2] for x in (_member_names({'UniqueName': y}) for y in row[:-1])}
+                    self.set_value(cube_name, [members.get(x, '') for x in dimensions], row[-1])
+
+            for process in app.processes.values():
+                self.add_process(process)
+
+    def set_value(self, cube_name, elements, value):
+        """Writes a cell value. Elements are element names in cube dimension order"""
+        with self._lock:
+            cube_name, dimensions = self._cube_dimensions(cube_name)
+            if cube_name.startswith('}ElementAttributes_'):
+                for element in self._attribute_elements(dimensions[0], elements[0]):
+                    element['Attributes'][elements[1]] = value
+                return
+
+            # An empty value clears the cell, TM1py sends one for 0
+            cells = self.data.setdefault(_norm(cube_name), {})
+            if value == '' or value is None:
+                cells.pop(tuple(_norm(x) for x in elements), None)
+            else:
+                cells[tuple(_norm(x) for x in elements)] = value
+            self._find(self.cubes, cube_name)['LastDataUpdate'] = _timestamp()
+
+    def get_value(self, cube_name, elements):
+        cube_name, dimensions = self._cube_dimensions(cube_name)
+        if cube_name.startswith('}ElementAttributes_'):
+            return self._attribute_elements(dimensions[0], elements[0])[0]['Attributes'].get(elements[1], '')
+
+        return self.data.get(_norm(cube_name), {}).get(tuple(_norm(x) for x in elements), 0)
+
+    def handle(self, method, path, query, body):
+        """Handles a request to the REST API
+
+        Args:
+            method (str): HTTP method
+            path (str): URL path, after /api/v1/
+            query (str): Query string
+            body (bytes): Request body
+
+        Returns:
+            tuple: (status, response). The response is a dict or list sent as JSON, bytes or a string
+        """
+        segments = _parse_path(path)
+        options = _parse_options(query, '&')
+
+        with self._lock:
+            if method == 'GET':
+                return 200, self._get(segments, options)
+
+            data = body
+            if body and not _is_content(segments):
+                data = json.loads(body.decode('utf8'))
+
+            handler = getattr(self, '_{}_{}'.format(method.lower(), '_'.join(_route(segments))), None)
+            if handler is None:
+                raise FakeError(501, 'Not implemented: {} {}'.format(method, path))
+
+            return handler(segments, data, options)
+
+    def _get(self, segments, options):
+        node = self.root
+        parents = []
+        for name, key in segments:
+            if name == '$value':
+                return _raw(node)
+            if name == '$count':
+                return str(len(node))
+            if name == 'Content':
+                return node['Content']
+
+            if not isinstance(node, dict) or name not in node:
+                raise FakeError(404, 'Resource {} not found'.format(name))
+
+            parents.append(node)
+            node = node[name]
+            if key is not None:
+                node = self._find(node, key)
+
+        if isinstance(node, (Collection, list)):
+            return {'value': _project_collection(node, options)}
+        if isinstance(node, dict):
+            return _project(node, options)
+
+        return {'value': node}
+
+    def _post_Processes(self, segments, data, options):
+        self._ensure_new(self.processes, data['Name'])
+        return 201, _project(self.add_process(data), {})
+
+    def _post_Processes_tm1_ExecuteWithReturn(self, segments, data, options):
+        self._find(self.processes, segments[0][1])
+        return 201, {'ProcessExecuteStatusCode': 'CompletedSuccessfully'}
+
+    def _post_Processes_tm1_Execute(self, segments, data, options):
+        self._find(self.processes, segments[0][1])
+        return 204, None
+
+    def _patch_Processes(self, segments, data, options):
+        process = self._find(self.processes, segments[0][1])
+        process.update(data)
+        _generate_statements(process)
+        return 204, None
+
+    def _delete_Processes(self, segments, data, options):
+        return self._delete(self.processes, segments[0][1])
+
+    def _post_Dimensions(self, segments, data, options):
+        self._ensure_new(self.dimensions, data['Name'])
+        return 201, _project(self.add_dimension(data['Name'], data.get('Hierarchies')), {})
+
+    def _delete_Dimensions(self, segments, data, options):
+        for cube in self.cubes.values():
+            if any(_same(x['Name'], segments[0][1]) for x in cube['Dimensions']):
+                raise FakeError(400, 'Dimension {} is used by cube {}'.format(segments[0][1], cube['Name']))
+
+        return self._delete(self.dimensions, segments[0][1])
+
+    def _post_Dimensions_Hierarchies(self, segments, data, options):
+        dimension = self._find(self.dimensions, segments[0][1])
+        self._ensure_new(dimension['Hierarchies'], data['Name'])
+        return 201, _project(self.add_hierarchy(dimension['Name'], data), {})
+
+    def _patch_Dimensions_Hierarchies(self, segments, data, options):
+        self.update_hierarchy(segments[0][1], segments[1][1], data)
+        return 204, None
+
+    def _delete_Dimensions_Hierarchies(self, segments, data, options):
+        return self._delete(self._find(self.dimensions, segments[0][1])['Hierarchies'], segments[1][1])
+
+    def _post_Dimensions_Hierarchies_Elements(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        for element in data if isinstance(data, list) else [data]:
+            self._ensure_new(hierarchy['Elements'], element['Name'])
+            self.add_element(hierarchy, element)
+        return 201, {}
+
+    def _patch_Dimensions_Hierarchies_Elements(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        self._find(hierarchy['Elements'], segments[2][1]).update({key: value for key, value in data.items() if key in ('Type', 'Attributes')})
+        return 204, None
+
+    def _delete_Dimensions_Hierarchies_Elements(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        key = _norm(self._find(hierarchy['Elements'], segments[2][1])['Name'])
+        hierarchy['Edges'] = Collection({edge_key: edge for edge_key, edge in hierarchy['Edges'].items() if key not in edge_key})
+        return self._delete(hierarchy['Elements'], segments[2][1])
+
+    def _delete_Dimensions_Hierarchies_Elements_Edges(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        key = segments[3][1]
+        return self._delete(hierarchy['Edges'], (key['ParentName'], key['ComponentName']))
+
+    def _post_Dimensions_Hierarchies_Edges(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        for edge in data:
+            if (_norm(edge['ParentName']), _norm(edge['ComponentName'])) in hierarchy['Edges']:
+                raise FakeError(400, 'Edge {}/{} already exists'.format(edge['ParentName'], edge['ComponentName']))
+        self.add_edges(hierarchy, data)
+        return 201, {}
+
+    def _post_Dimensions_Hierarchies_ElementAttributes(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        for attribute in data if isinstance(data, list) else [data]:
+            self._ensure_new(hierarchy['ElementAttributes'], attribute['Name'])
+            hierarchy['ElementAttributes'].add({'Name': attribute['Name'], 'Type': attribute['Type']})
+        return 201, {}
+
+    def _delete_Dimensions_Hierarchies_ElementAttributes(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        name = self._find(hierarchy['ElementAttributes'], segments[2][1])['Name']
+        for element in hierarchy['Elements'].values():
+            element['Attributes'].pop(name, None)
+        return self._delete(hierarchy['ElementAttributes'], name)
+
+    def _post_Dimensions_Hierarchies_Subsets(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        self._ensure_new(hierarchy['Subsets'], data['Name'])
+        return 201, _project(self.add_subset(segments[0][1], segments[1][1], data), {})
+
+    def _patch_Dimensions_Hierarchies_Subsets(self, segments, data, options):
+        hierarchy = self._find_hierarchy(segments[0][1], segments[1][1])
+        subset = self._find(hierarchy['Subsets'], segments[2][1])
+        subset.update(self._subset(hierarchy, {'Name': subset['Name'], **data}))
+        return 204, None
+
+    def _delete_Dimensions_Hierarchies_Subsets(self, segments, data, options):
+        return self._delete(self._find_hierarchy(segments[0][1], segments[1][1])['Subsets'], segments[2][1])
+
+    def _post_Cubes(self, segments, data, options):
+        self._ensure_new(self.cubes, data['Name'])
+        dimensions = [_bind_names(x)[-1] for x in data.get('Dimensions@odata.bind', [])]
+        return 201, _project(self.add_cube(data['Name'], dimensions, data.get('Rules')), {})
+
+    def _patch_Cubes(self, segments, data, options):
+        cube = self._find(self.cubes, segments[0][1])
+        if 'Rules' in data:
+            cube['Rules'] = data['Rules'] or ''
+            cube['LastSchemaUpdate'] = _timestamp()
+        return 204, None
+
+    def _delete_Cubes(self, segments, data, options):
+        self.data.pop(_norm(segments[0][1]), None)
+        return self._delete(self.cubes, segments[0][1])
+
+    def _post_Cubes_tm1_Lock(self, segments, data, options):
+        self._find(self.cubes, segments[0][1])
+        return 204, None
+
+    _post_Cubes_tm1_Unlock = _post_Cubes_tm1_Lock
+
+    def _post_Cubes_tm1_Update(self, segments, data, options):
+        cube = self._find(self.cubes, segments[0][1])
+        for update in data:
+            for cell in update['Cells']:
+                elements = [_bind_names(x)[-1] for x in cell['Tuple@odata.bind']]
+                self.set_value(cube['Name'], elements, update['Value'])
+        return 204, None
+
+    def _post_Cubes_Views(self, segments, data, options):
+        cube = self._find(self.cubes, segments[0][1])
+        self._ensure_new(cube['Views'], data['Name'])
+        return 201, _project(self.add_view(cube['Name'], data), {})
+
+    def _patch_Cubes_Views(self, segments, data, options):
+        cube = self._find(self.cubes, segments[0][1])
+        view = self._find(cube['Views'], segments[1][1])
+        self.add_view(cube['Name'], {**_unproject_view(view), **data, 'Name': view['Name']})
+        return 204, None
+
+    def _delete_Cubes_Views(self, segments, data, options):
+        return self._delete(self._find(self.cubes, segments[0][1])['Views'], segments[1][1])
+
+    def _post_Cubes_Views_tm1_Execute(self, segments, data, options):
+        cube = self._find(self.cubes, segments[0][1])
+        view = self._find(cube['Views'], segments[1][1])
+
+        axes = []
+        for axis in ('Columns', 'Rows'):
+            if view[axis]:
+                axes.append([self._subset_elements(x['Subset']) for x in view[axis]])
+
+        placed = set(_norm(x['Subset']['Hierarchy']['Dimension']['Name']) for axis in ('Columns', 'Rows') for x in view[axis])
+        titles = {_norm(x['Subset']['Hierarchy']['Dimension']['Name']): x['Selected'] for x in view['Titles'] if x.get('Selected')}
+
+        slicer = []
+        for dimension in cube['Dimensions']:
+            if _norm(dimension['Name']) in placed:
+                continue
+            hierarchy = self._find(dimension['Hierarchies'], dimension['Name'])
+            member = titles.get(_norm(dimension['Name'])) or hierarchy['DefaultMember']
+            if member is not None:
+                slicer.append([member])
+        if slicer:
+            axes.append(slicer)
+
+        return 201, {'ID': self._create_cellset(cube, axes)}
+
+    def _post_ExecuteMDX(self, segments, data, options):
+        match = RE_MDX.match(data['MDX'].strip())
+        if not match:
+            raise FakeError(400, 'Unsupported MDX: {}'.format(data['MDX']))
+
+        cube = self._virtual_cube(match.group(5))
+
+        axes = {}
+        for axis_set, axis in ((match.group(1), match.group(2)), (match.group(3), match.group(4))):
+            ordinal = 1 if axis.upper() in ('ROWS', '1') else 0
+            axes[ordinal] = [[self._member(*(x.replace(']]', ']') for x in member)) for member in RE_MEMBER.findall(axis_set)]]
+
+        return 201, {'ID': self._create_cellset(cube, [axes[0], axes[1]])}
+
+    def _patch_Cellsets_Cells(self, segments, data, options):
+        cellset = self._find(self.cellsets, segments[0][1])
+        for update in data:
+            self.set_value(cellset['Cube']['Name'], cellset['_coordinates'][update['Ordinal']], update['Value'])
+        return 204, None
+
+    def _delete_Cellsets(self, segments, data, options):
+        return self._delete(self.cellsets, segments[0][1])
+
+    def _post_Contents_Contents(self, segments, data, options):
+        self._ensure_new(self.blobs, data['Name'])
+        self.blobs.add({'Name': data['Name'], 'Content': b''})
+        return 201, {'Name': data['Name']}
+
+    def _patch_Contents_Contents_Content(self, segments, data, options):
+        self._find(self.blobs, segments[1][1])['Content'] = data or b''
+        return 204, None
+
+    def _delete_Contents_Contents(self, segments, data, options):
+        return self._delete(self.blobs, segments[1][1])
+
+    def _post_ActiveSession_tm1_Close(self, segments, data, options):
+        return 204, None
+
+    def _create_cellset(self, cube, axes):
+        """Creates a cellset. axes is a list of axes, an axis a list of member lists whose product are the tuples"""
+        cellset_axes = []
+        tuples = []
+        for ordinal, axis in enumerate(axes):
+            axis_tuples = list(itertools.product(*axis))
+            tuples.append(axis_tuples)
+            cellset_axes.append({
+                'Ordinal': ordinal,
+                'Cardinality': len(axis_tuples),
+                'Hierarchies': [self._find_hierarchy(*_member_names(members[0])[:2]) for members in axis if members],
+                'Tuples': [{'Ordinal': i, 'Members': [_member_entity(x) for x in members]} for i, members in enumerate(axis_tuples)],
+            })
+
+        dimensions = [_norm(x['Name']) for x in cube['Dimensions']]
+        attributes = cube['Name'].startswith('}ElementAttributes_')
+
+        cells = []
+        coordinates = []
+        # Cells are ordered with the first axis changing fastest
+        for ordinal, combination in enumerate(itertools.product(*reversed(tuples))):
+            members = [member for axis_tuple in reversed(combination) for member in axis_tuple]
+            by_dimension = {_norm(_member_names(x)[0]): x for x in members}
+            elements = [_member_names(by_dimension[x])[2] if x in by_dimension else '' for x in dimensions]
+
+            # Attribute values of consolidated elements can be written to
+            consolidated = not attributes and any(x.get('Type') == 'Consolidated' for x in members)
+            updateable = NOT_UPDATEABLE if consolidated else 0
+            cells.append({'Ordinal': ordinal, 'Value': self.get_value(cube['Name'], elements), 'Updateable': updateable, 'RuleDerived': False, 'Consolidated': bool(updateable)})
+            coordinates.append(elements)
+
+        cellset_id = uuid.uuid4().hex
+        self.cellsets.add({'ID': cellset_id, 'Cube': cube, 'Axes': cellset_axes, 'Cells': cells, '_coordinates': coordinates}, cellset_id)
+
+        return cellset_id
+
+    def _virtual_cube(self, name):
+        """Returns the cube, or the element attribute cube of a dimension"""
+        if name.startswith('}ElementAttributes_'):
+            dimension = self._find(self.dimensions, name[len('}ElementAttributes_'):])
+            return {'Name': name, 'Dimensions': [dimension, {'Name': name}]}
+
+        return self._find(self.cubes, name)
+
+    def _cube_dimensions(self, cube_name):
+        if cube_name.startswith('}ElementAttributes_'):
+            return cube_name, [cube_name[len('}ElementAttributes_'):], cube_name]
+
+        cube = self._find(self.cubes, cube_name)
+        return cube['Name'], [x['Name'] for x in cube['Dimensions']]
+
+    def _attribute_elements(self, dimension_name, element_name):
+        """Returns the element in every hierarchy of a dimension, as they share their attribute values"""
+        hierarchies = self._find(self.dimensions, dimension_name)['Hierarchies'].values()
+        elements = [x['Elements'][_norm(element_name)] for x in hierarchies if _norm(element_name) in x['Elements']]
+        if not elements:
+            raise FakeError(404, '{} can not be found'.format(element_name))
+
+        return elements
+
+    def _member(self, dimension_name, hierarchy_name, element_name):
+        if dimension_name.startswith('}ElementAttributes_'):
+            return {'Name': element_name, 'UniqueName': '[{0}].[{0}].[{1}]'.format(dimension_name, element_name), 'Type': 'String'}
+
+        return self._find(self._find_hierarchy(dimension_name, hierarchy_name)['Elements'], element_name)
+
+    def _find_hierarchy(self, dimension_name, hierarchy_name):
+        if dimension_name.startswith('}ElementAttributes_'):
+            return {'Name': dimension_name, 'UniqueName': '[{0}].[{0}]'.format(dimension_name), 'Dimension': {'Name': dimension_name}}
+
+        return self._find(self._find(self.dimensions, dimension_name)['Hierarchies'], hierarchy_name)
+
+    def _subset(self, hierarchy, body):
+        elements = [self._resolve(x) for x in body.get('Elements@odata.bind', [])]
+        return {
+            'Name': body.get('Name', ''),
+            'UniqueName': '[{}].[{}].[{}]'.format(hierarchy['Dimension']['Name'], hierarchy['Name'], body.get('Name', '')),
+            'Alias': body.get('Alias', ''),
+            'Expression': body.get('Expression'),
+            'Hierarchy': hierarchy,
+            'Elements': elements,
+        }
+
+    def _subset_elements(self, subset):
+        if subset['Expression']:
+            # Expressions are not evaluated, they select every element of the hierarchy
+            return list(subset['Hierarchy']['Elements'].values())
+
+        return list(subset['Elements'])
+
+    def _view_selection(self, selection):
+        if 'Subset@odata.bind' in selection:
+            subset = self._resolve(selection['Subset@odata.bind'])
+        else:
+            body = selection['Subset']
+            subset = self._subset(self._resolve(body['Hierarchy@odata.bind']), body)
+
+        result = {'Subset': subset}
+        if 'Selected@odata.bind' in selection:
+            result['Selected'] = self._resolve(selection['Selected@odata.bind'])
+
+        return result
+
+    def _resolve(self, bind):
+        """Returns the entity an @odata.bind path refers to"""
+        node = self.root
+        for name, key in RE_BIND_SEGMENT.findall(bind):
+            node = self._find(node[name], key.replace("''", "'"))
+
+        return node
+
+    def _find(self, collection, key):
+        if isinstance(collection, Collection):
+            entity = collection.get(_norm_key(key))
+        else:
+            entity = next((x for x in collection if _same(x['Name'], key)), None)
+
+        if entity is None:
+            raise FakeError(404, '{} can not be found'.format(key))
+
+        return entity
+
+    def _ensure_new(self, collection, name):
+        if _norm(name) in collection:
+            raise FakeError(400, '{} already exists'.format(name))
+
+    def _delete(self, collection, key):
+        self._find(collection, key)
+        del collection[_norm_key(key)]
+        return 204, None
+
+
+class FakeTM1Server:
+    """Local stand-in for a TM1 server that answers the REST requests tm1cm and TM1py make, from an in-memory model.
+    Every request is delayed by latency seconds and counted. Meant for benchmarks and trying out tm1cm without a TM1
+    server, it implements just enough of the REST API for that
+
+    Example:
+        with FakeTM1Server(latency=0.002) as server:
+            session = TM1Service(**server.session_config)
+    """
+
+    def __init__(self, latency=0.0, port=0, model=None):
+        self.latency = latency
+        self.model = model or FakeModel()
+
+        self._count_lock = threading.Lock()
+        self.request_count = 0
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def session_config(self):
+        """TM1py connection settings of the server, as found in connect.yaml and credentials.yaml"""
+        return {'address': '127.0.0.1', 'port': self.port, 'ssl': False, 'user': 'admin', 'password': 'apple'}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_request_count(self):
+        with self._count_lock:
+            count = self.request_count
+            self.request_count = 0
+        return count
+
+    def _count(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, without this every response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method):
+        logger = logging.getLogger(__name__)
+
+        fake = self.server.fake
+        fake._count()
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        path, _, query = self.path.partition('?')
+        path = unquote(path)
+
+        try:
+            if path.startswith('/api/logout'):
+                status, response = 204, None
+            elif not path.startswith('/api/v1/'):
+                raise FakeError(404, 'Unknown path {}'.format(path))
+            else:
+                status, response = fake.model.handle(method, path[len('/api/v1/'):], query, body)
+        except FakeError as e:
+            status, response = e.status, {'error': {'code': str(e.status), 'message': str(e)}}
+        except Exception as e:
+            logger.exception('Unable to handle {} {}'.format(method, self.path))
+            status, response = 500, {'error': {'code': '500', 'message': str(e)}}
+
+        if status >= 400:
+            logger.debug('{} {} returned {}: {}'.format(method, self.path, status, response))
+
+        if response is None:
+            data, content_type = b'', None
+        elif isinstance(response, bytes):
+            data, content_type = response, 'application/octet-stream'
+        elif isinstance(response, str):
+            data, content_type = response.encode('utf8'), 'text/plain'
+        else:
+            data, content_type = json.dumps(response, ensure_ascii=False).encode('utf8'), 'application/json; odata.streaming=true'
+
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Set-Cookie', 'TM1SessionId=tm1cm; Path=/api/; HttpOnly')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _norm(name):
+    return lower_and_drop_spaces(name)
+
+
+def _norm_key(key):
+    if isinstance(key, tuple):
+        return tuple(_norm(x) for x in key)
+    return _norm(key)
+
+
+def _same(a, b):
+    return _norm(a) == _norm(b)
+
+
+def _generate_statements(process):
+    """Replaces the generated statements of the procedures of a process, like TM1 does when a process is saved"""
+    for procedure in PROCEDURES:
+        text = process.get(procedure) or ''
+        end = text.find('#****End: Generated Statements****')
+        if end >= 0:
+            text = text[end:].split('\r\n', 1)[1] if '\r\n' in text[end:] else ''
+        process[procedure] = GENERATED_STATEMENTS + text.lstrip('\r\n')
+
+
+def _timestamp():
+    return time.strftime('%Y-%m-%dT%H:%M:%S.{:03d}Z'.format(int(time.time() * 1000) % 1000), time.gmtime())
+
+
+def _raw(value):
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def _is_content(segments):
+    return segments and segments[-1][0] == 'Content'
+
+
+def _route(segments):
+    return [name.replace('.', '_') for name, _ in segments]
+
+
+def _bind_names(bind):
+    return [key.replace("''", "'") for _, key in RE_BIND_SEGMENT.findall(bind)]
+
+
+def _member_names(member):
+    match = RE_MEMBER.match(member['UniqueName'])
+    return [x.replace(']]', ']') for x in match.groups()]
+
+
+def _member_entity(element):
+    return {'Name': element['Name'], 'UniqueName': element['UniqueName'], 'Element': element}
+
+
+def _unproject_view(view):
+    """Returns the body of a stored view, with @odata.bind references for its subsets"""
+    body = {key: value for key, value in view.items() if key not in ('Columns', 'Rows', 'Titles')}
+    for axis in ('Columns', 'Rows', 'Titles'):
+        body[axis] = []
+        for selection in view[axis]:
+            subset = selection['Subset']
+            hierarchy = subset['Hierarchy']
+            hierarchy_bind = "Dimensions('{}')/Hierarchies('{}')".format(hierarchy['Dimension']['Name'], hierarchy['Name'])
+            if subset['Name']:
+                item = {'Subset@odata.bind': "{}/Subsets('{}')".format(hierarchy_bind, subset['Name'])}
+            else:
+                item = {'Subset': {'Hierarchy@odata.bind': hierarchy_bind, 'Alias': subset['Alias'], 'Expression': subset['Expression'],
+                                   'Elements@odata.bind': ["{}/Elements('{}')".format(hierarchy_bind, x['Name']) for x in subset['Elements']]}}
+            if selection.get('Selected'):
+                item['Selected@odata.bind'] = "{}/Elements('{}')".format(hierarchy_bind, selection['Selected']['Name'])
+            body[axis].append(item)
+
+    return body
+
+
+def _split(text, separator):
+    """Splits text on separator, except inside parentheses and quotes"""
+    parts = []
+    depth = 0
+    quoted = False
+    start = 0
+    for i, char in enumerate(text):
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+
+    parts.append(text[start:])
+    return [x for x in parts if x.strip()]
+
+
+def _parse_path(path):
+    """Returns the segments of a path as (name, key) tuples. Keys are strings, or dicts for compound keys"""
+    segments = []
+    for segment in _split(path.strip('/'), '/'):
+        name, _, key = segment.partition('(')
+        if not key:
+            segments.append((name, None))
+            continue
+
+        key = key[:-1]
+        if key.startswith("'"):
+            segments.append((name, key[1:-1].replace("''", "'")))
+        else:
+            parts = dict(_split_key(x) for x in _split(key, ','))
+            segments.append((name, (parts['ParentName'], parts['ComponentName']) if 'ParentName' in parts else parts))
+
+    return segments
+
+
+def _split_key(part):
+    name, _, value = part.partition('=')
+    return name.strip(), value.strip()[1:-1].replace("''", "'")
+
+
+def _parse_options(text, separator):
+    """Parses OData query options ($select, $expand, $filter, $top, $skip and $count) into a dict"""
+    options = {'select': None, 'expand': {}, 'filter': None, 'top': None, 'skip': None, 'count': False}
+
+    for option in _split(text, separator):
+        name, _, value = option.partition('=')
+        name = unquote(name.strip())
+        value = unquote(value)
+
+        if name == '$select':
+            options['select'] = [x.strip().split('/')[0] for x in _split(value, ',')]
+        elif name == '$expand':
+            for item in _split(value, ','):
+                _merge_expand(options['expand'], item.strip())
+        elif name == '$filter':
+            options['filter'] = value
+        elif name == '$top':
+            options['top'] = int(value)
+        elif name == '$skip':
+            options['skip'] = int(value)
+        elif name == '$count':
+            options['count'] = value.strip().lower() != 'false'
+
+    return options
+
+
+def _merge_expand(expand, item):
+    path, _, nested = item.partition('(')
+    names = [x.strip() for x in path.split('/') if x.strip() and not x.strip().startswith('tm1.')]
+    nested_options = _parse_options(nested[:-1], ';') if nested else _parse_options('', ';')
+
+    for name in names[:-1]:
+        expand = expand.setdefault(name, _parse_options('', ';'))['expand']
+
+    if names[-1] in expand:
+        existing = expand[names[-1]]
+        existing['expand'].update(nested_options['expand'])
+        for key in ('select', 'filter', 'top', 'skip'):
+            existing[key] = nested_options[key] if nested_options[key] is not None else existing[key]
+        existing['count'] = existing['count'] or nested_options['count']
+    else:
+        expand[names[-1]] = nested_options
+
+
+def _project(entity, options):
+    select = options.get('select')
+    expand = options.get('expand', {})
+
+    result = {}
+    for key, value in entity.items():
+        if key.startswith('_') or key in NAVIGATION:
+            continue
+        if select is None or '*' in select or key in select:
+            result[key] = value
+
+    for name, nested in expand.items():
+        if name not in entity:
+            continue
+
+        value = entity[name]
+        if isinstance(value, (Collection, list)):
+            items = _project_collection(value, nested)
+            if nested.get('count'):
+                result[name + '@odata.count'] = len(_filter(list(value.values()) if isinstance(value, Collection) else value, nested.get('filter')))
+            result[name] = items
+        elif value is None:
+            result[name] = None
+        else:
+            result[name] = _project(value, nested)
+
+    return result
+
+
+def _project_collection(collection, options):
+    items = list(collection.values()) if isinstance(collection, Collection) else list(collection)
+    items = _filter(items, options.get('filter'))
+
+    skip = options.get('skip') or 0
+    top = options.get('top')
+    items = items[skip:skip + top if top is not None else None]
+
+    return [_project(x, options) for x in items]
+
+
+def _filter(items, expression):
+    """Filters items with an OData $filter expression. Supports 'Name eq' and startswith(Name, ...) terms combined with
+    and / or, which are evaluated left to right
+    """
+    if not expression:
+        return items
+
+    alternatives = [[_filter_term(term) for term in re.split(r'\s+and\s+', x)] for x in re.split(r'\s+or\s+', expression)]
+
+    return [item for item in items if any(all(term(item) for term in terms) for terms in alternatives)]
+
+
+def _filter_term(term):
+    term = term.strip().strip('()')
+
+    match = re.match(r"startswith\((\w+),\s*'((?:[^']|'')*)'\)\s*(?:eq\s+(true|false))?$", term, re.IGNORECASE)
+    if match:
+        prefix = match.group(2).replace("''", "'").lower()
+        expected = (match.group(3) or 'true').lower() == 'true'
+        return lambda item: str(item.get(match.group(1), '')).lower().startswith(prefix) == expected
+
+    match = re.match(r"(\w+)\s+eq\s+'((?:[^']|'')*)'$", term)
+    if match:
+        value = match.group(2).replace("''", "'")
+        return lambda item: _same(str(item.get(match.group(1), '')), value)
+
+    raise FakeError(400, 'Unsupported filter: {}'.format(term))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs a local stand-in TM1 server')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds every request is delayed')
+    parser.add_argument('--size', type=int, default=0, help='Size of the synthetic model to start with')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--path', help='Project whose model to start with, e.g. one made by --mode generate')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    server = FakeTM1Server(latency=args.latency, port=args.port)
+    if args.path:
+        from tm1cm.application import LocalApplication
+        from tm1cm.common import get_config
+        server.model.load_application(LocalApplication(get_config(args.path, 'tm1cm'), args.path).refresh(True))
+    elif args.size:
+        from benchmark import populate_model
+        populate_model(server.model, args.size, args.seed)
+
+    print('Serving TM1 REST API on http://127.0.0.1:{}/api/v1/ (user admin, password apple)'.format(server.port))
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
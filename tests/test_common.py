@@ -0,0 +1,56 @@
+import io
+import json
+
+import yaml
+
+from tm1cm import common
+
+DATA = [
+    {'name': 'Dimension 0', 'elements': [{'Name': 'Total', 'Type': 'Consolidated'}, {'Name': "it's", 'Type': 'String'}]},
+    {'name': 'Ünïcode', 'value': 1.5, 'empty': None, 'flag': True, 'text': 'line 1\nline 2', 'long': 'x' * 300},
+    {'name': '- not an item', 'nested': {'list': [1, 2, [3, 4]], 'key: value': '#'}},
+]
+
+
+def test_load_yaml_matches_pure_python_loader():
+    text = common.dump_yaml(DATA)
+    assert common.load_yaml(text) == yaml.load(text, Loader=yaml.SafeLoader) == DATA
+
+
+def test_dump_yaml_indents_sequences():
+    # The layout of the files written so far, which the libyaml emitter cannot produce
+    data = [{'name': 'Dimension 0', 'elements': [{'Name': 'Total', 'Type': 'Consolidated'}]}]
+    assert common.dump_yaml(data) == '- elements:\n    - Name: Total\n      Type: Consolidated\n  name: Dimension 0\n'
+
+
+def test_iter_yaml_list_matches_load_yaml():
+    text = common.dump_yaml(DATA)
+    assert list(common.iter_yaml_list(io.StringIO(text), batch_size=2)) == common.load_yaml(text)
+
+
+def test_dump_json_matches_json():
+    assert common.dump_json(DATA) == json.dumps(DATA, indent=4, sort_keys=True, ensure_ascii=False)
+
+
+def test_load_json_accepts_str_bytes_and_files():
+    text = common.dump_json(DATA)
+    assert common.load_json(text) == common.load_json(text.encode('utf8')) == common.load_json(io.StringIO(text)) == DATA
+
+
+def test_load_json_falls_back_to_json():
+    assert common.load_json('{"a": NaN, "b": 123456789012345678901234567890}')['b'] == 123456789012345678901234567890
+
+
+def test_lazy_objects_load_in_one_batch():
+    calls = []
+
+    def loader(names):
+        calls.append(list(names))
+        return [{'Name': name} for name in names]
+
+    objects = common.LazyObjects(['a', 'b', 'c'], loader)
+    assert objects['a'] == {'Name': 'a'}
+
+    objects.load(['a', 'b', 'c', 'd'])
+    assert calls == [['a'], ['b', 'c']]
+    assert dict(objects) == {name: {'Name': name} for name in 'abc'}
@@ -0,0 +1,40 @@
+import filecmp
+import os
+
+from tm1cm.application import create_remote_application, LocalApplication
+from tm1cm.common import get_default_config
+from tm1cm.migration import Migration
+from tm1cm.transport import create_session
+
+from benchmark import BENCHMARK_CONFIG, populate_model
+from fake_server import FakeTM1Server
+
+
+def _files(path):
+    return sorted(os.path.relpath(os.path.join(root, x), path) for root, _, files in os.walk(path) for x in files)
+
+
+def test_get_put_round_trip(tmp_path):
+    config = {**get_default_config('tm1cm'), **BENCHMARK_CONFIG}
+    first, second = str(tmp_path / 'first'), str(tmp_path / 'second')
+
+    with FakeTM1Server() as server:
+        populate_model(server.model, 1)
+        session = create_session(server.session_config)
+        try:
+            create_remote_application(config, session).refresh(False).to_local(first, clear=True)
+
+            # Put the project into an empty server, and get it back
+            server.model.reset()
+            migration = Migration(LocalApplication(config, first).refresh(True), create_remote_application(config, session).refresh(None))
+            assert migration.operations
+            migration.do_all_operations()
+
+            create_remote_application(config, session).refresh(False).to_local(second, clear=True)
+        finally:
+            session.logout()
+
+    assert _files(first) == _files(second)
+    _, mismatch, errors = filecmp.cmpfiles(first, second, _files(first), shallow=False)
+    assert not errors
+    assert mismatch == []
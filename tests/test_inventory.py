@@ -0,0 +1,53 @@
+import time
+
+from tm1cm.inventory import Inventory
+
+
+def test_delete_removes_only_its_subtree():
+    inventory = Inventory()
+    inventory.added('dimension', 'Region', hierarchies=['Region', 'Alt'])
+    inventory.added('subset', 'Region', 'Region', 'All')
+    inventory.added('subset', 'Region', 'Alt', 'All')
+    inventory.added('dimension', 'Product', hierarchies=['Product'])
+    inventory.added('subset', 'Product', 'Product', 'All')
+
+    inventory.deleted('hierarchy', 'region', 'ALT')
+    assert inventory.exists('subset', 'Region', 'Alt', 'All') is False
+    assert inventory.exists('subset', 'Region', 'Region', 'All') is True
+
+    inventory.deleted('dimension', 'Region')
+    assert inventory.exists('hierarchy', 'Region', 'Region') is False
+    assert inventory.exists('subset', 'Region', 'Region', 'All') is False
+    assert inventory.exists('subset', 'Product', 'Product', 'All') is True
+
+    # Objects added again after a delete are found, and deleted, like any other
+    inventory.added('subset', 'Region', 'Region', 'All')
+    assert inventory.exists('subset', 'Region', 'Region', 'All') is True
+    inventory.deleted('dimension', 'Region')
+    assert inventory.exists('subset', 'Region', 'Region', 'All') is False
+
+
+def test_delete_unknown_children():
+    inventory = Inventory()
+    inventory.added('dimension', 'Region')
+    assert inventory.exists('hierarchy', 'Region', 'Region') is None
+
+    inventory.deleted('dimension', 'Region')
+    assert inventory.exists('hierarchy', 'Region', 'Region') is False
+
+
+def test_delete_does_not_scan_every_object():
+    inventory = Inventory()
+    for i in range(1000):
+        inventory.added('cube', 'Cube {}'.format(i), dimensions=[])
+        inventory.added('dimension', 'Dimension {}'.format(i), hierarchies=['Dimension {}'.format(i)])
+        for j in range(25):
+            inventory.added('view', 'Cube {}'.format(i), 'View {}'.format(j))
+            inventory.added('subset', 'Dimension {}'.format(i), 'Dimension {}'.format(i), 'Subset {}'.format(j))
+        inventory.added('process', 'Process {}'.format(i))
+
+    start = time.perf_counter()
+    for i in range(1000):
+        inventory.deleted('process', 'Process {}'.format(i))
+    assert time.perf_counter() - start < 1
+    assert len(inventory) == 1000 * 53
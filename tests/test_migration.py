@@ -0,0 +1,91 @@
+import random
+import time
+
+from tm1cm.migration import Migration, SERIAL_OPERATIONS, TYPE_DEPENDENCIES
+from tm1cm.operation import Operation, Ops
+
+
+class StubApplication:
+
+    def __init__(self, cubes):
+        self.cubes = {name: {'Name': name, 'Dimensions': [{'Name': x} for x in dimensions]} for name, dimensions in cubes.items()}
+
+    def iter_files(self, skip=None, known=None):
+        return iter([])
+
+
+def _migration(cubes):
+    return Migration(StubApplication(cubes), StubApplication({}))
+
+
+def _operation(operation_type, *arguments):
+    return Operation(None, operation_type, arguments)
+
+
+def _closure(dependencies, count):
+    """Returns {index: every operation index it waits for, directly or through other operations and barriers}"""
+    result = {}
+
+    def visit(i):
+        if i not in result:
+            result[i] = set()
+            for j in dependencies[i]:
+                result[i] |= visit(j) | {j}
+        return result[i]
+
+    return {i: {j for j in visit(i) if j < count} for i in range(count)}
+
+
+def _expected(migration, operations):
+    """Dependencies as defined by _get_dependencies: every earlier operation of a lower type on a shared key, every
+    earlier operation on a shared key for serial types, and every operation of the types listed in TYPE_DEPENDENCIES
+    """
+    cube_dimensions = {}
+    keys = [set(migration._get_operation_keys(x, [migration.source.cubes], cube_dimensions)) for x in operations]
+
+    result = {}
+    for i, operation in enumerate(operations):
+        result[i] = set()
+        for j in range(i):
+            if keys[i] & keys[j] and (operations[j].type < operation.type or operation.type in SERIAL_OPERATIONS):
+                result[i].add(j)
+            if operations[j].type in TYPE_DEPENDENCIES.get(operation.type, ()):
+                result[i].add(j)
+
+    return _closure(result, len(operations))
+
+
+def test_dependencies_match_definition():
+    rng = random.Random(0)
+    cubes = {'Cube {}'.format(i): rng.sample(['Dimension {}'.format(j) for j in range(6)], 3) for i in range(6)}
+    migration = _migration(cubes)
+
+    for _ in range(20):
+        operations = []
+        for _ in range(60):
+            operation_type = rng.choice(list(Ops))
+            object_type = operation_type.name.split('_', 1)[1]
+            if object_type in ('DIMENSION', 'HIERARCHY', 'SUBSET'):
+                operations.append(_operation(operation_type, 'Dimension {}'.format(rng.randrange(6)), 'x'))
+            elif object_type in ('PROCESS', 'FILE'):
+                operations.append(_operation(operation_type, 'P{}'.format(rng.randrange(3))))
+            else:
+                operations.append(_operation(operation_type, 'Cube {}'.format(rng.randrange(6)), 'x'))
+        operations.sort(key=lambda x: x.type)
+
+        dependencies = migration._get_dependencies(operations)
+        assert _closure(dependencies, len(operations)) == _expected(migration, operations)
+
+
+def test_dependencies_linear_for_shared_dimension():
+    cubes = {'Cube {}'.format(i): ['Shared', 'Dimension {}'.format(i)] for i in range(1000)}
+    migration = _migration(cubes)
+
+    operations = [_operation(Ops.UPDATE_DIMENSION, 'Shared')]
+    operations += [_operation(Ops.UPDATE_CUBE, 'Cube {}'.format(i)) for i in range(1000)]
+    operations += [_operation(Ops.UPDATE_VIEW, 'Cube {}'.format(i % 1000), 'View {}'.format(i)) for i in range(20000)]
+
+    start = time.perf_counter()
+    dependencies = migration._get_dependencies(operations)
+    assert time.perf_counter() - start < 5
+    assert sum(len(x) for x in dependencies.values()) < 5 * len(operations)
@@ -0,0 +1,78 @@
+import os
+
+from tm1cm.operation import _hierarchy_delta, get_dimension_cubes, Operation, Ops
+
+
+def _hierarchy(elements, edges):
+    return {
+        'Elements': [{'Name': name, 'Type': 'Consolidated' if name.lower().startswith('total') else 'Numeric'} for name in elements],
+        'Edges': [{'ParentName': parent, 'ComponentName': component, 'Weight': weight} for parent, component, weight in edges],
+    }
+
+
+TARGET = _hierarchy(['Total', 'A', 'B'], [('Total', 'A', 1), ('Total', 'B', 1)])
+
+
+def test_unchanged():
+    assert _hierarchy_delta(TARGET, TARGET, 100) == ([], [], [], {})
+
+
+def test_names_ignore_case_and_spaces():
+    source = _hierarchy(['TOTAL', 'a', ' B'], [('TOTAL', 'a', 1), ('Total', ' B', 1)])
+    assert _hierarchy_delta(source, TARGET, 100) == ([], [], [], {})
+
+
+def test_added_at_the_end():
+    source = _hierarchy(['Total', 'A', 'B', 'C'], [('Total', 'A', 1), ('Total', 'B', 1), ('Total', 'C', 1)])
+    assert _hierarchy_delta(source, TARGET, 100) == ([], [], ['C'], {('Total', 'C'): 1})
+
+
+def test_deleted():
+    source = _hierarchy(['Total', 'A'], [('Total', 'A', 1)])
+    assert _hierarchy_delta(source, TARGET, 100) == (['B'], [], [], {})
+
+
+def test_weight_of_last_child():
+    source = _hierarchy(['Total', 'A', 'B'], [('Total', 'A', 1), ('Total', 'B', -1)])
+    assert _hierarchy_delta(source, TARGET, 100) == ([], [('Total', 'B')], [], {('Total', 'B'): -1})
+
+
+def test_order_is_replaced_as_a_whole():
+    # Added items go after the existing ones, so any other order can only be reached by replacing the hierarchy
+    cases = [
+        _hierarchy(['Total', 'B', 'A'], [('Total', 'A', 1), ('Total', 'B', 1)]),
+        _hierarchy(['Total', 'A', 'B'], [('Total', 'B', 1), ('Total', 'A', 1)]),
+        _hierarchy(['C', 'Total', 'A', 'B'], [('Total', 'A', 1), ('Total', 'B', 1), ('Total', 'C', 1)]),
+        _hierarchy(['Total', 'A', 'B', 'C'], [('Total', 'C', 1), ('Total', 'A', 1), ('Total', 'B', 1)]),
+        _hierarchy(['Total', 'A', 'B'], [('Total', 'A', -1), ('Total', 'B', 1)]),
+    ]
+    for source in cases:
+        assert _hierarchy_delta(source, TARGET, 100) is None
+
+
+def test_limit():
+    source = _hierarchy(['Total'], [])
+    assert _hierarchy_delta(source, TARGET, 1) is None
+
+
+class StubApplication:
+
+    def __init__(self, cubes):
+        self.cubes = {name: {'Name': name, 'Dimensions': [{'Name': x} for x in dimensions]} for name, dimensions in cubes.items()}
+
+
+def _views(*cube_names):
+    return [os.path.join('data', folder, name, '') for name in cube_names for folder in ('view', 'view_data')]
+
+
+def test_snapshot_prefixes():
+    source = StubApplication({'Sales': ['Region', 'Product'], 'Plan': ['Region']})
+    target = StubApplication({'Sales': ['Region', 'Product'], 'Old': ['region ']})
+    dimension_cubes = get_dimension_cubes([source, None, target])
+
+    prefixes = Operation(source, Ops.UPDATE_HIERARCHY, ('REGION', 'REGION'))._get_snapshot_prefixes(dimension_cubes)
+    assert sorted(prefixes) == sorted([os.path.join('data', 'hierarchy', 'REGION', ''), os.path.join('data', 'subset', 'REGION', '')] + _views('Old', 'Plan', 'Sales'))
+
+    assert Operation(source, Ops.UPDATE_VIEW, ('Sales', 'Default'))._get_snapshot_prefixes(dimension_cubes) == _views('Sales')
+    assert Operation(source, Ops.UPDATE_PROCESS, ('Load',))._get_snapshot_prefixes(dimension_cubes) == []
+    assert Operation(source, Ops.UPDATE_FILE, ('files/a.csv',))._get_snapshot_prefixes(dimension_cubes) == ['files/a.csv']
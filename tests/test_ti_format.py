@@ -0,0 +1,70 @@
+import pytest
+
+from tm1cm import ti_format
+
+import ti_format_reference
+from benchmark import make_procedure
+
+PROCEDURES = {
+    'quotes': '\r\n'.join([
+        "sName = 'it''s  a ''quoted''  name';",
+        "sPath = 'C:\\data\\' | sName | '.csv';",
+        "sText = 'if(x); cellputn(1, a, b); # not a comment';",
+        "asciioutput('out.txt', 'a,b' , sName,'');",
+    ]),
+    'comments': '\r\n'.join([
+        '#****Begin: Generated Statements***',
+        '#****End: Generated Statements****',
+        '',
+        '# if(x); cellgetn(a, b);',
+        "   #it's an 'unbalanced quote",
+        'nValue = cellgetn(pCube, sDim, sName); # trailing if(x);',
+        '#',
+    ]),
+    'nested': '\r\n'.join([
+        'if(nValue > 0);',
+        "while(dimix(sDim, sName) = 0);",
+        "  if(sName @= 'a');",
+        'nValue = nValue + -1;',
+        "  elseif(sName @<> 'b');",
+        'nValue=nValue*2;',
+        '  else;',
+        'itemskip;',
+        '  endif;',
+        'end;',
+        'ElseIf(nValue < 0);',
+        'WHILE(nValue < 0);',
+        'nValue = nValue+1;',
+        'END;',
+        'else;',
+        'endif;',
+    ]),
+    'continuation': '\r\n'.join([
+        "executeprocess('Load.Data', 'pCube', pCube, 'pDim', sDim, 'pName', 'it''s', 'pValue', nValue * 2, 'pFlag', 1);",
+        "RunProcess('Load.Data','pCube',pCube);",
+        "sText = 'first line",
+        'second line',
+        "third line';",
+        'nValue = cellgetn(pCube,',
+        '   sDim,',
+        "   'Total');",
+    ]),
+}
+
+
+@pytest.mark.parametrize('name', sorted(PROCEDURES))
+def test_matches_reference(name):
+    text = PROCEDURES[name]
+    assert ti_format.format_procedure(text) == ti_format_reference.format_procedure(text)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_matches_reference_generated(seed):
+    text = make_procedure(200, seed)
+    assert ti_format.format_procedure(text) == ti_format_reference.format_procedure(text)
+
+
+def test_multiline_string_with_comment():
+    # The reference formatter left a placeholder behind for these
+    text = "sText = 'first line\r\n# second line';\r\nnValue=1;"
+    assert '# second line' in ti_format.format_procedure(text)